@@ -1,5 +1,5 @@
 from celery import Celery
-from celery.signals import worker_process_init, worker_process_shutdown
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
 
 import config
 from bot.db_config import ensure_engine_process_bound, dispose_engine_sync
@@ -28,5 +28,12 @@ def _on_worker_process_init(**_kwargs):
 
 
 @worker_process_shutdown.connect
+@worker_shutdown.connect
 def _on_worker_process_shutdown(**_kwargs):
-    dispose_engine_sync()
+    from bot.worker_loop import worker_loop
+
+    if worker_loop.running:
+        # The pool belongs to the persistent loop; dispose of it there
+        worker_loop.shutdown()
+    else:
+        dispose_engine_sync()
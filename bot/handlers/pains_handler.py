@@ -23,6 +23,7 @@ from bot.ui.pains_menu import (
     get_drafts_list_keyboard,
     get_quotes_keyboard,
 )
+from modules import llm_gateway
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -333,9 +334,10 @@ async def generate_post_choose_type(
     from modules.content_generator import generate_post
 
     try:
-        post = await generate_post(
-            cluster_id, session, post_type=_UNIFIED_POST_TYPE
-        )
+        with llm_gateway.budget_scope(callback.from_user.id):
+            post = await generate_post(
+                cluster_id, session, post_type=_UNIFIED_POST_TYPE
+            )
     except Exception as e:
         logger.error(f"Content generation failed for cluster_id={cluster_id}: {e}")
         await _safe_edit_text(callback, 
@@ -384,9 +386,10 @@ async def generate_post_execute(
     from modules.content_generator import generate_post
 
     try:
-        post = await generate_post(
-            cluster_id, session, post_type=_UNIFIED_POST_TYPE
-        )
+        with llm_gateway.budget_scope(callback.from_user.id):
+            post = await generate_post(
+                cluster_id, session, post_type=_UNIFIED_POST_TYPE
+            )
     except Exception as e:
         logger.error(f"Content generation failed for cluster_id={cluster_id}: {e}")
         await _safe_edit_text(callback, 
@@ -509,9 +512,10 @@ async def regen_post_handler(callback: CallbackQuery, session: AsyncSession) ->
     from modules.content_generator import generate_post
 
     try:
-        post = await generate_post(
-            cluster_id, session, post_type=_UNIFIED_POST_TYPE
-        )
+        with llm_gateway.budget_scope(callback.from_user.id):
+            post = await generate_post(
+                cluster_id, session, post_type=_UNIFIED_POST_TYPE
+            )
     except Exception as e:
         logger.error(
             f"Content regeneration failed for cluster_id={cluster_id}: {e}"
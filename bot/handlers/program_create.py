@@ -14,6 +14,7 @@ from bot.models.program import Program, ProgramChat
 from bot.models.user import User
 from bot.scheduler import schedule_program_job
 from bot.services.subscription import check_program_limit
+from modules.entity_cache import find_unresolvable_chats
 
 router = Router()
 
@@ -118,6 +119,16 @@ async def enter_chats(message: Message, state: FSMContext):
                              reply_markup=get_step_keyboard(back_callback="niche_description"))
         return
 
+    unresolvable = await find_unresolvable_chats(chats)
+    if unresolvable:
+        chats = [chat for chat in chats if chat not in unresolvable]
+        missing = ", ".join(f"@{chat}" for chat in unresolvable)
+        if not chats:
+            await message.answer(f"❌ Не удалось найти чаты: {missing}. Проверь юзернеймы и попробуй ещё раз.",
+                                 reply_markup=get_step_keyboard(back_callback="niche_description"))
+            return
+        await message.answer(f"⚠️ Не удалось найти чаты: {missing}. Они не будут добавлены.")
+
     logging.info(f"FSM 'create_program': entered chats {chats}")
     await state.update_data(chats=chats)
     await state.set_state(ProgramCreate.confirm_settings)
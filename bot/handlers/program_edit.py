@@ -10,6 +10,7 @@ from sqlalchemy.orm import selectinload
 from bot.models.program import Program, ProgramChat
 from bot.scheduler import schedule_program_job, remove_program_job
 from bot.states import ProgramEdit
+from modules.entity_cache import find_unresolvable_chats
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -271,7 +272,7 @@ async def edit_chats_process(message: Message, state: FSMContext, session: Async
     else:
         # Add new chats
         lines = text.split("\n")
-        added = []
+        candidates = []
 
         for line in lines:
             line = line.strip()
@@ -283,10 +284,21 @@ async def edit_chats_process(message: Message, state: FSMContext, session: Async
 
             # Check if already exists
             exists = any(c.chat_username == chat_username for c in program.chats)
-            if not exists:
-                new_chat = ProgramChat(program_id=program_id, chat_username=chat_username)
-                session.add(new_chat)
-                added.append(f"@{chat_username}")
+            if not exists and chat_username not in candidates:
+                candidates.append(chat_username)
+
+        unresolvable = await find_unresolvable_chats(candidates)
+        if unresolvable:
+            missing = ", ".join(f"@{chat}" for chat in unresolvable)
+            await message.answer(f"⚠️ Не удалось найти чаты: {missing}")
+
+        added = []
+        for chat_username in candidates:
+            if chat_username in unresolvable:
+                continue
+            new_chat = ProgramChat(program_id=program_id, chat_username=chat_username)
+            session.add(new_chat)
+            added.append(f"@{chat_username}")
 
         if added:
             await session.commit()
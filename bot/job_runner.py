@@ -0,0 +1,263 @@
+"""Asyncio-native runner for program jobs.
+
+The Celery worker runs with --pool=solo, so one worker process executes
+exactly one program at a time. With JOB_RUNNER_ENABLED the bot queues
+program jobs in a Redis stream instead, and `python -m bot.job_runner`
+consumes them through a consumer group, running up to
+MAX_CONCURRENT_PIPELINES jobs at once on a single event loop. All jobs of
+the process share the DB pool, the Telegram connection, the LLM HTTP pool
+and the bot session, as well as the limits bound to the loop: chat parsing
+per Telegram account (PARSE_CONCURRENCY_PER_ACCOUNT) and LLM requests in
+flight (LLM_MAX_CONCURRENT_REQUESTS, plus the shared per-minute limits).
+
+- Visibility timeout: a running job refreshes its claim every third of
+  JOB_VISIBILITY_TIMEOUT_SECONDS. A job that failed, or whose runner died,
+  stays pending and is claimed again by any runner once it has been idle
+  for that long; after JOB_MAX_ATTEMPTS deliveries it is dropped.
+- Graceful shutdown: SIGTERM/SIGINT stop claiming jobs and wait up to
+  JOB_SHUTDOWN_TIMEOUT_SECONDS for the running ones. Jobs still running
+  after that are cancelled and left pending for the next runner.
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+from typing import Awaitable, Callable, Optional
+
+import redis
+import redis.asyncio as aioredis
+from aiogram import Bot
+
+import config
+from bot.db_config import dispose_engine
+from bot.services import program_runner
+from modules import llm_gateway
+from modules.telegram_client import TelegramAuthManager
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[int, int], Awaitable[None]]
+_GROUP = "program-runners"
+
+_enqueue_client: Optional[redis.Redis] = None
+
+
+def enqueue(program_id: int, chat_id: int) -> str:
+    """Queue a program job for the runners and return its stream id."""
+    global _enqueue_client
+    if _enqueue_client is None:
+        _enqueue_client = redis.Redis.from_url(config.JOB_QUEUE_REDIS_URL, decode_responses=True)
+    return _enqueue_client.xadd(
+        config.JOB_QUEUE_STREAM,
+        {"program_id": str(program_id), "chat_id": str(chat_id)},
+    )
+
+
+class JobRunner:
+    """Consumer of the program job stream running jobs concurrently."""
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        handler: JobHandler,
+        *,
+        concurrency: Optional[int] = None,
+        consumer: Optional[str] = None,
+        visibility_timeout: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        shutdown_timeout: Optional[float] = None,
+        block_ms: int = 1000,
+    ) -> None:
+        self._redis = client
+        self._handler = handler
+        self.stream = config.JOB_QUEUE_STREAM
+        self.concurrency = max(1, concurrency or config.MAX_CONCURRENT_PIPELINES)
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.visibility_timeout = (
+            config.JOB_VISIBILITY_TIMEOUT_SECONDS if visibility_timeout is None else visibility_timeout
+        )
+        self.max_attempts = max(1, max_attempts or config.JOB_MAX_ATTEMPTS)
+        self.shutdown_timeout = (
+            config.JOB_SHUTDOWN_TIMEOUT_SECONDS if shutdown_timeout is None else shutdown_timeout
+        )
+        self._block_ms = block_ms
+        self._claim_cursor = "0-0"
+        self._stopping = asyncio.Event()
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    @property
+    def running_jobs(self) -> int:
+        return len(self._tasks)
+
+    def stop(self) -> None:
+        """Stop claiming jobs; run() returns once the running ones are done."""
+        if not self._stopping.is_set():
+            logger.info(f"[JOBS] Stopping, waiting for {len(self._tasks)} running job(s).")
+        self._stopping.set()
+
+    async def _ensure_group(self) -> None:
+        try:
+            await self._redis.xgroup_create(self.stream, _GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def run(self) -> None:
+        """Claim and run jobs until stop() is called."""
+        await self._ensure_group()
+        logger.info(
+            f"[JOBS] Runner '{self.consumer}' consuming '{self.stream}' "
+            f"with up to {self.concurrency} concurrent job(s)."
+        )
+        try:
+            while not self._stopping.is_set():
+                free = self.concurrency - len(self._tasks)
+                if free <= 0:
+                    await asyncio.wait(
+                        list(self._tasks.values()),
+                        timeout=self._block_ms / 1000,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    continue
+                try:
+                    jobs = await self._claim_stale(free)
+                    if not jobs:
+                        jobs = await self._read_new(free)
+                except redis.RedisError as e:
+                    logger.warning(f"[JOBS] Could not read the job stream: {e}")
+                    await self._pause()
+                    continue
+                for job_id, fields in jobs:
+                    if self._stopping.is_set():
+                        break  # left pending, claimed again after the visibility timeout
+                    self._start(job_id, fields)
+        finally:
+            await self._drain()
+
+    async def _pause(self) -> None:
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=self._block_ms / 1000)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _read_new(self, count: int) -> list[tuple[str, dict]]:
+        response = await self._redis.xreadgroup(
+            _GROUP, self.consumer, {self.stream: ">"}, count=count, block=self._block_ms
+        )
+        return [job for _stream, entries in response or [] for job in entries]
+
+    async def _claim_stale(self, count: int) -> list[tuple[str, dict]]:
+        """Take over jobs idle longer than the visibility timeout."""
+        response = await self._redis.xautoclaim(
+            self.stream,
+            _GROUP,
+            self.consumer,
+            min_idle_time=int(self.visibility_timeout * 1000),
+            start_id=self._claim_cursor,
+            count=count,
+        )
+        self._claim_cursor, entries = response[0], response[1]
+        jobs = []
+        for job_id, fields in entries:
+            if not fields or job_id in self._tasks:
+                continue
+            pending = await self._redis.xpending_range(
+                self.stream, _GROUP, min=job_id, max=job_id, count=1
+            )
+            deliveries = pending[0]["times_delivered"] if pending else 1
+            if deliveries > self.max_attempts:
+                logger.error(
+                    f"[JOBS] Dropping job {job_id} {fields} after {deliveries - 1} attempt(s)."
+                )
+                await self._ack(job_id)
+                continue
+            logger.info(f"[JOBS] Retrying job {job_id} (delivery {deliveries}/{self.max_attempts}).")
+            jobs.append((job_id, fields))
+        return jobs
+
+    def _start(self, job_id: str, fields: dict) -> None:
+        task = asyncio.create_task(self._execute(job_id, fields))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _task: self._tasks.pop(job_id, None))
+
+    async def _execute(self, job_id: str, fields: dict) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            program_id, chat_id = int(fields["program_id"]), int(fields["chat_id"])
+            logger.info(
+                f"[JOBS] Running job {job_id}: program_id={program_id}, chat_id={chat_id}"
+            )
+            await self._handler(program_id, chat_id)
+        except asyncio.CancelledError:
+            logger.warning(f"[JOBS] Job {job_id} interrupted; it stays pending for another runner.")
+            raise
+        except Exception as e:
+            logger.exception(
+                f"[JOBS] Job {job_id} failed: {e}; retrying after the visibility timeout."
+            )
+            return
+        finally:
+            heartbeat.cancel()
+        await self._ack(job_id)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Keep a running job's claim fresh so no other runner takes it over."""
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            try:
+                # JUSTID resets the idle time without counting a delivery
+                await self._redis.xclaim(
+                    self.stream, _GROUP, self.consumer, 0, [job_id], justid=True
+                )
+            except redis.RedisError as e:
+                logger.warning(f"[JOBS] Could not refresh job {job_id}: {e}")
+
+    async def _ack(self, job_id: str) -> None:
+        try:
+            await self._redis.xack(self.stream, _GROUP, job_id)
+            await self._redis.xdel(self.stream, job_id)
+        except redis.RedisError as e:
+            logger.warning(f"[JOBS] Could not acknowledge job {job_id}: {e}")
+
+    async def _drain(self) -> None:
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+        _done, pending = await asyncio.wait(tasks, timeout=self.shutdown_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            logger.warning(f"[JOBS] Cancelled {len(pending)} job(s) still running at shutdown.")
+
+
+async def _main() -> None:
+    client = aioredis.from_url(config.JOB_QUEUE_REDIS_URL, decode_responses=True)
+    bot = Bot(token=config.TELEGRAM_BOT_TOKEN, parse_mode="HTML")
+
+    async def _run_program_job(program_id: int, chat_id: int) -> None:
+        await program_runner.run_program_job(program_id, chat_id, bot=bot)
+
+    runner = JobRunner(client, _run_program_job)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, runner.stop)
+    try:
+        await runner.run()
+    finally:
+        await bot.session.close()
+        await llm_gateway.aclose()
+        await TelegramAuthManager.disconnect()
+        await dispose_engine()
+        await client.aclose()
+        logger.info("[JOBS] Runner stopped.")
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,9 @@ from bot.models.program import Program, ProgramChat
 from bot.models.lead import Lead
 from bot.models.pain import Pain, PainCluster, GeneratedPost
 from bot.models.user import User
+from bot.models.chat_cursor import ChatCursor
+from bot.models.program_run import ProgramRun
+from bot.models.telegram_cache import TelegramChatPeer, TelegramUserProfile
 from bot.scheduler import scheduler, schedule_program_job
 
 
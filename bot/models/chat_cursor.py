@@ -0,0 +1,39 @@
+import datetime
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    String,
+    DateTime,
+    JSON,
+    UniqueConstraint,
+)
+from sqlalchemy.orm import mapped_column, Mapped
+from .base import Base
+
+
+class ChatCursor(Base):
+    """High-water mark of parsed messages per (chat, Telegram account).
+
+    `window` keeps the compact rolling window of recent text messages so
+    incremental runs can merge it with newly fetched messages.
+    """
+
+    __tablename__ = "chat_cursors"
+    __table_args__ = (
+        UniqueConstraint("chat_key", "account", name="uq_chat_cursor_chat_account"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    chat_key: Mapped[str] = mapped_column(String(100), nullable=False)
+    account: Mapped[str] = mapped_column(String(100), nullable=False)
+    last_message_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    window: Mapped[list] = mapped_column(JSON, nullable=True)
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, default=datetime.datetime.utcnow
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<ChatCursor(chat='{self.chat_key}', account='{self.account}', "
+            f"last_message_id={self.last_message_id})>"
+        )
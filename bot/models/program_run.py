@@ -0,0 +1,56 @@
+import datetime
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    JSON,
+)
+from sqlalchemy.orm import mapped_column, Mapped
+from .base import Base
+
+
+class ProgramRun(Base):
+    """One run of a program with its stage checkpoints.
+
+    A run that failed or whose worker died stays `running` and is resumed by
+    the next job of the program: chats listed in `parsed_candidates` are not
+    parsed again, and candidates in `rejected_candidates` or
+    `qualified_candidates` are not qualified again. The job running it holds
+    a lease (`owner`, `lease_expires_at`) that it renews while running, and
+    only a run whose lease has expired can be resumed.
+    """
+
+    __tablename__ = "program_runs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    program_id: Mapped[int] = mapped_column(
+        ForeignKey("programs.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    user_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # running / completed / failed / expired
+    status: Mapped[str] = mapped_column(String(20), default="running")
+    attempts: Mapped[int] = mapped_column(Integer, default=1)
+    # Job currently running the run and until when it holds it
+    owner: Mapped[str] = mapped_column(String(32), nullable=True)
+    lease_expires_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=True)
+    # Screened candidates of each fully parsed chat: {chat: [candidate, ...]}
+    parsed_candidates: Mapped[dict] = mapped_column(JSON, nullable=True)
+    # Qualification scores below the program's min_score: {username: score}
+    rejected_candidates: Mapped[dict] = mapped_column(JSON, nullable=True)
+    # Usernames whose leads are saved
+    qualified_candidates: Mapped[list] = mapped_column(JSON, nullable=True)
+    started_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, default=datetime.datetime.utcnow
+    )
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow
+    )
+    finished_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return (
+            f"<ProgramRun(id={self.id}, program_id={self.program_id}, "
+            f"status='{self.status}', attempts={self.attempts})>"
+        )
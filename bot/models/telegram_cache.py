@@ -0,0 +1,64 @@
+import datetime
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Integer,
+    String,
+    DateTime,
+    Text,
+    UniqueConstraint,
+)
+from sqlalchemy.orm import mapped_column, Mapped
+from .base import Base
+
+
+class TelegramChatPeer(Base):
+    """Resolved Telegram chat, cached to avoid repeated username resolves.
+
+    Access hashes are only valid for the account that resolved the chat, so
+    rows are kept per (chat, Telegram account).
+    """
+
+    __tablename__ = "telegram_chat_peers"
+    __table_args__ = (
+        UniqueConstraint("chat_key", "account", name="uq_telegram_chat_peer_chat_account"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    chat_key: Mapped[str] = mapped_column(String(100), nullable=False)
+    account: Mapped[str] = mapped_column(String(100), nullable=False)
+    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    access_hash: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    # channel / chat / user
+    entity_type: Mapped[str] = mapped_column(String(20), nullable=False)
+    username: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    is_public: Mapped[bool] = mapped_column(Boolean, default=False)
+    resolved_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, default=datetime.datetime.utcnow
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<TelegramChatPeer(chat_key='{self.chat_key}', account='{self.account}', "
+            f"chat_id={self.chat_id}, type='{self.entity_type}')>"
+        )
+
+
+class TelegramUserProfile(Base):
+    """Cached Telegram user profile details fetched in parser stage 2."""
+
+    __tablename__ = "telegram_user_profiles"
+
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    username: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    bio: Mapped[str | None] = mapped_column(Text, nullable=True)
+    channel_in_bio: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    fetched_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, default=datetime.datetime.utcnow
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<TelegramUserProfile(user_id={self.user_id}, "
+            f"username='{self.username}')>"
+        )
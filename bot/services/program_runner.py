@@ -1,22 +1,28 @@
 import asyncio
+import hashlib
+import json
 import logging
 from typing import Dict, Any, Callable, Awaitable
 from aiogram import Bot
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 import config
 from bot.db_config import async_session
 from bot.models.program import Program
 from bot.models.lead import Lead
-from bot.models.pain import Pain
+from bot.models.program_run import ProgramRun
 from bot.models.user import User
 from bot.ui.lead_card import format_lead_card, get_lead_card_keyboard
+from bot.services import program_runs
 from bot.services.subscription import check_weekly_analysis_limit, mark_analysis_started
-from modules.telegram_client import AuthorizationRequiredError
-from modules import members_parser, qualifier
+from modules.telegram_client import AuthorizationRequiredError, TelegramAuthManager
+from modules.rate_limiter import account_semaphore
+from modules import llm_gateway, members_parser, pain_collector, qualifier
 from modules.pain_clusterer import cluster_new_pains
 
 logger = logging.getLogger(__name__)
@@ -27,6 +33,17 @@ _INT32_MAX = 2**31 - 1
 _PIPELINE_SEMAPHORE = asyncio.Semaphore(
     max(1, int(getattr(config, "MAX_CONCURRENT_PIPELINES", 1)))
 )
+# Lead columns refreshed when a lead is qualified again
+_LEAD_UPSERT_COLUMNS = (
+    "qualification_score",
+    "business_summary",
+    "pains_summary",
+    "solution_idea",
+    "recommended_message",
+    "raw_qualification_data",
+    "raw_user_profile_data",
+    "raw_llm_input",
+)
 
 
 
@@ -53,6 +70,34 @@ def _extract_pain_texts(qualification_result: Dict[str, Any]) -> list[str]:
     return pains
 
 
+def _qualification_fingerprint(
+    candidate: Dict[str, Any],
+    niche: str,
+    services_description: str,
+) -> str | None:
+    """Fingerprint of what a qualification depends on.
+
+    Covers the candidate's collected messages plus the program context, so a
+    lead is re-qualified only when there is new signal. Returns None when the
+    candidate has no messages (never memoized).
+    """
+    messages = candidate.get("messages_with_metadata") or []
+    if not messages:
+        return None
+    message_keys = sorted(
+        (
+            str(msg.get("chat_id") or msg.get("chat_username") or ""),
+            int(msg.get("message_id") or 0),
+            msg.get("text") or "",
+        )
+        for msg in messages
+    )
+    payload = json.dumps(
+        [niche, services_description, message_keys], ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 def _trim(value: Any, limit: int) -> str | None:
     """Trim string values to DB column limits."""
     if value is None:
@@ -98,7 +143,6 @@ async def _save_pains_from_lead(
     )
     business_type = _trim(business_type_raw, 100)
 
-    inserted = 0
     seen_keys: set[tuple[int, str, str]] = set()
     raw_user_id = candidate.get("user_id")
     safe_user_id: int | None = None
@@ -109,6 +153,7 @@ async def _save_pains_from_lead(
             f"Skip source_user_id={raw_user_id} for pains: out of int32 range."
         )
 
+    rows = []
     for idx, pain_text in enumerate(pains):
         msg = messages[idx % len(messages)]
         source_message_id = msg.get("message_id")
@@ -122,51 +167,73 @@ async def _save_pains_from_lead(
         dedup_key = (source_message_id, source_chat, original_quote)
         if dedup_key in seen_keys:
             continue
-
-        with session.no_autoflush:
-            existing_query = select(Pain).where(
-                Pain.user_id == user_id,
-                Pain.source_message_id == source_message_id,
-                Pain.source_chat == source_chat,
-                Pain.original_quote == original_quote,
-            )
-            existing = (await session.execute(existing_query)).scalars().first()
-        if existing:
-            seen_keys.add(dedup_key)
-            continue
-
-        pain = Pain(
-            user_id=user_id,
-            program_id=program_id,
-            text=pain_text,
-            original_quote=original_quote,
-            category="other",
-            intensity="medium",
-            business_type=business_type,
-            source_chat=source_chat,
-            source_message_id=source_message_id,
-            source_message_link=_trim(msg.get("link"), 255),
-            source_user_id=safe_user_id,
-            source_username=_trim(candidate.get("username"), 100),
-            message_date=None,
-        )
-        session.add(pain)
         seen_keys.add(dedup_key)
-        inserted += 1
-
-    if inserted:
-        await session.flush()
 
-    return inserted
+        rows.append({
+            "user_id": user_id,
+            "program_id": program_id,
+            "text": pain_text,
+            "original_quote": original_quote,
+            "category": "other",
+            "intensity": "medium",
+            "business_type": business_type,
+            "source_chat": source_chat,
+            "source_message_id": source_message_id,
+            "source_message_link": _trim(msg.get("link"), 255),
+            "source_user_id": safe_user_id,
+            "source_username": _trim(candidate.get("username"), 100),
+            "message_date": None,
+        })
+
+    # Pains already stored (or saved by a concurrent run) are skipped
+    # by the unique constraint
+    return await pain_collector.insert_pains(session, rows)
+
+
+async def _upsert_leads(session: AsyncSession, rows: list[dict]) -> list[Lead]:
+    """Insert or update leads with one statement on uq_lead_program_username.
+
+    Existing leads keep their status and created_at; only the qualification
+    columns are refreshed. Rows must have distinct usernames.
+    """
+    if not rows:
+        return []
+    stmt = pg_insert(Lead).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_lead_program_username",
+        set_={column: stmt.excluded[column] for column in _LEAD_UPSERT_COLUMNS},
+    ).returning(Lead)
+    result = await session.execute(
+        stmt, execution_options={"populate_existing": True}
+    )
+    return list(result.scalars().all())
 
 
 async def run_program_pipeline(
     program: Program, 
     session: AsyncSession, 
-    on_lead_found: LeadCallback = None
+    on_lead_found: LeadCallback = None,
+    run: ProgramRun | None = None,
 ) -> Dict[str, Any]:
     """
     Runs the full lead-finding pipeline, sending leads in real-time via a callback.
+
+    Sources are parsed concurrently (bounded per Telegram account) and
+    stream candidates through a bounded queue to a pool of qualification
+    workers, so each candidate is qualified as soon as its profile is ready.
+    Up to QUALIFICATION_WORKERS qualifications run at once; max_leads_per_run
+    is enforced exactly and the remaining in-flight calls are cancelled.
+
+    Qualified leads are upserted and committed in groups of
+    LEAD_COMMIT_BATCH_SIZE; on_lead_found is called once a group is committed.
+    The first lead of the run is committed on its own so its card is sent
+    right away, and a group is never held longer than
+    LEAD_COMMIT_MAX_DELAY_SECONDS.
+
+    With a `run`, stage results are checkpointed on it: the candidates of
+    each fully parsed chat, and the candidates rejected or saved as leads
+    (with each lead group and when the pipeline stops). A resumed run replays
+    the parsed chats and skips candidates it has already qualified.
     """
     program_id = program.id
     user_id = program.user_id
@@ -180,37 +247,220 @@ async def run_program_pipeline(
     if not sources:
         return {"error": "No sources found."}
 
-    all_candidates = []
-    try:
-        for source in sources:
-            logger.info(f"--- Parsing source: {source} ---")
-            candidates, _chat_messages = await members_parser.parse_users_from_messages(
-                chat_identifier=source,
-                messages_limit=config.MESSAGES_LIMIT,
-                only_with_channels=False,
-                use_batch_analysis=True  # Use batch analysis for efficiency
-            )
-            all_candidates.extend(candidates)
-    except AuthorizationRequiredError:
-        logger.warning("Authorization is required to proceed. Aborting pipeline.")
-        return {"status": "auth_required"}
-    
-    total_candidates = len(all_candidates)
-    qualified_leads_count = 0
-    pains_saved_count = 0
-    logger.info(f"--- Found a total of {total_candidates} unique candidates. ---")
-
     user_profile = await session.get(User, user_id)
     user_services_description = (
         user_profile.services_description if user_profile else ""
     )
 
-    for i, candidate in enumerate(all_candidates):
+    # Stage checkpoints of the run, restored when it is resumed
+    parsed_sources: dict[str, list] = dict(run.parsed_candidates or {}) if run else {}
+    rejected: dict[str, int] = dict(run.rejected_candidates or {}) if run else {}
+    qualified: set[str] = set(run.qualified_candidates or []) if run else set()
+    done_earlier = qualified | set(rejected)
+
+    total_candidates = 0
+    processed_candidates = 0
+    qualified_leads_count = len(qualified)
+    pains_saved_count = 0
+    skipped_unchanged_count = 0
+    # Chats Telegram could not resolve (checked here, in the worker)
+    unresolvable_sources: list[str] = []
+
+    candidate_queue: asyncio.Queue = asyncio.Queue(
+        maxsize=max(1, config.CANDIDATE_QUEUE_SIZE)
+    )
+    db_lock = asyncio.Lock()
+    limit_reached = asyncio.Event()
+    # Qualified leads waiting for the next group commit, by username
+    pending_leads: dict[str, tuple[dict, Dict[str, Any], Dict[str, Any]]] = {}
+    leads_flushed = False
+    # Commits the pending group once LEAD_COMMIT_MAX_DELAY_SECONDS have passed
+    flush_timer: asyncio.Task | None = None
+
+    async def _produce(source: str) -> None:
+        """Stream one source's candidates into the queue.
+
+        Runs under the per-account parsing concurrency limit; a full queue
+        applies backpressure to the parser.
+        """
+        nonlocal total_candidates, pains_saved_count
+        if source in parsed_sources:
+            logger.info(
+                f"--- Source {source} parsed in an earlier attempt: "
+                f"{len(parsed_sources[source])} candidates ---"
+            )
+            for candidate in parsed_sources[source]:
+                total_candidates += 1
+                await candidate_queue.put(candidate)
+            return
+
+        source_candidates = 0
+        parsed: list[Dict[str, Any]] = []
+        # Chat messages stream straight into pain extraction batches
+        pain_stream = None
+        if config.CHAT_PAIN_COLLECTION_ENABLED:
+            pain_stream = pain_collector.PainStream(
+                user_id, program_id, source, session, db_lock=db_lock
+            )
+        try:
+            async with account_semaphore(TelegramAuthManager.account_key()):
+                logger.info(f"--- Parsing source: {source} ---")
+                async for candidate in members_parser.iter_candidates(
+                    chat_identifier=source,
+                    messages_limit=config.MESSAGES_LIMIT,
+                    only_with_channels=False,
+                    use_batch_analysis=True,  # Use batch analysis for efficiency
+                    incremental=config.INCREMENTAL_PARSING_ENABLED,
+                    on_message=pain_stream.add if pain_stream else None,
+                ):
+                    total_candidates += 1
+                    source_candidates += 1
+                    if run is not None:
+                        parsed.append(candidate)
+                    await candidate_queue.put(candidate)
+            logger.info(f"--- Source {source} parsed: {source_candidates} candidates ---")
+        except members_parser.ChatNotFoundError as e:
+            logger.warning(f"--- Source {source} skipped: {e} ---")
+            unresolvable_sources.append(source)
+            if pain_stream:
+                pain_stream.cancel()
+            return
+        except BaseException:
+            if pain_stream:
+                pain_stream.cancel()
+            raise
+        if pain_stream:
+            # Outside the account semaphore: only LLM calls remain
+            pains_saved_count += await pain_stream.close()
+        if run is not None:
+            async with db_lock:
+                parsed_sources[source] = parsed
+                run.parsed_candidates = dict(parsed_sources)
+                await session.commit()
+
+    def _checkpoint(saving: list[str] | None = None) -> None:
+        """Put the qualification results on the run for the next commit.
+
+        `saving` are usernames whose leads are committed together with it.
+        """
+        if run is not None:
+            run.rejected_candidates = dict(rejected)
+            run.qualified_candidates = sorted(qualified.union(saving or []))
+
+    async def _flush_leads() -> None:
+        """Upsert and commit the pending group of leads, then report them.
+
+        Must be called with db_lock held.
+        """
+        nonlocal pains_saved_count, leads_flushed, flush_timer
+        if flush_timer is not None:
+            if flush_timer is not asyncio.current_task():
+                flush_timer.cancel()
+            flush_timer = None
+        if not pending_leads:
+            return
+        group = list(pending_leads.values())
+        pending_leads.clear()
+        leads_flushed = True
+
+        usernames = [lead_data["telegram_username"] for lead_data, _, _ in group]
+        leads = await _upsert_leads(session, [lead_data for lead_data, _, _ in group])
+        # The checkpoint is committed together with the leads, right away so
+        # the leads are available to the user; a failed commit marks none of
+        # them as qualified
+        _checkpoint(saving=usernames)
+        await session.commit()
+        qualified.update(usernames)
+        leads_by_username = {lead.telegram_username: lead for lead in leads}
+        logger.info(
+            f"Saved {len(leads)} leads for program_id={program_id}: "
+            + ", ".join(f"@{name}" for name in leads_by_username)
+        )
+
+        for lead_data, _, _ in group:
+            lead = leads_by_username.get(lead_data["telegram_username"])
+            if lead is None:
+                continue
+            # The lead card shows the program name
+            set_committed_value(lead, "program", program)
+            if on_lead_found:
+                await on_lead_found(lead)
+
+        # Save pains directly from qualified/saved leads (no heavy full-chat pass)
+        try:
+            new_pains = 0
+            for lead_data, candidate, qualification_result in group:
+                new_pains += await _save_pains_from_lead(
+                    program_id=program_id,
+                    user_id=user_id,
+                    candidate=candidate,
+                    qualification_result=qualification_result,
+                    session=session,
+                )
+            if new_pains:
+                pains_saved_count += new_pains
+                await session.commit()
+        except Exception as e:
+            logger.error(
+                f"Failed to save pains from leads of program_id={program_id}: {e}"
+            )
+            await session.rollback()
+
+    async def _rollback_quietly() -> None:
+        try:
+            await session.rollback()
+        except Exception as e:
+            logger.error(f"Rollback failed for program_id={program_id}: {e}")
+
+    async def _flush_leads_later() -> None:
+        """Commit the pending group if it has not filled up in time."""
+        await asyncio.sleep(config.LEAD_COMMIT_MAX_DELAY_SECONDS)
+        async with db_lock:
+            try:
+                await _flush_leads()
+            except Exception as e:
+                logger.error(f"Failed to save leads of program_id={program_id}: {e}")
+                await session.rollback()
+
+    async def _process_candidate(candidate: Dict[str, Any]) -> bool:
+        """Qualify and persist one candidate. Returns True once max leads is reached."""
+        nonlocal processed_candidates, qualified_leads_count, pains_saved_count
+        nonlocal skipped_unchanged_count, flush_timer
+
         if not candidate.get('username'):
-            continue
+            return False
+
+        processed_candidates += 1
+        logger.info(f"--- Processing candidate {processed_candidates}: @{candidate['username']} ---")
+
+        username = candidate['username']
+        if username in done_earlier:
+            logger.info(f"Skipping @{username}: qualified in an earlier attempt of this run.")
+            return False
+
+        existing_lead_query = select(Lead).where(
+            Lead.user_id == user_id,
+            Lead.program_id == program_id,
+            Lead.telegram_username == username,
+        )
+        fingerprint = _qualification_fingerprint(
+            candidate, program.niche_description, user_services_description
+        )
+
+        # Qualification memo: skip leads whose messages did not change
+        # since they were last qualified
+        if config.QUALIFICATION_MEMO_ENABLED and fingerprint:
+            async with db_lock:
+                known_lead = (await session.execute(existing_lead_query)).scalars().first()
+            known_profile = (known_lead.raw_user_profile_data or {}) if known_lead else {}
+            if known_profile.get("qualification_fingerprint") == fingerprint:
+                logger.info(
+                    f"Skipping @{username}: no new messages since lead "
+                    f"{known_lead.id} was qualified."
+                )
+                skipped_unchanged_count += 1
+                return False
 
-        logger.info(f"--- Processing candidate {i+1}/{total_candidates}: @{candidate['username']} ---")
-        
         qualification_result_data = await qualifier.qualify_lead_async(
             candidate,
             program.niche_description,
@@ -219,8 +469,8 @@ async def run_program_pipeline(
 
         if "error" in qualification_result_data:
             logger.error(f"Qualification error for @{candidate['username']}: {qualification_result_data['error']}")
-            continue
-        
+            return False
+
         qualification_result = qualification_result_data.get("llm_response") or {}
         raw_llm_input = qualification_result_data.get("raw_input_prompt")
 
@@ -229,146 +479,198 @@ async def run_program_pipeline(
 
         qual_details = qualification_result.get("qualification") or {}
         score = qual_details.get("score", 0) if isinstance(qual_details, dict) else 0
-            
+
         if score < program.min_score:
-            continue
+            rejected[username] = score
+            return False
 
         logger.info(f"SUCCESS: Qualified @{candidate['username']} with score {score}.")
-        qualified_leads_count += 1
-
-        username = candidate['username']
-        existing_lead_query = select(Lead).where(
-            Lead.user_id == user_id,
-            Lead.program_id == program_id,
-            Lead.telegram_username == username,
-        )
-        lead = (await session.execute(existing_lead_query)).scalars().first()
-
-        # Extract data according to the prompt schema
-        identification = qualification_result.get("identification") or {}
-        outreach_details = qualification_result.get("outreach") or {}
-        product_idea = qualification_result.get("product_idea") or {}
-
-        pains = _extract_pain_texts(qualification_result)
-
-        pains_summary = "\n• ".join(pains) if pains else None
-        if pains_summary:
-            pains_summary = "• " + pains_summary
-
-        solution_idea = product_idea.get("idea") if isinstance(product_idea, dict) else None
-
-        lead_data = {
-            "qualification_score": score,
-            "business_summary": identification.get("business_type"),
-            "pains_summary": pains_summary,
-            "solution_idea": solution_idea,
-            "recommended_message": outreach_details.get("message"),
-            "raw_qualification_data": qualification_result,
-            "raw_user_profile_data": candidate,
-            "raw_llm_input": raw_llm_input,
-        }
-
-        # DEBUG: Log what we're saving
-        logger.info(f"Saving lead data for @{username}:")
-        logger.info(f"  - business_summary: {lead_data['business_summary']}")
-        logger.info(f"  - pains_summary: {lead_data['pains_summary'][:100] if lead_data['pains_summary'] else None}...")
-        logger.info(f"  - solution_idea: {lead_data['solution_idea'][:100] if lead_data['solution_idea'] else None}...")
-        logger.info(f"  - recommended_message: {lead_data['recommended_message'][:100] if lead_data['recommended_message'] else None}...")
-
-        if lead:
-            logger.info(f"Updating existing lead {lead.id} for @{username}")
-            for key, value in lead_data.items():
-                setattr(lead, key, value)
-        else:
-            logger.info(
-                f"Creating new lead for @{username} with program_id={program_id}"
-            )
-            lead = Lead(
-                user_id=user_id,
-                program_id=program_id,
-                telegram_username=username,
-                **lead_data,
-            )
-            session.add(lead)
-
-        await session.flush()
-        await session.refresh(lead, attribute_names=['program'])
-
-        logger.info(f"Lead saved: id={lead.id}, program_id={lead.program_id}, username=@{lead.telegram_username}")
-
-        # Commit immediately so the lead is available in the database
-        # for the user to click on
-        await session.commit()
 
-        # DEBUG: Verify the lead is actually in the database
-        verification_query = select(func.count(Lead.id)).where(
-            Lead.program_id == program_id
-        )
-        verified_count = (await session.execute(verification_query)).scalar_one()
-        logger.info(
-            f"After commit: Total leads for program_id={program_id}: {verified_count}"
-        )
-
-        if on_lead_found:
-            await on_lead_found(lead)
+        # One AsyncSession is shared by all workers: serialize DB access and
+        # check the limit under the same lock so it is never overshot.
+        async with db_lock:
+            if qualified_leads_count >= program_max_leads:
+                return True
+            qualified_leads_count += 1
 
-        # Save pains directly from qualified/saved leads (no heavy full-chat pass)
-        try:
-            new_pains = await _save_pains_from_lead(
-                program_id=program_id,
-                user_id=user_id,
-                candidate=candidate,
-                qualification_result=qualification_result,
-                session=session,
+            # Extract data according to the prompt schema
+            identification = qualification_result.get("identification") or {}
+            outreach_details = qualification_result.get("outreach") or {}
+            product_idea = qualification_result.get("product_idea") or {}
+
+            pains = _extract_pain_texts(qualification_result)
+
+            pains_summary = "\n• ".join(pains) if pains else None
+            if pains_summary:
+                pains_summary = "• " + pains_summary
+
+            solution_idea = product_idea.get("idea") if isinstance(product_idea, dict) else None
+
+            lead_data = {
+                "user_id": user_id,
+                "program_id": program_id,
+                "telegram_username": username,
+                "qualification_score": score,
+                "business_summary": identification.get("business_type"),
+                "pains_summary": pains_summary,
+                "solution_idea": solution_idea,
+                "recommended_message": outreach_details.get("message"),
+                "raw_qualification_data": qualification_result,
+                "raw_user_profile_data": {
+                    **candidate,
+                    "qualification_fingerprint": fingerprint,
+                },
+                "raw_llm_input": raw_llm_input,
+            }
+
+            logger.debug(
+                f"Queued lead @{username}: score={score}, "
+                f"business_summary={lead_data['business_summary']}"
             )
-            if new_pains:
-                pains_saved_count += new_pains
-                await session.commit()
-        except Exception as e:
-            logger.error(
-                f"Failed to save pains from lead @{username}: {e}"
-            )
-            await session.rollback()
+            # A later qualification of the same username wins within a group
+            pending_leads[username] = (lead_data, candidate, qualification_result)
+            if not leads_flushed or len(pending_leads) >= max(1, config.LEAD_COMMIT_BATCH_SIZE):
+                await _flush_leads()
+            elif flush_timer is None:
+                flush_timer = asyncio.create_task(_flush_leads_later())
 
         if qualified_leads_count >= program_max_leads:
             logger.info(
                 f"Reached max leads limit of {program_max_leads}. Stopping."
             )
-            break
+            return True
+        return False
+
+    def _stop_producers() -> None:
+        for task in producer_tasks:
+            if not task.done():
+                task.cancel()
+
+    async def _consume() -> None:
+        """Qualification worker: process queued candidates until cancelled."""
+        while True:
+            candidate = await candidate_queue.get()
+            try:
+                # Drain without qualifying once the limit is reached
+                if not limit_reached.is_set() and await _process_candidate(candidate):
+                    limit_reached.set()
+                    _stop_producers()
+            except Exception:
+                _stop_producers()
+                raise
+            finally:
+                candidate_queue.task_done()
+
+    # Parsers stream candidates into a bounded queue while a pool of workers
+    # qualifies them concurrently, handling results in completion order.
+    producer_tasks = [asyncio.create_task(_produce(source)) for source in sources]
+    worker_tasks = [
+        asyncio.create_task(_consume())
+        for _ in range(max(1, config.QUALIFICATION_WORKERS))
+    ]
+    waiters: list[asyncio.Task] = []
+    pipeline_error: BaseException | None = None
+    try:
+        parse_results = await asyncio.gather(*producer_tasks, return_exceptions=True)
+        if any(isinstance(r, AuthorizationRequiredError) for r in parse_results):
+            logger.warning("Authorization is required to proceed. Aborting pipeline.")
+            return {"status": "auth_required"}
+
+        # Wait for the queue to drain or the lead limit to be reached;
+        # a worker only finishes by failing
+        waiters = [
+            asyncio.create_task(candidate_queue.join()),
+            asyncio.create_task(limit_reached.wait()),
+        ]
+        await asyncio.wait(
+            [*waiters, *worker_tasks], return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in worker_tasks:
+            if task.done():
+                task.result()
+        for result in parse_results:
+            if isinstance(result, Exception):
+                raise result
+    except BaseException as e:
+        pipeline_error = e
+        raise
+    finally:
+        _stop_producers()
+        # Holding the DB lock guarantees no worker is cancelled mid-write;
+        # in-flight qualifications beyond the limit are simply abandoned.
+        async with db_lock:
+            pending = [*producer_tasks, *worker_tasks, *waiters]
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if pipeline_error is not None:
+                # The error may have come from the session: start from a
+                # clean transaction. Unsaved results are kept in memory.
+                await _rollback_quietly()
+            # Leads found so far are kept even if the run failed
+            try:
+                await _flush_leads()
+                if run is not None:
+                    _checkpoint()
+                    await session.commit()
+            except Exception as e:
+                if pipeline_error is None:
+                    raise
+                # Never hide the error that stopped the pipeline
+                logger.error(
+                    f"Could not save the results of failed program_id={program_id}: {e}"
+                )
+                await _rollback_quietly()
+
+    logger.info(f"--- Processed a total of {total_candidates} candidates. ---")
     
     await session.commit()
 
-    # Final verification
-    final_count_query = select(func.count(Lead.id)).where(
-        Lead.program_id == program_id
-    )
-    final_count = (await session.execute(final_count_query)).scalar_one()
+    if config.PIPELINE_DEBUG_COUNTS:
+        final_count_query = select(func.count(Lead.id)).where(
+            Lead.program_id == program_id
+        )
+        final_count = (await session.execute(final_count_query)).scalar_one()
+        logger.info(f"Final lead count in DB for program_id={program_id}: {final_count}")
     logger.info(
-        f"Pipeline complete for program '{program_name}'. "
-        f"Final lead count in DB: {final_count}"
+        f"Pipeline complete for program '{program_name}': "
+        f"{qualified_leads_count} leads qualified."
     )
 
     return {
         "program_name": program_name, "candidates_found": total_candidates,
         "leads_qualified": qualified_leads_count,
         "pains_saved": pains_saved_count,
+        "skipped_unchanged": skipped_unchanged_count,
+        "unresolvable_sources": unresolvable_sources,
     }
 
 
 # --- APScheduler Job Worker ---
 
-async def run_program_job(program_id: int, chat_id: int) -> None:
+async def run_program_job(program_id: int, chat_id: int, bot: Bot | None = None) -> None:
     """
     Executed in worker process (via Celery task).
-    Creates its own Bot instance for safe isolated execution.
+
+    Without `bot` the job is self-contained: it creates its own Bot and
+    closes it and the loop's LLM HTTP pool when done (one asyncio.run() per
+    task). A persistent worker loop (bot.worker_loop) passes its long-lived
+    Bot instead and keeps both open for the next job.
     """
     logger.info(f"[JOB] Starting job for program_id={program_id}, user_chat_id={chat_id}")
-    bot = Bot(token=config.TELEGRAM_BOT_TOKEN, parse_mode="HTML")
+    owns_resources = bot is None
+    if owns_resources:
+        bot = Bot(token=config.TELEGRAM_BOT_TOKEN, parse_mode="HTML")
     try:
-        async with _PIPELINE_SEMAPHORE:
-            await _run_program_job_inner(bot, program_id, chat_id)
+        # LLM calls of the job are charged to the program owner's budget
+        with llm_gateway.budget_scope(chat_id):
+            async with _PIPELINE_SEMAPHORE:
+                await _run_program_job_inner(bot, program_id, chat_id)
     finally:
-        await bot.session.close()
+        if owns_resources:
+            await llm_gateway.aclose()
+            await bot.session.close()
 
 
 async def _run_program_job_inner(bot: Bot, program_id: int, chat_id: int) -> None:
@@ -398,16 +700,31 @@ async def _run_program_job_inner(bot: Bot, program_id: int, chat_id: int) -> Non
             )
             return
 
-        can_run, days_left = check_weekly_analysis_limit(user)
-        if not can_run:
-            await bot.send_message(
-                chat_id,
-                "⏸ Запуск пропущен: на бесплатном тарифе доступен 1 анализ в неделю. "
-                f"Следующий запуск через {days_left} дн.",
-            )
-            return
-
-        mark_analysis_started(user)
+        run = None
+        if config.PROGRAM_RUN_CHECKPOINTS_ENABLED:
+            try:
+                run = await program_runs.resume_run(session, program.id)
+            except program_runs.RunInProgressError as e:
+                logger.warning(f"[JOB] Skipping program {program_id}: {e}")
+                await bot.send_message(
+                    chat_id, f"⏳ Программа \"{program.name}\" уже выполняется."
+                )
+                return
+        # A resumed run was already counted against the weekly limit
+        if run is None:
+            can_run, days_left = check_weekly_analysis_limit(user)
+            if not can_run:
+                await session.commit()
+                await bot.send_message(
+                    chat_id,
+                    "⏸ Запуск пропущен: на бесплатном тарифе доступен 1 анализ в неделю. "
+                    f"Следующий запуск через {days_left} дн.",
+                )
+                return
+
+            mark_analysis_started(user)
+            if config.PROGRAM_RUN_CHECKPOINTS_ENABLED:
+                run = program_runs.start_run(session, program)
         await session.commit()
 
         # --- Define the real-time callback for this job ---
@@ -422,8 +739,42 @@ async def _run_program_job_inner(bot: Bot, program_id: int, chat_id: int) -> Non
                 disable_web_page_preview=True
             )
 
-        await bot.send_message(chat_id, f"⏳ Запускаю программу \"{program.name}\" в фоновом режиме...")
-        run_results = await run_program_pipeline(program, session, on_lead_found=send_lead_card_callback)
+        if run is not None and run.attempts > 1:
+            await bot.send_message(chat_id, f"⏳ Продолжаю прерванный запуск программы \"{program.name}\"...")
+        else:
+            await bot.send_message(chat_id, f"⏳ Запускаю программу \"{program.name}\" в фоновом режиме...")
+        lease = asyncio.create_task(program_runs.keep_lease(run)) if run is not None else None
+        try:
+            run_results = await run_program_pipeline(
+                program, session, on_lead_found=send_lead_card_callback, run=run
+            )
+        except llm_gateway.LLMBudgetExceededError as e:
+            logger.warning(f"[JOB] Program {program_id} stopped: {e}")
+            # A later run starts over and is counted against the weekly limit
+            if run is not None:
+                program_runs.fail_run(run)
+                await session.commit()
+            await bot.send_message(
+                chat_id,
+                "⏸ Дневной лимит запросов к ИИ исчерпан. "
+                f"Найденные лиды сохранены ({qualified_leads_count}), продолжить можно завтра.",
+            )
+            return
+        except BaseException:
+            # Interrupted: the retry of this job resumes the run right away
+            if run is not None:
+                await program_runs.release_lease(run)
+            raise
+        finally:
+            if lease is not None:
+                lease.cancel()
+
+        if run is not None:
+            if "error" in run_results or run_results.get("status") == "auth_required":
+                program_runs.fail_run(run)
+            else:
+                program_runs.finish_run(run)
+            await session.commit()
 
         if run_results.get("status") == "auth_required":
             await bot.send_message(chat_id, "Требуется авторизация в Telegram. Пожалуйста, запустите программу еще раз, чтобы войти.")
@@ -452,4 +803,11 @@ async def _run_program_job_inner(bot: Bot, program_id: int, chat_id: int) -> Non
             f"• Найдено новых лидов: {qualified_leads_count}.\n\n"
             "Теперь Вы можете вернуться к карточке программы, чтобы их просмотреть."
         )
+        unresolvable = run_results.get("unresolvable_sources")
+        if unresolvable:
+            missing = ", ".join(f"@{chat.lstrip('@')}" for chat in unresolvable)
+            final_summary_text += (
+                f"\n\n⚠️ Не удалось найти чаты: {missing}. "
+                "Проверь юзернеймы в настройках программы."
+            )
         await bot.send_message(chat_id, final_summary_text)
@@ -0,0 +1,156 @@
+"""Program runs: stage checkpoints that let a failed job resume.
+
+A job that fails late (or whose worker dies) is retried, and without
+checkpoints the retry would parse every chat and qualify every candidate
+again. The pipeline records its progress on the ProgramRun instead, and the
+next job of the program within PROGRAM_RUN_RESUME_HOURS picks it up.
+
+The job running a run holds its lease and renews it with keep_lease(). A
+run is only resumed once its lease has expired or was released, so a
+duplicate job never takes over a run that is still in progress.
+Callers commit the session.
+"""
+import asyncio
+import datetime
+import logging
+import uuid
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from bot.db_config import async_session
+from bot.models.program import Program
+from bot.models.program_run import ProgramRun
+
+logger = logging.getLogger(__name__)
+
+
+class RunInProgressError(Exception):
+    """Another job holds the lease of the program's unfinished run."""
+
+
+def _utc_now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _lease_until() -> datetime.datetime:
+    return _utc_now() + datetime.timedelta(seconds=config.PROGRAM_RUN_LEASE_SECONDS)
+
+
+def _take_lease(run: ProgramRun) -> None:
+    run.owner = uuid.uuid4().hex
+    run.lease_expires_at = _lease_until()
+
+
+def _close(run: ProgramRun, status: str) -> None:
+    run.status = status
+    run.finished_at = _utc_now()
+    run.lease_expires_at = None
+    # Parsed candidates are only needed to resume
+    run.parsed_candidates = None
+
+
+async def resume_run(session: AsyncSession, program_id: int) -> ProgramRun | None:
+    """Return the program's unfinished run to resume, expiring older ones.
+
+    Raises:
+        RunInProgressError: A run of the program is still held by its job.
+    """
+    query = (
+        select(ProgramRun)
+        .where(ProgramRun.program_id == program_id, ProgramRun.status == "running")
+        .order_by(ProgramRun.id.desc())
+        # Concurrent jobs of the program wait here until the claim is committed
+        .with_for_update()
+    )
+    runs = (await session.execute(query)).scalars().all()
+    now = _utc_now()
+    for run in runs:
+        if run.lease_expires_at is not None and run.lease_expires_at > now:
+            raise RunInProgressError(
+                f"Run {run.id} of program_id={program_id} is held by another job "
+                f"until {run.lease_expires_at:%Y-%m-%d %H:%M:%S}."
+            )
+    cutoff = now - datetime.timedelta(hours=config.PROGRAM_RUN_RESUME_HOURS)
+    resumed = None
+    for run in runs:
+        if resumed is None and run.started_at and run.started_at >= cutoff:
+            resumed = run
+        else:
+            _close(run, "expired")
+    if resumed is not None:
+        resumed.attempts = (resumed.attempts or 1) + 1
+        _take_lease(resumed)
+        logger.info(
+            f"Resuming run {resumed.id} of program_id={program_id} "
+            f"(attempt {resumed.attempts}): {len(resumed.parsed_candidates or {})} chats parsed, "
+            f"{len(resumed.qualified_candidates or [])} leads saved."
+        )
+    return resumed
+
+
+def start_run(session: AsyncSession, program: Program) -> ProgramRun:
+    """Add a new run of the program, leased to the calling job."""
+    run = ProgramRun(
+        program_id=program.id,
+        user_id=program.user_id,
+        status="running",
+        attempts=1,
+        parsed_candidates={},
+        rejected_candidates={},
+        qualified_candidates=[],
+        started_at=_utc_now(),
+    )
+    _take_lease(run)
+    session.add(run)
+    return run
+
+
+def finish_run(run: ProgramRun) -> None:
+    """Mark the run as completed so the next job starts a new one."""
+    _close(run, "completed")
+
+
+def fail_run(run: ProgramRun) -> None:
+    """Mark a run that stopped early as failed so it is never resumed."""
+    _close(run, "failed")
+
+
+async def _set_lease(run: ProgramRun, expires_at: datetime.datetime) -> bool:
+    """Move the lease of a run still held by this job; False if it was lost.
+
+    Uses its own session: the pipeline's session is busy with the run.
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            update(ProgramRun)
+            .where(
+                ProgramRun.id == run.id,
+                ProgramRun.owner == run.owner,
+                ProgramRun.status == "running",
+            )
+            .values(lease_expires_at=expires_at)
+        )
+        await session.commit()
+    return result.rowcount > 0
+
+
+async def keep_lease(run: ProgramRun) -> None:
+    """Renew the run's lease until cancelled; run it as a task next to the pipeline."""
+    while True:
+        await asyncio.sleep(config.PROGRAM_RUN_LEASE_SECONDS / 3)
+        try:
+            if not await _set_lease(run, _lease_until()):
+                logger.warning(f"Lost the lease of run {run.id}; another job may resume it.")
+                return
+        except Exception as e:
+            logger.warning(f"Could not renew the lease of run {run.id}: {e}")
+
+
+async def release_lease(run: ProgramRun) -> None:
+    """Let the next job resume an interrupted run without waiting for the lease."""
+    try:
+        await _set_lease(run, _utc_now())
+    except Exception as e:
+        logger.warning(f"Could not release the lease of run {run.id}: {e}")
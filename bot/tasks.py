@@ -1,6 +1,8 @@
 import asyncio
 import logging
 
+import config
+from bot import job_runner, worker_loop
 from bot.celery_app import celery_app
 from bot.db_config import rebind_engine
 from bot.services.program_runner import run_program_job
@@ -19,18 +21,24 @@ logger = logging.getLogger(__name__)
 )
 def run_program_job_task(self, program_id: int, chat_id: int) -> dict:
     """Execute one program run in worker process."""
-    # asyncio.run() creates a new event loop each call.
-    # Reset asyncpg pool (bound to old loop) and Telethon client (same issue).
-    rebind_engine()
-    TelegramAuthManager.force_reset()
     logger.info(
         f"[CELERY] Running program job task: program_id={program_id}, chat_id={chat_id}"
     )
-    asyncio.run(run_program_job(program_id, chat_id))
+    if config.CELERY_PERSISTENT_LOOP:
+        # DB pool, Telegram connection and bot session live on across tasks
+        worker_loop.run_program_job(program_id, chat_id)
+    else:
+        # asyncio.run() creates a new event loop each call.
+        # Reset asyncpg pool (bound to old loop) and Telethon client (same issue).
+        rebind_engine()
+        TelegramAuthManager.force_reset()
+        asyncio.run(run_program_job(program_id, chat_id))
     return {"program_id": program_id, "chat_id": chat_id}
 
 
 def enqueue_program_job(program_id: int, chat_id: int) -> str:
     """Enqueue a program job and return task id."""
+    if config.JOB_RUNNER_ENABLED:
+        return job_runner.enqueue(program_id, chat_id)
     task = run_program_job_task.delay(program_id=program_id, chat_id=chat_id)
     return task.id
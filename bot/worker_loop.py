@@ -0,0 +1,115 @@
+"""Persistent event loop for Celery worker processes.
+
+Running every task under its own asyncio.run() forces each job to build a
+new asyncpg pool, reconnect Telethon and open a new aiogram Bot session,
+because all of them are bound to the loop that created them. With
+CELERY_PERSISTENT_LOOP the worker process instead keeps one event loop in a
+background thread and submits each task's coroutine to it, so the DB pool,
+the MTProto connection, the LLM HTTP pool and the bot session are created
+once and reused by every job. The loop thread also keeps Telethon's
+keep-alive running between jobs.
+
+The loop is created lazily in the process that runs the first task (the
+solo worker itself, or a prefork child), never before a fork.
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+from aiogram import Bot
+
+import config
+from bot.db_config import dispose_engine
+from bot.services import program_runner
+from modules import llm_gateway
+from modules.telegram_client import TelegramAuthManager
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerLoop:
+    """An event loop running forever in a daemon thread of this process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._bot: Optional[Bot] = None
+
+    @property
+    def running(self) -> bool:
+        return (
+            self._loop is not None
+            and self._pid == os.getpid()
+            and self._thread is not None
+            and self._thread.is_alive()
+        )
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if not self.running:
+                # A loop inherited through fork has no thread to run it
+                self._loop = asyncio.new_event_loop()
+                self._bot = None
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="worker-event-loop",
+                    daemon=True,
+                )
+                self._thread.start()
+                logger.info(f"[WORKER] Started persistent event loop in pid={self._pid}.")
+            return self._loop
+
+    def run(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        """Run a coroutine on the persistent loop and wait for its result."""
+        loop = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def bot(self) -> Bot:
+        """The worker's Bot; its HTTP session lives as long as the loop."""
+        if self._bot is None:
+            self._bot = Bot(token=config.TELEGRAM_BOT_TOKEN, parse_mode="HTML")
+        return self._bot
+
+    async def _close_resources(self) -> None:
+        if self._bot is not None:
+            await self._bot.session.close()
+            self._bot = None
+        await llm_gateway.aclose()
+        await TelegramAuthManager.disconnect()
+        await dispose_engine()
+
+    def shutdown(self) -> None:
+        """Close the shared resources and stop the loop (idempotent)."""
+        with self._lock:
+            if not self.running:
+                return
+            loop, thread = self._loop, self._thread
+            try:
+                asyncio.run_coroutine_threadsafe(self._close_resources(), loop).result(
+                    timeout=30
+                )
+            except Exception as e:
+                logger.warning(f"[WORKER] Could not close worker resources cleanly: {e}")
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=10)
+            if not thread.is_alive():
+                loop.close()
+            self._loop = self._thread = self._pid = None
+            logger.info("[WORKER] Persistent event loop stopped.")
+
+
+worker_loop = WorkerLoop()
+
+
+async def _run_program_job(program_id: int, chat_id: int) -> None:
+    await program_runner.run_program_job(program_id, chat_id, bot=worker_loop.bot())
+
+
+def run_program_job(program_id: int, chat_id: int) -> None:
+    """Run one program job on the persistent loop with the shared bot."""
+    worker_loop.run(_run_program_job(program_id, chat_id))
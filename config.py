@@ -10,6 +10,34 @@ COMET_API_KEY = os.getenv("COMET_API_KEY")
 COMET_API_BASE_URL = os.getenv("COMET_API_BASE_URL", "https://api.cometapi.com/v1")
 COMET_API_MODEL = os.getenv("COMET_API_MODEL", "gpt-4o")
 COMET_API_POST_MODEL = os.getenv("COMET_API_POST_MODEL", COMET_API_MODEL)
+# Per-purpose models (post generation uses COMET_API_POST_MODEL)
+QUALIFICATION_MODEL = os.getenv("QUALIFICATION_MODEL", COMET_API_MODEL)
+PAIN_EXTRACTION_MODEL = os.getenv("PAIN_EXTRACTION_MODEL", COMET_API_MODEL)
+PAIN_CLUSTERING_MODEL = os.getenv("PAIN_CLUSTERING_MODEL", COMET_API_MODEL)
+# Upper bound for one awaited LLM call (qualification / batch analysis)
+LLM_CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", 120))
+# Batch pre-screening: users are split into chunks screened concurrently
+BATCH_ANALYSIS_CHUNK_TOKENS = int(os.getenv("BATCH_ANALYSIS_CHUNK_TOKENS", 6000))
+BATCH_ANALYSIS_CHUNK_MAX_USERS = int(os.getenv("BATCH_ANALYSIS_CHUNK_MAX_USERS", 60))
+BATCH_ANALYSIS_CONCURRENCY = int(os.getenv("BATCH_ANALYSIS_CONCURRENCY", 4))
+# Per-message text cap (estimated tokens) when packing messages into prompts
+PROMPT_MAX_MESSAGE_TOKENS = int(os.getenv("PROMPT_MAX_MESSAGE_TOKENS", 250))
+# Content-addressed cache of qualification responses (Redis, entries expire after TTL)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_REDIS_URL = os.getenv("LLM_CACHE_REDIS_URL", "redis://redis:6379/2")
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", 72))
+# LLM gateway: limits shared by all processes via Redis (0 disables a limit)
+LLM_GATEWAY_REDIS_URL = os.getenv("LLM_GATEWAY_REDIS_URL", LLM_CACHE_REDIS_URL)
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", 300))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", 200000))
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 20))
+# Requests in flight per process; extra calls wait in the gateway (0 = no cap)
+LLM_MAX_CONCURRENT_REQUESTS = int(
+    os.getenv("LLM_MAX_CONCURRENT_REQUESTS", LLM_HTTP_MAX_CONNECTIONS)
+)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", 2))
+LLM_USER_DAILY_TOKEN_BUDGET = int(os.getenv("LLM_USER_DAILY_TOKEN_BUDGET", 0))
 
 # Google Custom Search API
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -25,6 +53,17 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/1")
 CELERY_WORKER_CONCURRENCY = int(os.getenv("CELERY_WORKER_CONCURRENCY", 1))
+# Run tasks on one long-lived event loop per worker process (bot/worker_loop.py)
+# instead of a new asyncio.run() per task
+CELERY_PERSISTENT_LOOP = os.getenv("CELERY_PERSISTENT_LOOP", "true").lower() == "true"
+# Async job runner (bot/job_runner.py): program jobs are queued in a Redis
+# stream and run concurrently (MAX_CONCURRENT_PIPELINES) in one process
+JOB_RUNNER_ENABLED = os.getenv("JOB_RUNNER_ENABLED", "false").lower() == "true"
+JOB_QUEUE_REDIS_URL = os.getenv("JOB_QUEUE_REDIS_URL", "redis://redis:6379/3")
+JOB_QUEUE_STREAM = os.getenv("JOB_QUEUE_STREAM", "leadcore:program_jobs")
+JOB_VISIBILITY_TIMEOUT_SECONDS = float(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", 300))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 4))
+JOB_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("JOB_SHUTDOWN_TIMEOUT_SECONDS", 60))
 
 # Admin panel access (comma-separated Telegram IDs)
 _admin_ids_raw = os.getenv("ADMIN_TELEGRAM_IDS", "")
@@ -80,6 +119,15 @@ MAX_SESSION_DURATION_MINUTES = int(os.getenv("MAX_SESSION_DURATION_MINUTES", 40)
 FLOODWAIT_EXTRA_SECONDS = 10  # Extra seconds to wait after FloodWaitError
 MAX_FLOODWAIT_RETRIES = 2     # Max retries after FloodWait before stopping
 
+# Shared Telegram API rate limit (token bucket) and stage-2 profile fetch pool
+TELEGRAM_REQUESTS_PER_SECOND = float(os.getenv("TELEGRAM_REQUESTS_PER_SECOND", 2))
+TELEGRAM_REQUESTS_BURST = int(os.getenv("TELEGRAM_REQUESTS_BURST", 5))
+PROFILE_FETCH_CONCURRENCY = int(os.getenv("PROFILE_FETCH_CONCURRENCY", 4))
+# Chats of one program parsed concurrently per Telegram account
+PARSE_CONCURRENCY_PER_ACCOUNT = int(os.getenv("PARSE_CONCURRENCY_PER_ACCOUNT", 3))
+PROFILE_CACHE_TTL_HOURS = float(os.getenv("PROFILE_CACHE_TTL_HOURS", 24))
+CHAT_ENTITY_CACHE_TTL_HOURS = float(os.getenv("CHAT_ENTITY_CACHE_TTL_HOURS", 168))
+
 # Message age filtering - only consider recent messages
 MESSAGE_MAX_AGE_DAYS = int(os.getenv("MESSAGE_MAX_AGE_DAYS", 10))  # Only messages from last 10 days
 
@@ -87,6 +135,43 @@ MESSAGE_MAX_AGE_DAYS = int(os.getenv("MESSAGE_MAX_AGE_DAYS", 10))  # Only messag
 MESSAGES_LIMIT = int(os.getenv("MESSAGES_LIMIT", 500))  # Number of recent messages to parse per chat
 MAX_CONCURRENT_PIPELINES = int(os.getenv("MAX_CONCURRENT_PIPELINES", 1))
 
+# Streaming pipeline: parsed candidates wait in a bounded queue for
+# a pool of qualification workers
+CANDIDATE_QUEUE_SIZE = int(os.getenv("CANDIDATE_QUEUE_SIZE", 20))
+QUALIFICATION_WORKERS = int(os.getenv("QUALIFICATION_WORKERS", 8))
+# Checkpoint program runs (program_runs table) so a retried or interrupted
+# job resumes from the last completed stage within this many hours
+PROGRAM_RUN_CHECKPOINTS_ENABLED = (
+    os.getenv("PROGRAM_RUN_CHECKPOINTS_ENABLED", "true").lower() == "true"
+)
+PROGRAM_RUN_RESUME_HOURS = float(os.getenv("PROGRAM_RUN_RESUME_HOURS", 12))
+# A running job renews its run's lease every third of this; a run whose
+# lease expired (worker died) can be resumed by another job
+PROGRAM_RUN_LEASE_SECONDS = float(os.getenv("PROGRAM_RUN_LEASE_SECONDS", 300))
+# Skip re-qualifying existing leads whose messages did not change
+QUALIFICATION_MEMO_ENABLED = os.getenv("QUALIFICATION_MEMO_ENABLED", "true").lower() == "true"
+# Qualified leads are upserted and committed in groups of this size; the
+# first lead of a run is committed alone so its card is sent right away
+LEAD_COMMIT_BATCH_SIZE = int(os.getenv("LEAD_COMMIT_BATCH_SIZE", 5))
+# A group that does not fill up is committed after this many seconds
+LEAD_COMMIT_MAX_DELAY_SECONDS = float(os.getenv("LEAD_COMMIT_MAX_DELAY_SECONDS", 10))
+# Log the program's lead count from the database after each run (extra query)
+PIPELINE_DEBUG_COUNTS = os.getenv("PIPELINE_DEBUG_COUNTS", "false").lower() == "true"
+
+# Incremental parsing: fetch only messages newer than the stored per-chat cursor
+INCREMENTAL_PARSING_ENABLED = os.getenv("INCREMENTAL_PARSING_ENABLED", "true").lower() == "true"
+
+# On-disk message store per chat (modules/message_store.py): re-analysing a
+# chat reads its history from disk; Telegram is only asked for newer messages,
+# and not at all within MESSAGE_STORE_REFRESH_MINUTES of the last fetch
+MESSAGE_STORE_ENABLED = os.getenv("MESSAGE_STORE_ENABLED", "false").lower() == "true"
+MESSAGE_STORE_DIR = os.getenv("MESSAGE_STORE_DIR", "data/message_store")
+MESSAGE_STORE_REFRESH_MINUTES = float(os.getenv("MESSAGE_STORE_REFRESH_MINUTES", 60))
+MESSAGE_STORE_MAX_MESSAGES = int(os.getenv("MESSAGE_STORE_MAX_MESSAGES", 50000))  # Newest messages kept per chat
+
+# Process-wide LRU of resolved message senders (user entities)
+SENDER_CACHE_SIZE = int(os.getenv("SENDER_CACHE_SIZE", 10000))
+
 # Message freshness categories (for display/metadata only, not scoring)
 MESSAGE_FRESHNESS_DAYS = {
     "hot": 3,       # Messages < 3 days old
@@ -100,6 +185,9 @@ MESSAGE_FRESHNESS_DAYS = {
 #
 PAIN_COLLECTION_ENABLED = os.getenv("PAIN_COLLECTION_ENABLED", "true").lower() == "true"
 PAIN_BATCH_SIZE = int(os.getenv("PAIN_BATCH_SIZE", 25))
+# Extract pains from every text message of program chats while they are parsed
+CHAT_PAIN_COLLECTION_ENABLED = os.getenv("CHAT_PAIN_COLLECTION_ENABLED", "false").lower() == "true"
+PAIN_PROMPT_TOKEN_BUDGET = int(os.getenv("PAIN_PROMPT_TOKEN_BUDGET", 8000))  # Estimated tokens of messages per pain extraction call
 
 
 DEFAULT_CONFIG = {
@@ -0,0 +1,9 @@
+"""Load-testing tools: local stand-ins for paid/external services and a
+harness that drives the lead pipeline against them.
+
+- fake_llm: OpenAI-compatible chat completions endpoint (aiohttp)
+- fake_telegram: Telethon client replaying chat fixtures (loadtest/fixtures)
+- fakes: in-memory Redis, DB session and a synthetic chat source
+- harness: runs run_program_pipeline and reports throughput and latencies
+- bench_parser: messages/sec and allocations of the message parser
+"""
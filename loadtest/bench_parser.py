@@ -0,0 +1,174 @@
+"""Benchmark of members_parser.parse_users_from_messages on chat fixtures.
+
+Replays a fixture through FakeTelegramClient with safety delays, the
+Telegram rate limiter and LLM pre-screening switched off, so only the
+parser's own work is measured: messages/sec over several rounds, plus
+tracemalloc peak and retained memory of one extra traced round.
+
+    python -m loadtest.bench_parser --messages 20000 --users 800 --rounds 5
+    python -m loadtest.bench_parser --fixture loadtest/fixtures/sample_chat.json
+
+The pytest-benchmark suite in tests/benchmarks drives the same ParserBench.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+import config
+from loadtest.fake_telegram import ChatFixture, FakeTelegramClient, installed, synthesize_fixture
+from loadtest.fakes import patched
+from modules import members_parser, profile_fetcher
+from modules.rate_limiter import telegram_limiter
+
+SAMPLE_FIXTURE = Path(__file__).parent / "fixtures" / "sample_chat.json"
+
+
+async def _no_wait(amount: float = 1) -> None:
+    return None
+
+
+class ParserBench:
+    """Runs parse_users_from_messages over one fixture, round after round.
+
+    Use as a context manager; every round starts with cold sender and bio
+    caches so rounds are comparable.
+    """
+
+    def __init__(
+        self,
+        fixture: ChatFixture,
+        *,
+        messages_limit: int | None = None,
+        collect_all_messages: bool = False,
+    ) -> None:
+        self.fixture = fixture
+        self.messages_limit = messages_limit or len(fixture.messages)
+        self.collect_all_messages = collect_all_messages
+        self.client = FakeTelegramClient([fixture])
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stack = contextlib.ExitStack()
+
+    def __enter__(self) -> "ParserBench":
+        self._loop = asyncio.new_event_loop()
+        self._stack.enter_context(installed(self.client))
+        self._stack.enter_context(patched([
+            (config, "get_delay", lambda _delay_type: (0, 0)),
+            (config, "FLOODWAIT_EXTRA_SECONDS", 0),
+            (telegram_limiter, "acquire", _no_wait),
+        ]))
+        return self
+
+    def __exit__(self, *exc_info) -> None:  # noqa: ANN002
+        self._stack.close()
+        self._loop.close()
+
+    def reset(self) -> None:
+        members_parser._SENDER_CACHE.clear()
+        profile_fetcher._BIO_CACHE.clear()
+
+    def run_round(self) -> tuple[list[dict], list[dict]]:
+        """One cold parse of the whole fixture: (candidates, all_messages)."""
+        self.reset()
+        return self._loop.run_until_complete(members_parser.parse_users_from_messages(
+            self.fixture.chat_identifier,
+            messages_limit=self.messages_limit,
+            use_batch_analysis=False,
+            collect_all_messages=self.collect_all_messages,
+        ))
+
+    def traced_round(self) -> dict[str, int]:
+        """Run one round under tracemalloc and return its memory figures.
+
+        `peak_bytes` is the highest traced usage during the round,
+        `retained_bytes` what is still held by the returned results.
+        """
+        self.reset()
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            served_before = self.client.messages_served
+            result = self.run_round()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        messages = self.client.messages_served - served_before
+        return {
+            "messages": messages,
+            "candidates": len(result[0]),
+            "text_messages": len(result[1]),
+            "peak_bytes": peak - baseline,
+            "peak_bytes_per_message": (peak - baseline) // max(1, messages),
+            "retained_bytes": current - baseline,
+        }
+
+    def measure(self, rounds: int = 5) -> dict[str, Any]:
+        """Time `rounds` rounds, then trace one more for allocations."""
+        durations = []
+        served_before = self.client.messages_served
+        for _ in range(rounds):
+            started = time.perf_counter()
+            self.run_round()
+            durations.append(time.perf_counter() - started)
+        messages = (self.client.messages_served - served_before) // max(1, rounds)
+        median = statistics.median(durations) if durations else 0.0
+        return {
+            "rounds": rounds,
+            "messages": messages,
+            "best_seconds": round(min(durations, default=0.0), 4),
+            "median_seconds": round(median, 4),
+            "messages_per_second": round(messages / median) if median else 0,
+            "memory": self.traced_round(),
+        }
+
+
+def format_report(report: dict[str, Any]) -> str:
+    memory = report["memory"]
+    collected = (
+        f"{memory['text_messages']} collected, " if memory["text_messages"] else ""
+    )
+    return "\n".join([
+        f"Messages per round: {report['messages']} "
+        f"({collected}{memory['candidates']} candidates)",
+        f"Rounds: {report['rounds']}, best {report['best_seconds']}s, "
+        f"median {report['median_seconds']}s",
+        f"Throughput: {report['messages_per_second']} messages/s",
+        f"Peak memory: {memory['peak_bytes'] / 1024:.0f} KiB "
+        f"({memory['peak_bytes_per_message']} B/message)",
+        f"Retained by results: {memory['retained_bytes'] / 1024:.0f} KiB",
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixture", help="fixture file; a synthetic chat is generated if omitted")
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument(
+        "--all-messages", action="store_true", help="also collect all_messages"
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s")
+    # Some modules configure INFO logging on import; the parser is chatty
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.fixture:
+        fixture = ChatFixture.load(args.fixture)
+    else:
+        fixture = synthesize_fixture(messages=args.messages, users=args.users, seed=args.seed)
+    with ParserBench(fixture, collect_all_messages=args.all_messages) as bench:
+        report = bench.measure(args.rounds)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""Local stand-in for the OpenAI-compatible chat completions endpoint.
+
+Serves POST /v1/chat/completions (plain and streamed) with canned responses
+per prompt type, configurable latency and injected failures:
+
+- latency: fixed, uniform or lognormal around --latency-ms;
+- --error-rate: HTTP 500 responses;
+- --rate-limit-rate: HTTP 429 responses with a Retry-After header;
+- --truncate-rate: valid responses cut in half (truncated JSON).
+
+Prompt types are recognised by phrases of the prompt files in prompts/:
+qualification, batch_analysis, pain_extraction, pain_clustering,
+post_generation (anything else is "generic").
+
+Run standalone and point the app at it:
+
+    python -m loadtest.fake_llm --port 8099 --latency-ms 800 --rate-limit-rate 0.02
+    COMET_API_BASE_URL=http://localhost:8099/v1 COMET_API_KEY=fake ...
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from typing import Any, Callable
+
+from aiohttp import web
+
+from modules.prompt_packing import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# (prompt type, phrase found in the prompt), checked in order
+_PROMPT_MARKERS = (
+    ("batch_analysis", "массового анализа сообщений"),
+    ("pain_clustering", "Твоя задача — кластеризация"),
+    ("pain_extraction", "извлеки боли"),
+    ("post_generation", "Пишешь пост"),
+    ("qualification", "Анализируем потенциального клиента"),
+)
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+_USERNAME_RE = re.compile(r'"username":"(@?[^"]+)"')
+_MESSAGE_INDEX_RE = re.compile(r'"index":(\d+)')
+_NEW_PAIN_ID_RE = re.compile(r"- ID (\d+): \[([^\]]*)\] \[[^\]]*\]")
+
+
+def classify_prompt(prompt: str) -> str:
+    """Return the prompt type of a request."""
+    for prompt_type, marker in _PROMPT_MARKERS:
+        if marker in prompt:
+            return prompt_type
+    return "generic"
+
+
+def _qualification_response(prompt: str, rng: random.Random) -> dict:
+    score = rng.choice((0, 0, 0, 1, 2, 3, 4, 5))
+    if score == 0:
+        return {
+            "identification": {"is_business_owner": False, "business_type": "Не определён"},
+            "qualification": {"score": 0, "reasoning": "Нет конкретной боли"},
+            "identified_pains": [],
+            "product_idea": None,
+            "outreach": None,
+        }
+    return {
+        "identification": {
+            "is_business_owner": True,
+            "business_type": rng.choice(("Розница", "Доставка", "Салон красоты", "Онлайн-школа")),
+            "business_scale": "Малый бизнес",
+        },
+        "qualification": {"score": score, "reasoning": "Владелец, прямая боль"},
+        "identified_pains": rng.sample(
+            ("Теряются заявки из чата", "Долго отвечаем клиентам", "Ручной учёт заказов"),
+            k=rng.randint(1, 2),
+        ),
+        "product_idea": {"idea": "Бот для приёма заявок", "pain_addressed": "Заявки"},
+        "outreach": {"hook": "Сообщение в чате", "message": "Здравствуйте! ..."},
+    }
+
+
+def _batch_analysis_response(prompt: str, rng: random.Random) -> dict:
+    usernames = list(dict.fromkeys(_USERNAME_RE.findall(prompt)))
+    selected = [u for u in usernames if rng.random() < 0.5]
+    return {
+        "total_messages_analyzed": len(usernames),
+        "potential_leads": [
+            {
+                "username": u if u.startswith("@") else f"@{u}",
+                "priority": rng.choice(("high", "medium", "low")),
+                "pain_signals": ["ручная работа"],
+            }
+            for u in selected
+        ],
+        "filtering_stats": {
+            "analyzed": len(usernames),
+            "with_business_signals": len(selected),
+            "with_pain_signals": len(selected),
+            "selected_for_detailed_analysis": len(selected),
+        },
+    }
+
+
+def _pain_extraction_response(prompt: str, rng: random.Random) -> dict:
+    indexes = [int(i) for i in _MESSAGE_INDEX_RE.findall(prompt)]
+    return {
+        "pains": [
+            {
+                "text": "Клиенты теряются между мессенджерами",
+                "original_quote": "теряем заявки",
+                "category": rng.choice(("sales", "operations", "marketing")),
+                "intensity": rng.choice(("low", "medium", "high")),
+                "business_type": "Розница",
+                "source_message_index": index,
+            }
+            for index in indexes
+            if rng.random() < 0.3
+        ]
+    }
+
+
+def _pain_clustering_response(prompt: str, rng: random.Random) -> dict:
+    return {
+        "assignments": [
+            {
+                "pain_id": int(pain_id),
+                "cluster_id": "new",
+                "new_cluster_name": f"Боли: {category or 'other'}",
+                "new_cluster_category": category or "other",
+                "new_cluster_description": "Сгенерировано fake_llm",
+            }
+            for pain_id, category in _NEW_PAIN_ID_RE.findall(prompt)
+        ]
+    }
+
+
+def _post_generation_response(prompt: str, rng: random.Random) -> str:
+    return "Заголовок\n\nЧерновик поста, сгенерированный локальным fake_llm."
+
+
+_DEFAULT_RESPONSES: dict[str, Callable[[str, random.Random], Any]] = {
+    "qualification": _qualification_response,
+    "batch_analysis": _batch_analysis_response,
+    "pain_extraction": _pain_extraction_response,
+    "pain_clustering": _pain_clustering_response,
+    "post_generation": _post_generation_response,
+    "generic": lambda _prompt, _rng: {},
+}
+
+
+class FakeLLMSettings:
+    """Behaviour of the fake endpoint."""
+
+    def __init__(
+        self,
+        *,
+        latency: str = "lognormal",
+        latency_ms: float = 800,
+        latency_spread: float = 0.5,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after_seconds: float = 1,
+        truncate_rate: float = 0.0,
+        stream_chunk_chars: int = 40,
+        responses: dict[str, str] | None = None,
+        seed: int | None = None,
+    ) -> None:
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency}")
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.latency_spread = latency_spread
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.truncate_rate = truncate_rate
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+        # Canned response texts per prompt type (override the generators)
+        self.responses = responses or {}
+        self.seed = seed
+
+
+class FakeLLMServer:
+    """aiohttp server implementing the chat completions endpoint."""
+
+    def __init__(self, settings: FakeLLMSettings | None = None) -> None:
+        self.settings = settings or FakeLLMSettings()
+        self.rng = random.Random(self.settings.seed)
+        self.calls: dict[str, int] = {}
+        self.latencies_ms: dict[str, list[float]] = {}
+        self.injected: dict[str, int] = {"error": 0, "rate_limit": 0, "truncated": 0}
+        self._runner: web.AppRunner | None = None
+        self._counter = 0
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_post("/v1/chat/completions", self._handle)
+        app.router.add_post("/chat/completions", self._handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, access_log: bool = True) -> str:
+        """Start serving and return the base URL (with /v1)."""
+        runner_kwargs = {} if access_log else {"access_log": None}
+        self._runner = web.AppRunner(self.app(), **runner_kwargs)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{bound_port}/v1"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _latency_seconds(self) -> float:
+        s = self.settings
+        base = max(0.0, s.latency_ms) / 1000
+        if s.latency == "fixed" or base == 0:
+            return base
+        if s.latency == "uniform":
+            return self.rng.uniform(base * (1 - s.latency_spread), base * (1 + s.latency_spread))
+        # lognormal with median = latency_ms
+        return self.rng.lognormvariate(0, s.latency_spread) * base
+
+    def _content(self, prompt_type: str, prompt: str) -> str:
+        canned = self.settings.responses.get(prompt_type)
+        if canned is not None:
+            return canned
+        value = _DEFAULT_RESPONSES[prompt_type](prompt, self.rng)
+        return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+    def _error(self, status: int, message: str, headers: dict | None = None) -> web.Response:
+        return web.json_response(
+            {"error": {"message": message, "type": "fake_llm", "code": status}},
+            status=status,
+            headers=headers,
+        )
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        started = time.perf_counter()
+        body = await request.json()
+        messages = body.get("messages") or []
+        prompt = "\n".join(str(m.get("content") or "") for m in messages)
+        prompt_type = classify_prompt(prompt)
+        self.calls[prompt_type] = self.calls.get(prompt_type, 0) + 1
+        self._counter += 1
+
+        s = self.settings
+        latency = self._latency_seconds()
+        roll = self.rng.random()
+        if roll < s.rate_limit_rate:
+            self.injected["rate_limit"] += 1
+            await asyncio.sleep(latency * 0.1)
+            return self._error(
+                429, "Rate limit reached (fake)",
+                {"Retry-After": str(s.retry_after_seconds)},
+            )
+        if roll < s.rate_limit_rate + s.error_rate:
+            self.injected["error"] += 1
+            await asyncio.sleep(latency * 0.5)
+            return self._error(500, "Internal error (fake)")
+
+        content = self._content(prompt_type, prompt)
+        finish_reason = "stop"
+        if self.rng.random() < s.truncate_rate:
+            self.injected["truncated"] += 1
+            content = content[: len(content) // 2]
+            finish_reason = "length"
+
+        model = body.get("model", "fake")
+        usage = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "completion_tokens": estimate_tokens(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-fake-{self._counter}"
+        created = int(time.time())
+
+        try:
+            if not body.get("stream"):
+                await asyncio.sleep(latency)
+                return web.json_response({
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": finish_reason,
+                    }],
+                    "usage": usage,
+                })
+
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return await self._stream(
+                request, completion_id, created, model, content,
+                finish_reason, usage if include_usage else None, latency,
+            )
+        finally:
+            self.latencies_ms.setdefault(prompt_type, []).append(
+                (time.perf_counter() - started) * 1000
+            )
+
+    async def _stream(
+        self,
+        request: web.Request,
+        completion_id: str,
+        created: int,
+        model: str,
+        content: str,
+        finish_reason: str,
+        usage: dict | None,
+        latency: float,
+    ) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        def _chunk(delta: dict, finish: str | None = None, **extra) -> bytes:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                **extra,
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        size = self.settings.stream_chunk_chars
+        pieces = [content[i:i + size] for i in range(0, len(content), size)] or [""]
+        # A fifth of the latency before the first token, the rest spread over chunks
+        await asyncio.sleep(latency * 0.2)
+        await response.write(_chunk({"role": "assistant", "content": ""}))
+        for piece in pieces:
+            await asyncio.sleep(latency * 0.8 / len(pieces))
+            await response.write(_chunk({"content": piece}))
+        await response.write(_chunk({}, finish_reason))
+        if usage is not None:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [],
+                "usage": usage,
+            }
+            await response.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the FakeLLMSettings options to an argument parser."""
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-ms", type=float, default=800, help="median LLM latency")
+    parser.add_argument("--latency-spread", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of HTTP 429")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="share of cut JSON")
+    parser.add_argument(
+        "--responses",
+        help="JSON file mapping prompt type to a canned response text",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def settings_from_args(args: argparse.Namespace) -> FakeLLMSettings:
+    responses = None
+    if args.responses:
+        with open(args.responses, "r", encoding="utf-8") as f:
+            responses = json.load(f)
+    return FakeLLMSettings(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_spread=args.latency_spread,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        truncate_rate=args.truncate_rate,
+        responses=responses,
+        seed=args.seed,
+    )
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    server = FakeLLMServer(settings_from_args(args))
+    base_url = await server.start(args.host, args.port)
+    print(f"Fake LLM endpoint listening on {base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        print(f"Calls by prompt type: {server.calls}; injected: {server.injected}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
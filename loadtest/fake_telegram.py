@@ -0,0 +1,521 @@
+"""Fake Telethon client replaying recorded chats, for tests and benchmarks.
+
+FakeTelegramClient implements the part of TelegramClient the parser uses
+(get_entity, iter_messages, users.GetUsers / users.GetFullUser requests and
+session.get_input_entity) on top of chat fixtures and raises scripted
+FloodWaitError at given points. `installed()` serves it from
+TelegramAuthManager.get_client() and keeps the entity cache off the DB.
+
+Fixture files are JSON, gzip-compressed when the name ends with .gz:
+
+    {"chat": {"id": 1500000001, "username": "smm_chat", "title": "SMM"},
+     "flood_waits": [{"request": "get_full_user", "at": 3, "seconds": 1}],
+     "users": [[id, access_hash, username, first_name, last_name, flags, bio]],
+     "messages": [[id, age_seconds, sender_id, text]]}
+
+- messages are newest first; dates are stored as seconds before the moment
+  the client is created, so freshness and age limits do not drift;
+- sender_id is null for anonymous admins and negative for channel posts,
+  text is null for media without a caption;
+- user flags: "b" bot, "d" deleted, "h" not bundled with the history
+  response (resolved with GetUsersRequest instead);
+- flood_waits fire once, before the `at`-th (0-based) get_entity,
+  get_users or get_full_user call, or before the `at`-th message of
+  iter_messages.
+
+Record a real chat (usernames, names and bios are anonymised, message texts
+are kept as-is) or synthesize one:
+
+    python -m loadtest.fake_telegram record @some_chat chat.json.gz --limit 3000
+    python -m loadtest.fake_telegram synth chat.json.gz --messages 20000 --users 800
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import gzip
+import json
+import logging
+import random
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+from typing import AsyncIterator, Iterable, Iterator
+
+from telethon.errors import FloodWaitError
+from telethon.tl import functions, types
+
+from loadtest.fakes import _BUSINESS_MESSAGES, _NOISE_MESSAGES, patched
+from modules import entity_cache
+from modules.message_cursor import normalize_chat_key
+from modules.profile_fetcher import find_channel_in_bio
+from modules.rate_limiter import telegram_limiter
+from modules.telegram_client import TelegramAuthManager
+
+logger = logging.getLogger(__name__)
+
+FLOOD_WAIT_REQUESTS = ("get_entity", "iter_messages", "get_users", "get_full_user")
+_HISTORY_PAGE_SIZE = 100  # Messages per GetHistory request in Telethon
+
+_BIOS = (
+    "Владелец кофейни, пишу про малый бизнес в @coffee_notes_daily",
+    "Маркетолог. Канал: t.me/smm_every_day",
+    "Основатель студии маникюра",
+    "Интернет-магазин детской одежды",
+    None,
+)
+
+
+class ChatFixture:
+    """One chat: entity metadata, users, messages (newest first), flood waits."""
+
+    def __init__(
+        self,
+        chat: dict,
+        users: list[list],
+        messages: list[list],
+        flood_waits: list[dict] | None = None,
+    ) -> None:
+        self.chat = chat
+        self.users = users
+        self.messages = messages
+        self.flood_waits = flood_waits or []
+
+    @property
+    def chat_identifier(self) -> str:
+        """What a program would list for this chat: @username or the id."""
+        username = self.chat.get("username")
+        return f"@{username}" if username else str(self.chat["id"])
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ChatFixture":
+        for flood_wait in data.get("flood_waits", []):
+            if flood_wait["request"] not in FLOOD_WAIT_REQUESTS:
+                raise ValueError(f"Unknown flood wait request: {flood_wait['request']}")
+        return cls(data["chat"], data["users"], data["messages"], data.get("flood_waits"))
+
+    def to_dict(self) -> dict:
+        return {
+            "chat": self.chat,
+            "flood_waits": self.flood_waits,
+            "users": self.users,
+            "messages": self.messages,
+        }
+
+    @classmethod
+    def load(cls, path: str | Path) -> "ChatFixture":
+        path = Path(path)
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path: str | Path) -> None:
+        """Write the fixture with one user/message per line (diff-friendly)."""
+        def _rows(rows: list[list]) -> str:
+            return ",\n".join(json.dumps(row, ensure_ascii=False) for row in rows)
+
+        dump = lambda value: json.dumps(value, ensure_ascii=False)  # noqa: E731
+        text = (
+            f'{{"chat": {dump(self.chat)},\n'
+            f'"flood_waits": {dump(self.flood_waits)},\n'
+            f'"users": [\n{_rows(self.users)}\n],\n'
+            f'"messages": [\n{_rows(self.messages)}\n]}}\n'
+        )
+        path = Path(path)
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "wt", encoding="utf-8") as f:
+            f.write(text)
+
+
+class FakeMessage:
+    """The attributes of telethon's Message that the parser reads."""
+
+    __slots__ = ("id", "date", "text", "sender_id", "sender")
+
+    def __init__(self, message_id: int, date, text, sender_id, sender) -> None:  # noqa: ANN001
+        self.id = message_id
+        self.date = date
+        self.text = text
+        self.sender_id = sender_id
+        self.sender = sender
+
+
+class _FakeSession:
+    """session.get_input_entity() over the users known to the client."""
+
+    def __init__(self, users: dict[int, types.User]) -> None:
+        self._users = users
+
+    def get_input_entity(self, key) -> types.InputPeerUser:  # noqa: ANN001
+        user = self._users.get(_peer_id(key))
+        if user is None:
+            raise ValueError(f"Could not find the input entity for {key!r}")
+        return types.InputPeerUser(user_id=user.id, access_hash=user.access_hash)
+
+
+class _ReplayedChat:
+    __slots__ = ("id", "entity", "messages")
+
+    def __init__(self, chat_id: int, entity: types.Channel, messages: list[FakeMessage]) -> None:
+        self.id = chat_id
+        self.entity = entity
+        self.messages = messages
+
+
+def _peer_id(peer) -> int | None:  # noqa: ANN001
+    """Id of a peer given as an int, entity or input peer."""
+    if isinstance(peer, int):
+        return peer
+    for attribute in ("user_id", "channel_id", "chat_id", "id"):
+        value = getattr(peer, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+class FakeTelegramClient:
+    """TelegramClient stand-in serving chats from ChatFixture objects.
+
+    `requests` counts calls per request type ("get_history" counts the
+    100-message pages Telethon would request), `messages_served` counts
+    messages yielded by iter_messages and `flood_waits_raised` lists the
+    (request, at) pairs of the scripted FloodWaitErrors that fired.
+    """
+
+    def __init__(
+        self,
+        fixtures: Iterable[ChatFixture],
+        *,
+        authorized: bool = True,
+        now: datetime.datetime | None = None,
+    ) -> None:
+        self.authorized = authorized
+        self.now = now or datetime.datetime.now(datetime.timezone.utc)
+        self.requests: Counter[str] = Counter()
+        self.messages_served = 0
+        self.flood_waits_raised: list[tuple[str, int]] = []
+        self._chats: dict[int, _ReplayedChat] = {}
+        self._chat_keys: dict[str, int] = {}
+        self._users: dict[int, types.User] = {}
+        self._bios: dict[int, str | None] = {}
+        # (request, chat id for iter_messages else None, at) -> seconds
+        self._flood_waits: dict[tuple[str, int | None, int], int] = {}
+        self.session = _FakeSession(self._users)
+        for fixture in fixtures:
+            self.add_fixture(fixture)
+
+    def add_fixture(self, fixture: ChatFixture) -> None:
+        hidden: set[int] = set()
+        for user_id, access_hash, username, first_name, last_name, flags, bio in fixture.users:
+            self._users[user_id] = types.User(
+                id=user_id,
+                access_hash=access_hash,
+                username=username,
+                first_name=first_name,
+                last_name=last_name,
+                bot="b" in flags,
+                deleted="d" in flags,
+            )
+            self._bios[user_id] = bio
+            if "h" in flags:
+                hidden.add(user_id)
+
+        chat = fixture.chat
+        chat_id = chat["id"]
+        entity = types.Channel(
+            id=chat_id,
+            title=chat.get("title") or chat.get("username") or str(chat_id),
+            photo=types.ChatPhotoEmpty(),
+            date=None,
+            megagroup=True,
+            access_hash=chat.get("access_hash", 0),
+            username=chat.get("username"),
+        )
+        messages = [
+            FakeMessage(
+                message_id,
+                self.now - datetime.timedelta(seconds=age_seconds),
+                text,
+                sender_id,
+                None if sender_id in hidden else self._users.get(sender_id),
+            )
+            for message_id, age_seconds, sender_id, text in fixture.messages
+        ]
+        self._chats[chat_id] = _ReplayedChat(chat_id, entity, messages)
+        self._chat_keys[str(chat_id)] = chat_id
+        if chat.get("username"):
+            self._chat_keys[normalize_chat_key(chat["username"])] = chat_id
+
+        for flood_wait in fixture.flood_waits:
+            scope = chat_id if flood_wait["request"] == "iter_messages" else None
+            key = (flood_wait["request"], scope, flood_wait["at"])
+            self._flood_waits[key] = flood_wait.get("seconds", 0)
+
+    def _next_call(self, request: str) -> int:
+        index = self.requests[request]
+        self.requests[request] += 1
+        return index
+
+    def _maybe_flood_wait(self, request: str, at: int, scope: int | None = None) -> None:
+        seconds = self._flood_waits.pop((request, scope, at), None)
+        if seconds is not None:
+            self.flood_waits_raised.append((request, at))
+            raise FloodWaitError(request=None, capture=seconds)
+
+    def _find_chat(self, identifier) -> _ReplayedChat | None:  # noqa: ANN001
+        chat_id = _peer_id(identifier)
+        if chat_id is None:
+            key = normalize_chat_key(identifier)
+            if key.startswith("-100"):
+                key = key[len("-100"):]
+            chat_id = self._chat_keys.get(key)
+        return self._chats.get(chat_id)
+
+    def is_connected(self) -> bool:
+        return True
+
+    async def is_user_authorized(self) -> bool:
+        return self.authorized
+
+    async def disconnect(self) -> None:
+        return None
+
+    async def get_entity(self, identifier):  # noqa: ANN001
+        self._maybe_flood_wait("get_entity", self._next_call("get_entity"))
+        chat = self._find_chat(identifier)
+        if chat is None:
+            raise ValueError(f'No user has "{identifier}" as username')
+        return chat.entity
+
+    async def iter_messages(
+        self, entity, limit: int | None = None, min_id: int = 0, **_kwargs  # noqa: ANN001, ANN003
+    ) -> AsyncIterator[FakeMessage]:
+        chat = self._find_chat(entity)
+        if chat is None:
+            raise ValueError(f"Unknown chat: {entity!r}")
+        self.requests["iter_messages"] += 1
+        for index, message in enumerate(chat.messages):
+            if (limit is not None and index >= limit) or message.id <= min_id:
+                break
+            if index % _HISTORY_PAGE_SIZE == 0:
+                self.requests["get_history"] += 1
+            self._maybe_flood_wait("iter_messages", index, chat.id)
+            self.messages_served += 1
+            yield message
+
+    async def __call__(self, request):  # noqa: ANN001
+        if isinstance(request, functions.users.GetUsersRequest):
+            self._maybe_flood_wait("get_users", self._next_call("get_users"))
+            user_ids = [_peer_id(peer) for peer in request.id]
+            return [self._users[user_id] for user_id in user_ids if user_id in self._users]
+        if isinstance(request, functions.users.GetFullUserRequest):
+            self._maybe_flood_wait("get_full_user", self._next_call("get_full_user"))
+            user_id = _peer_id(request.id)
+            if user_id not in self._users:
+                raise ValueError(f"Unknown user: {request.id!r}")
+            return SimpleNamespace(
+                full_user=SimpleNamespace(id=user_id, about=self._bios.get(user_id)),
+                users=[self._users[user_id]],
+                chats=[],
+            )
+        raise NotImplementedError(
+            f"FakeTelegramClient does not handle {type(request).__name__}"
+        )
+
+
+@contextlib.contextmanager
+def installed(client: FakeTelegramClient) -> Iterator[FakeTelegramClient]:
+    """Serve `client` from TelegramAuthManager with the DB-backed caches off.
+
+    Chat and profile cache lookups always miss and stores are dropped, so
+    every run goes through the fake client and stays repeatable.
+    """
+    async def _get_client() -> FakeTelegramClient:
+        return client
+
+    async def _is_authorized() -> bool:
+        return await client.is_user_authorized()
+
+    async def _no_chat(chat_key: str, account: str) -> None:
+        return None
+
+    async def _no_profiles(user_ids: list[int]) -> dict:
+        return {}
+
+    async def _drop(*_args) -> None:  # noqa: ANN002
+        return None
+
+    with patched([
+        (TelegramAuthManager, "get_client", _get_client),
+        (TelegramAuthManager, "is_authorized", _is_authorized),
+        (entity_cache, "get_chat", _no_chat),
+        (entity_cache, "store_chat", _drop),
+        (entity_cache, "get_profiles", _no_profiles),
+        (entity_cache, "store_profiles", _drop),
+    ]):
+        yield client
+
+
+def synthesize_fixture(
+    *,
+    messages: int = 2000,
+    users: int = 150,
+    span_days: float = 7,
+    chat_username: str | None = "synthetic_chat",
+    seed: int = 0,
+) -> ChatFixture:
+    """Generate a chat with a realistic mix of senders and messages.
+
+    Roughly 4% of users are bots, 3% deleted and 10% have no username; 10%
+    of the rest are not bundled with the history response. About 8% of the
+    messages are media without a caption and 2% channel posts. Message
+    dates are spread evenly over the last `span_days` days.
+    """
+    rng = random.Random(seed)
+    chat_id = 1_500_000_000 + rng.randrange(100_000_000)
+    user_rows = []
+    for n in range(users):
+        roll = rng.random()
+        if roll < 0.04:
+            flags, username = "b", f"helper_{n}_bot"
+        elif roll < 0.07:
+            flags, username = "d", None
+        elif roll < 0.17:
+            flags, username = "", None
+        else:
+            flags, username = "h" if rng.random() < 0.1 else "", f"member_{n:05d}"
+        user_rows.append([
+            100_000_000 + n,
+            rng.getrandbits(62),
+            username,
+            f"Имя{n}",
+            rng.choice((None, f"Фамилия{n}")),
+            flags,
+            rng.choice(_BIOS),
+        ])
+
+    # A few talkative members write most of the messages, as in real chats
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(users)]
+    sender_ids = rng.choices([row[0] for row in user_rows], weights=weights, k=messages)
+    step = span_days * 86400 / max(1, messages)
+    message_rows = []
+    for n, sender_id in enumerate(sender_ids):
+        roll = rng.random()
+        if roll < 0.08:
+            text = None
+        else:
+            pool = _BUSINESS_MESSAGES if rng.random() < 0.3 else _NOISE_MESSAGES
+            text = rng.choice(pool)
+        if roll > 0.98:
+            sender_id = -(chat_id + 1)
+        message_rows.append([messages - n, int(n * step) + 60, sender_id, text])
+
+    chat = {"id": chat_id, "username": chat_username, "title": "Синтетический чат"}
+    return ChatFixture(chat, user_rows, message_rows)
+
+
+async def record_fixture(
+    client,  # noqa: ANN001
+    chat_identifier: str,
+    *,
+    limit: int = 1000,
+    with_bios: bool = False,
+    anonymize: bool = True,
+) -> ChatFixture:
+    """Record a chat's recent history from a real Telethon client.
+
+    Bios cost one GetFullUser call per user, so they are only fetched with
+    `with_bios` (through the shared Telegram limiter). With `anonymize`
+    usernames, names and access hashes are replaced; a bio keeps only the
+    fact that it mentions a channel. Message texts are kept verbatim -
+    review them before committing a recording.
+    """
+    await telegram_limiter.acquire()
+    entity = await client.get_entity(chat_identifier)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    user_rows: dict[int, list] = {}
+    message_rows = []
+    async for message in client.iter_messages(entity, limit=limit):
+        sender = getattr(message, "sender", None)
+        if isinstance(sender, types.User) and sender.id not in user_rows:
+            flags = ("b" if sender.bot else "") + ("d" if sender.deleted else "")
+            user_rows[sender.id] = [
+                sender.id, sender.access_hash or 0, sender.username,
+                sender.first_name, sender.last_name, flags, None,
+            ]
+        age = int((now - message.date).total_seconds()) if message.date else 0
+        message_rows.append([message.id, age, message.sender_id, message.text or None])
+
+    if with_bios:
+        for row in user_rows.values():
+            if row[2] and "b" not in row[5]:
+                await telegram_limiter.acquire()
+                full = await client(functions.users.GetFullUserRequest(id=row[0]))
+                row[6] = full.full_user.about
+
+    if anonymize:
+        for n, row in enumerate(user_rows.values()):
+            row[1] = 0
+            row[2] = f"member_{n:05d}" if row[2] else None
+            row[3] = f"Имя{n}"
+            row[4] = None
+            row[6] = f"Канал @channel_{n:05d}" if find_channel_in_bio(row[6]) else None
+
+    chat = {
+        "id": entity.id,
+        "username": getattr(entity, "username", None),
+        "title": getattr(entity, "title", None),
+    }
+    return ChatFixture(chat, list(user_rows.values()), message_rows)
+
+
+async def _record(args: argparse.Namespace) -> None:
+    if not await TelegramAuthManager.is_authorized():
+        raise SystemExit("Telegram session is not authorized; sign in through the bot first.")
+    client = await TelegramAuthManager.get_client()
+    try:
+        fixture = await record_fixture(
+            client,
+            args.chat,
+            limit=args.limit,
+            with_bios=args.with_bios,
+            anonymize=not args.keep_names,
+        )
+    finally:
+        await TelegramAuthManager.disconnect()
+    fixture.save(args.output)
+    print(f"Recorded {len(fixture.messages)} messages, {len(fixture.users)} users -> {args.output}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="record a real chat (needs an authorized session)")
+    record.add_argument("chat")
+    record.add_argument("output")
+    record.add_argument("--limit", type=int, default=1000)
+    record.add_argument("--with-bios", action="store_true", help="fetch bios (one call per user)")
+    record.add_argument("--keep-names", action="store_true", help="do not anonymise users")
+
+    synth = commands.add_parser("synth", help="generate a synthetic chat")
+    synth.add_argument("output")
+    synth.add_argument("--messages", type=int, default=2000)
+    synth.add_argument("--users", type=int, default=150)
+    synth.add_argument("--span-days", type=float, default=7)
+    synth.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.command == "record":
+        asyncio.run(_record(args))
+    else:
+        fixture = synthesize_fixture(
+            messages=args.messages, users=args.users, span_days=args.span_days, seed=args.seed
+        )
+        fixture.save(args.output)
+        print(f"Generated {len(fixture.messages)} messages, {len(fixture.users)} users -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""In-process fakes used by the load-test harness.
+
+- InMemoryRedis: the subset of redis.asyncio used by llm_cache/llm_gateway
+- MemorySession: the subset of AsyncSession used by run_program_pipeline
+- patched: temporarily replace module/class attributes
+- SyntheticChatSource: drop-in for members_parser.iter_candidates that
+  generates chat members and messages, runs the real batch pre-screening
+  and simulates Telegram history/profile fetch latency
+"""
+import asyncio
+import contextlib
+import datetime
+import random
+import time
+import zlib
+from contextlib import nullcontext
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Iterator
+
+from sqlalchemy.sql.dml import Insert
+
+import config
+from bot.models.lead import Lead
+from bot.models.pain import Pain
+from bot.models.user import User
+from modules import qualifier
+
+_BUSINESS_MESSAGES = (
+    "Заявки из чата теряются, менеджер не успевает отвечать",
+    "Кто делал бота для записи клиентов? Администратор завален звонками",
+    "Считаем заказы в экселе, постоянно ошибки с остатками",
+    "Ищу подрядчика автоматизировать рассылки по базе клиентов",
+    "Клиенты пишут в три мессенджера, всё разваливается",
+    "Как вы собираете отзывы после доставки? Вручную обзваниваем",
+)
+_NOISE_MESSAGES = (
+    "Всем привет!",
+    "Спасибо, полезно",
+    "+1",
+    "А ссылка на вебинар есть?",
+    "Подскажите, где найти запись эфира",
+)
+
+
+def _original(obj, name: str):  # noqa: ANN001
+    # Keep classmethod/staticmethod descriptors intact when patching classes
+    if isinstance(obj, type) and name in vars(obj):
+        return vars(obj)[name]
+    return getattr(obj, name)
+
+
+@contextlib.contextmanager
+def patched(patches: list[tuple[Any, str, Any]]) -> Iterator[None]:
+    """Temporarily set attributes; restored in reverse order on exit."""
+    originals = [(obj, name, _original(obj, name)) for obj, name, _ in patches]
+    try:
+        for obj, name, value in patches:
+            setattr(obj, name, value)
+        yield
+    finally:
+        for obj, name, value in reversed(originals):
+            setattr(obj, name, value)
+
+
+class InMemoryRedis:
+    """Single-process stand-in for the Redis commands the app uses."""
+
+    def __init__(self) -> None:
+        self._values: dict[str, Any] = {}
+        self._expires_at: dict[str, float] = {}
+
+    def _alive(self, key: str) -> bool:
+        expires_at = self._expires_at.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._values.pop(key, None)
+            self._expires_at.pop(key, None)
+        return key in self._values
+
+    async def get(self, key: str):
+        return self._values.get(key) if self._alive(key) else None
+
+    async def set(self, key: str, value, ex=None, px=None):  # noqa: ANN001
+        self._values[key] = value
+        self._expires_at.pop(key, None)
+        if ex is not None:
+            self._expires_at[key] = time.monotonic() + ex
+        elif px is not None:
+            self._expires_at[key] = time.monotonic() + px / 1000
+        return True
+
+    async def incrby(self, key: str, amount: int) -> int:
+        value = int(self._values.get(key, 0) if self._alive(key) else 0) + amount
+        self._values[key] = value
+        return value
+
+    async def decrby(self, key: str, amount: int) -> int:
+        return await self.incrby(key, -amount)
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        if not self._alive(key):
+            return False
+        self._expires_at[key] = time.monotonic() + seconds
+        return True
+
+    async def pttl(self, key: str) -> int:
+        if not self._alive(key):
+            return -2
+        expires_at = self._expires_at.get(key)
+        if expires_at is None:
+            return -1
+        return int((expires_at - time.monotonic()) * 1000)
+
+    async def hincrby(self, key: str, field: str, amount: int) -> int:
+        values = self._values.setdefault(key, {})
+        values[field] = int(values.get(field, 0)) + amount
+        return values[field]
+
+    async def hgetall(self, key: str) -> dict:
+        return dict(self._values.get(key) or {})
+
+
+class _Result:
+    def __init__(self, rows: list | None = None, scalar: int | None = None) -> None:
+        self._rows = rows or []
+        self._scalar = scalar
+
+    def scalars(self) -> "_Result":
+        return self
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def all(self) -> list:
+        return list(self._rows)
+
+    def scalar_one(self):
+        return self._scalar
+
+
+class MemorySession:
+    """AsyncSession stand-in keeping leads and pains in memory.
+
+    Every round trip (execute/flush/commit) sleeps `latency_ms` to model
+    the database.
+    """
+
+    def __init__(self, user: User, latency_ms: float = 0, program_name: str = "loadtest") -> None:
+        self.user = user
+        self.latency = max(0.0, latency_ms) / 1000
+        self.program_name = program_name
+        self.leads: list[Lead] = []
+        self.pains: list[Pain] = []
+        self.no_autoflush = nullcontext()
+        self.round_trips = 0
+
+    async def _round_trip(self) -> None:
+        self.round_trips += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get(self, model, key):  # noqa: ANN001
+        await self._round_trip()
+        if model is User and key == self.user.telegram_id:
+            return self.user
+        return None
+
+    def add(self, obj) -> None:  # noqa: ANN001
+        if isinstance(obj, Lead):
+            obj.id = obj.id or len(self.leads) + 1
+            self.leads.append(obj)
+        elif isinstance(obj, Pain):
+            obj.id = obj.id or len(self.pains) + 1
+            self.pains.append(obj)
+
+    async def flush(self) -> None:
+        await self._round_trip()
+
+    async def refresh(self, obj, attribute_names=None) -> None:  # noqa: ANN001
+        await self._round_trip()
+        obj.program = SimpleNamespace(name=self.program_name)
+
+    async def commit(self) -> None:
+        await self._round_trip()
+
+    async def rollback(self) -> None:
+        return None
+
+    def _upsert_leads(self, query) -> _Result:  # noqa: ANN001
+        """INSERT ... ON CONFLICT (program_id, telegram_username) DO UPDATE."""
+        updated = {column for column, _ in query._post_values_clause.update_values_to_set}
+        returned = []
+        for values in query._multi_values[0]:
+            row = {column.name: value for column, value in values.items()}
+            lead = next(
+                (lead for lead in self.leads if lead.telegram_username == row["telegram_username"]),
+                None,
+            )
+            if lead is None:
+                lead = Lead(**row)
+                self.add(lead)
+            else:
+                for key in updated:
+                    setattr(lead, key, row[key])
+            returned.append(lead)
+        return _Result(returned)
+
+    def _insert_pains(self, query) -> _Result:  # noqa: ANN001
+        """INSERT ... ON CONFLICT ON CONSTRAINT uq_pain_message_quote DO NOTHING."""
+        known = {(p.source_message_id, p.source_chat, p.original_quote) for p in self.pains}
+        inserted_ids = []
+        for values in query._multi_values[0]:
+            row = {column.name: value for column, value in values.items()}
+            key = (row["source_message_id"], row["source_chat"], row["original_quote"])
+            if key in known:
+                continue
+            known.add(key)
+            pain = Pain(**row)
+            self.add(pain)
+            inserted_ids.append(pain.id)
+        return _Result(inserted_ids)
+
+    async def execute(self, query, execution_options=None) -> _Result:  # noqa: ANN001
+        await self._round_trip()
+        if isinstance(query, Insert) and query.table.name == "leads":
+            return self._upsert_leads(query)
+        if isinstance(query, Insert) and query.table.name == "pains":
+            return self._insert_pains(query)
+        if "count(" in str(query):
+            return _Result(scalar=len(self.leads))
+        descriptions = getattr(query, "column_descriptions", None) or []
+        entity = descriptions[0].get("entity") if descriptions else None
+        if entity is Lead:
+            username = _where_value(query, "telegram_username")
+            return _Result([lead for lead in self.leads if lead.telegram_username == username])
+        return _Result()
+
+
+def _where_value(query, column_name: str):  # noqa: ANN001
+    for criterion in getattr(query, "_where_criteria", ()):
+        left = getattr(criterion, "left", None)
+        if getattr(left, "name", None) == column_name:
+            return getattr(getattr(criterion, "right", None), "value", None)
+    return None
+
+
+class SyntheticChatSource:
+    """Generates chat members for members_parser.iter_candidates' callers.
+
+    Each chat has `users_per_chat` active members with `messages_per_user`
+    messages; about `business_share` of them talk about business pains.
+    History is "fetched" in pages of 100 messages (`history_page_ms` each),
+    then the real batch pre-screening runs, then profiles are "fetched"
+    concurrently (`profile_ms` each, PROFILE_FETCH_CONCURRENCY at a time)
+    and candidates are yielded as their profile arrives.
+    """
+
+    def __init__(
+        self,
+        *,
+        users_per_chat: int = 100,
+        messages_per_user: int = 3,
+        business_share: float = 0.4,
+        history_page_ms: float = 300,
+        profile_ms: float = 150,
+        seed: int | None = None,
+    ) -> None:
+        self.users_per_chat = users_per_chat
+        self.messages_per_user = messages_per_user
+        self.business_share = business_share
+        self.history_page = max(0.0, history_page_ms) / 1000
+        self.profile = max(0.0, profile_ms) / 1000
+        self.rng = random.Random(seed)
+        # username -> perf_counter() when the candidate was yielded
+        self.emitted_at: dict[str, float] = {}
+
+    def _messages(self, chat: str, chat_id: int, user_index: int) -> list[dict]:
+        business = self.rng.random() < self.business_share
+        pool = _BUSINESS_MESSAGES if business else _NOISE_MESSAGES
+        now = datetime.datetime.now(datetime.timezone.utc)
+        messages = []
+        for n in range(self.messages_per_user):
+            message_id = user_index * self.messages_per_user + n + 1
+            date = now - datetime.timedelta(hours=self.rng.randint(1, 200))
+            messages.append({
+                "message_id": message_id,
+                "text": self.rng.choice(pool),
+                "date": date.isoformat(),
+                "chat_username": chat,
+                "chat_id": chat_id,
+                "is_public": True,
+                "link": f"https://t.me/{chat}/{message_id}",
+                "freshness": "hot" if date > now - datetime.timedelta(days=3) else "warm",
+                "age_display": "недавно",
+            })
+        return messages
+
+    async def iter_candidates(
+        self,
+        chat_identifier: str,
+        use_batch_analysis: bool = True,
+        **_kwargs,
+    ) -> AsyncIterator[dict]:
+        chat = str(chat_identifier).lstrip("@")
+        chat_id = zlib.crc32(chat.encode("utf-8"))
+        users = {
+            f"{chat}_u{i}": self._messages(chat, chat_id, i)
+            for i in range(self.users_per_chat)
+        }
+
+        total_messages = self.users_per_chat * self.messages_per_user
+        for _ in range((total_messages + 99) // 100):
+            await asyncio.sleep(self.history_page)
+
+        selected = list(users)
+        batch_data: dict[str, dict] = {}
+        if use_batch_analysis and users:
+            batch_result = await qualifier.batch_analyze_chat_async([
+                {
+                    "username": f"@{username}",
+                    "text": " | ".join(m["text"] for m in messages[:3]),
+                    "date": messages[0]["date"],
+                    "messages_count": len(messages),
+                }
+                for username, messages in users.items()
+            ])
+            if "error" not in batch_result:
+                batch_data = {
+                    lead["username"].lstrip("@"): lead
+                    for lead in batch_result.get("potential_leads", [])
+                }
+                keep = set(batch_data) | {
+                    u.lstrip("@") for u in batch_result.get("unscreened_usernames", [])
+                }
+                selected = [u for u in users if u in keep]
+
+        semaphore = asyncio.Semaphore(max(1, config.PROFILE_FETCH_CONCURRENCY))
+
+        async def _fetch_profile(username: str) -> str:
+            async with semaphore:
+                await asyncio.sleep(self.profile)
+            return username
+
+        tasks = [asyncio.create_task(_fetch_profile(u)) for u in selected]
+        try:
+            for future in asyncio.as_completed(tasks):
+                username = await future
+                self.emitted_at[username] = time.perf_counter()
+                yield self._candidate(
+                    chat_identifier, chat, chat_id, username, users[username], batch_data
+                )
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _candidate(
+        chat_identifier: str,
+        chat: str,
+        chat_id: int,
+        username: str,
+        messages: list[dict],
+        batch_data: dict[str, dict],
+    ) -> dict:
+        return {
+            "user_id": zlib.crc32(username.encode("utf-8")) % 2_000_000_000,
+            "username": username,
+            "first_name": "Test",
+            "last_name": None,
+            "bio": "Владелец бизнеса",
+            "has_channel": False,
+            "channel_username": None,
+            "source_chat": chat_identifier,
+            "source_chat_username": chat,
+            "source_chat_id": chat_id,
+            "source_chat_is_public": True,
+            "messages_in_chat": len(messages),
+            "sample_messages": [m["text"] for m in messages],
+            "messages_with_metadata": messages,
+            "has_fresh_message": any(m["freshness"] == "hot" for m in messages),
+            "batch_analysis_data": batch_data.get(username, {}),
+        }
@@ -0,0 +1,250 @@
+"""Load-test harness: run the lead pipeline against local fakes and report.
+
+Drives bot.services.program_runner.run_program_pipeline with
+- the fake OpenAI-compatible endpoint (loadtest.fake_llm) behind the real
+  LLM gateway, qualifier, batch pre-screening and JSON streaming;
+- a synthetic chat source in place of the Telegram parser;
+- in-memory Redis and DB session,
+and prints throughput, p50/p95 latency per stage and LLM calls per lead.
+
+    python -m loadtest.harness --chats 3 --users-per-chat 200 --latency-ms 600 \\
+        --workers 8 --rate-limit-rate 0.02 --truncate-rate 0.05
+
+No network access or API keys are needed.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import time
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable
+
+import config
+from bot.models.user import User
+from bot.services import program_runner
+from loadtest import fake_llm
+from loadtest.fakes import InMemoryRedis, MemorySession, SyntheticChatSource, patched
+from modules import llm_cache, llm_gateway, members_parser, qualifier
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of values (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(samples_ms: list[float]) -> dict[str, float]:
+    return {
+        "count": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 50), 1),
+        "p95_ms": round(percentile(samples_ms, 95), 1),
+        "max_ms": round(max(samples_ms, default=0.0), 1),
+    }
+
+
+class StageTimer:
+    """Collects wall-clock durations per pipeline stage."""
+
+    def __init__(self) -> None:
+        self.samples_ms: dict[str, list[float]] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.samples_ms.setdefault(stage, []).append(seconds * 1000)
+
+    def wrap(self, stage: str, func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        async def _timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started)
+
+        return _timed
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        return {stage: latency_summary(samples) for stage, samples in self.samples_ms.items()}
+
+
+async def run_load_test(
+    llm_settings: fake_llm.FakeLLMSettings,
+    source: SyntheticChatSource,
+    *,
+    chats: int = 3,
+    max_leads: int = 10_000,
+    min_score: int = 1,
+    workers: int | None = None,
+    queue_size: int | None = None,
+    db_latency_ms: float = 2,
+    requests_per_minute: int = 0,
+    tokens_per_minute: int = 0,
+) -> dict[str, Any]:
+    """Run one pipeline pass against the fakes and return the report."""
+    server = fake_llm.FakeLLMServer(llm_settings)
+    base_url = await server.start(access_log=False)
+    redis = InMemoryRedis()
+    timer = StageTimer()
+    user = User(telegram_id=1, username="loadtest", services_description="Разработка Telegram-ботов")
+    session = MemorySession(user, latency_ms=db_latency_ms)
+    program = SimpleNamespace(
+        id=1,
+        user_id=user.telegram_id,
+        name="loadtest",
+        max_leads_per_run=max_leads,
+        chats=[SimpleNamespace(chat_username=f"loadtest_chat_{i}") for i in range(chats)],
+        niche_description="Малый бизнес, которому нужна автоматизация",
+        min_score=min_score,
+        enrich=False,
+    )
+    lead_latencies: list[float] = []
+
+    async def _on_lead_found(lead) -> None:  # noqa: ANN001
+        emitted_at = source.emitted_at.get(lead.telegram_username)
+        if emitted_at is not None:
+            lead_latencies.append((time.perf_counter() - emitted_at) * 1000)
+
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        # Time between consecutive candidates of one source
+        previous = time.perf_counter()
+        async for candidate in source.iter_candidates(**kwargs):
+            now = time.perf_counter()
+            timer.record("parse_per_candidate", now - previous)
+            previous = now
+            yield candidate
+
+    patches = [
+        (config, "COMET_API_KEY", "fake-key"),
+        (config, "COMET_API_BASE_URL", base_url),
+        (config, "LLM_CACHE_ENABLED", False),
+        (config, "INCREMENTAL_PARSING_ENABLED", False),
+        (llm_cache, "_redis_client", lambda: redis),
+        (llm_gateway, "_redis_client", lambda: redis),
+        (llm_gateway._request_limiter, "per_minute", requests_per_minute),
+        (llm_gateway._token_limiter, "per_minute", tokens_per_minute),
+        (members_parser, "iter_candidates", _iter_candidates),
+        (qualifier, "batch_analyze_chat_async",
+         timer.wrap("batch_analysis", qualifier.batch_analyze_chat_async)),
+        (qualifier, "qualify_lead_async",
+         timer.wrap("qualification", qualifier.qualify_lead_async)),
+        (program_runner, "_save_pains_from_lead",
+         timer.wrap("pain_save", program_runner._save_pains_from_lead)),
+    ]
+    if workers is not None:
+        patches.append((config, "QUALIFICATION_WORKERS", workers))
+    if queue_size is not None:
+        patches.append((config, "CANDIDATE_QUEUE_SIZE", queue_size))
+
+    started = time.perf_counter()
+    try:
+        with patched(patches):
+            result = await program_runner.run_program_pipeline(
+                program, session, on_lead_found=_on_lead_found
+            )
+    finally:
+        wall = time.perf_counter() - started
+        await llm_gateway.aclose()
+        await server.stop()
+
+    stages = timer.summary()
+    stages["candidate_to_lead"] = latency_summary(lead_latencies)
+    candidates = result.get("candidates_found", 0)
+    leads = result.get("leads_qualified", 0)
+    llm_calls = sum(server.calls.values())
+    return {
+        "wall_seconds": round(wall, 2),
+        "candidates": candidates,
+        "leads": leads,
+        "candidates_per_second": round(candidates / wall, 2) if wall else 0.0,
+        "leads_per_second": round(leads / wall, 2) if wall else 0.0,
+        "stages": stages,
+        "llm": {
+            "calls": dict(server.calls),
+            "total_calls": llm_calls,
+            "calls_per_lead": round(llm_calls / leads, 2) if leads else None,
+            "injected": dict(server.injected),
+            "server_latency": {
+                prompt_type: latency_summary(samples)
+                for prompt_type, samples in server.latencies_ms.items()
+            },
+        },
+        "db_round_trips": session.round_trips,
+        "pipeline_result": result,
+    }
+
+
+def format_report(report: dict[str, Any]) -> str:
+    lines = [
+        f"Wall time: {report['wall_seconds']}s",
+        f"Candidates: {report['candidates']} ({report['candidates_per_second']}/s)",
+        f"Leads: {report['leads']} ({report['leads_per_second']}/s)",
+        "",
+        f"{'stage':<24}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}",
+    ]
+    for stage, stats in report["stages"].items():
+        lines.append(
+            f"{stage:<24}{stats['count']:>8}{stats['p50_ms']:>10}"
+            f"{stats['p95_ms']:>10}{stats['max_ms']:>10}"
+        )
+    llm = report["llm"]
+    lines += [
+        "",
+        f"LLM calls: {llm['total_calls']} {llm['calls']}",
+        f"LLM calls per lead: {llm['calls_per_lead']}",
+        f"Injected failures: {llm['injected']}",
+        f"DB round trips: {report['db_round_trips']}",
+    ]
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=3)
+    parser.add_argument("--users-per-chat", type=int, default=100)
+    parser.add_argument("--messages-per-user", type=int, default=3)
+    parser.add_argument("--history-page-ms", type=float, default=300)
+    parser.add_argument("--profile-ms", type=float, default=150)
+    parser.add_argument("--db-ms", type=float, default=2, help="latency per DB round trip")
+    parser.add_argument("--max-leads", type=int, default=10_000)
+    parser.add_argument("--min-score", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None, help="QUALIFICATION_WORKERS")
+    parser.add_argument("--queue-size", type=int, default=None, help="CANDIDATE_QUEUE_SIZE")
+    parser.add_argument("--rpm", type=int, default=0, help="gateway requests per minute")
+    parser.add_argument("--tpm", type=int, default=0, help="gateway tokens per minute")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    fake_llm.add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s")
+    # Some modules configure INFO logging on import; override it here
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    source = SyntheticChatSource(
+        users_per_chat=args.users_per_chat,
+        messages_per_user=args.messages_per_user,
+        history_page_ms=args.history_page_ms,
+        profile_ms=args.profile_ms,
+        seed=args.seed,
+    )
+    report = asyncio.run(run_load_test(
+        fake_llm.settings_from_args(args),
+        source,
+        chats=args.chats,
+        max_leads=args.max_leads,
+        min_score=args.min_score,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        db_latency_ms=args.db_ms,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+    ))
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
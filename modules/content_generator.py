@@ -4,17 +4,24 @@ import json
 import logging
 import re
 
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import config
 from bot.models.pain import Pain, PainCluster, GeneratedPost
+from modules import llm_gateway, prompt_registry
 
 logger = logging.getLogger(__name__)
 
-_PROMPT_CACHE: str | None = None
+_PROMPT_PATH = "prompts/content_generation.txt"
+_PROMPT_PLACEHOLDERS = (
+    "post_type",
+    "cluster_name",
+    "cluster_description",
+    "pain_count",
+    "sample_quotes",
+)
 DEFAULT_POST_TYPE = "single"
 _POST_TYPE_LABELS = {
     "single": "Пост по кластеру боли",
@@ -23,27 +30,17 @@ _POST_TYPE_LABELS = {
     "breakdown": "Разбор тренда",
 }
 
-try:
-    _llm = ChatOpenAI(
-        openai_api_key=config.COMET_API_KEY,
-        openai_api_base=config.COMET_API_BASE_URL,
-        model=config.COMET_API_POST_MODEL,
-        temperature=0.7,
-        request_timeout=90,
-    )
-    logger.info("content_generator: LLM client initialized.")
-except Exception as _e:
-    _llm = None
-    logger.error(f"content_generator: Failed to initialize LLM client: {_e}")
+_llm = llm_gateway.GatewayLLM(
+    "post_generation",
+    model=config.COMET_API_POST_MODEL,
+    temperature=0.7,
+    request_timeout=90,
+)
 
 
-def _load_prompt() -> str:
-    """Load and cache the content generation prompt template."""
-    global _PROMPT_CACHE
-    if _PROMPT_CACHE is None:
-        with open("prompts/content_generation.txt", "r", encoding="utf-8") as f:
-            _PROMPT_CACHE = f.read()
-    return _PROMPT_CACHE
+def _load_prompt() -> prompt_registry.PromptTemplate:
+    """Return the content generation prompt template from the shared registry."""
+    return prompt_registry.get_prompt(_PROMPT_PATH, _PROMPT_PLACEHOLDERS)
 
 
 def anonymize_quotes(quotes: list[str]) -> list[str]:
@@ -84,7 +81,7 @@ def _parse_llm_json(raw: str) -> dict:
 
 
 def _render_prompt(
-    template: str,
+    template: "prompt_registry.PromptTemplate | str",
     *,
     post_type: str,
     cluster_name: str,
@@ -97,13 +94,13 @@ def _render_prompt(
     We intentionally avoid str.format() because prompt templates contain JSON
     examples with many curly braces.
     """
-    return (
-        template
-        .replace("{post_type}", post_type)
-        .replace("{cluster_name}", cluster_name)
-        .replace("{cluster_description}", cluster_description)
-        .replace("{pain_count}", str(pain_count))
-        .replace("{sample_quotes}", sample_quotes)
+    return prompt_registry.render(
+        template,
+        post_type=post_type,
+        cluster_name=cluster_name,
+        cluster_description=cluster_description,
+        pain_count=pain_count,
+        sample_quotes=sample_quotes,
     )
 
 
@@ -0,0 +1,205 @@
+"""Entity cache: DB-backed cache of resolved Telegram chats and user profiles.
+
+Resolving a username and fetching a full profile both count heavily against
+Telegram limits, so every caller reads through this cache and only hits
+Telegram on a miss or after the configured TTL. Resolved chats are cached
+per Telegram account, like message cursors, because access hashes are.
+"""
+import datetime
+import logging
+
+from sqlalchemy import select
+from telethon import utils
+from telethon.errors import FloodWaitError, UsernameInvalidError, UsernameNotOccupiedError
+from telethon.tl import types
+
+import config
+from bot.db_config import async_session
+from bot.models.telegram_cache import TelegramChatPeer, TelegramUserProfile
+from modules.message_cursor import normalize_chat_key
+from modules.rate_limiter import telegram_limiter
+from modules.telegram_client import TelegramAuthManager
+
+logger = logging.getLogger(__name__)
+
+
+class CachedChat:
+    """Resolved chat: an input peer usable in requests plus link metadata."""
+
+    __slots__ = ("peer", "id", "username", "is_public")
+
+    def __init__(self, peer, chat_id: int, username: str | None) -> None:
+        self.peer = peer
+        self.id = chat_id
+        self.username = username
+        self.is_public = bool(username)
+
+
+def _utc_now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _trim(value: str | None, limit: int) -> str | None:
+    """Trim string values to DB column limits."""
+    return value[:limit] if value else None
+
+
+def _is_fresh(stored_at: datetime.datetime | None, ttl_hours: float) -> bool:
+    if stored_at is None:
+        return False
+    return _utc_now() - stored_at <= datetime.timedelta(hours=ttl_hours)
+
+
+def _peer_from_row(row: TelegramChatPeer):
+    """Rebuild an input peer from a cached row (no network access)."""
+    if row.entity_type == "channel":
+        return types.InputPeerChannel(channel_id=row.chat_id, access_hash=row.access_hash)
+    if row.entity_type == "user":
+        return types.InputPeerUser(user_id=row.chat_id, access_hash=row.access_hash)
+    return types.InputPeerChat(chat_id=row.chat_id)
+
+
+async def get_chat(chat_key: str, account: str) -> CachedChat | None:
+    """Return a fresh cached chat for the normalized key and account, if any."""
+    async with async_session() as session:
+        query = select(TelegramChatPeer).where(
+            TelegramChatPeer.chat_key == chat_key,
+            TelegramChatPeer.account == account,
+        )
+        row = (await session.execute(query)).scalars().first()
+    if row is None or not _is_fresh(row.resolved_at, config.CHAT_ENTITY_CACHE_TTL_HOURS):
+        return None
+    return CachedChat(_peer_from_row(row), row.chat_id, row.username)
+
+
+async def store_chat(chat_key: str, account: str, entity) -> None:
+    """Create or refresh the cached row for a resolved chat entity."""
+    input_peer = utils.get_input_peer(entity)
+    if isinstance(input_peer, types.InputPeerChannel):
+        entity_type, access_hash = "channel", input_peer.access_hash
+    elif isinstance(input_peer, types.InputPeerUser):
+        entity_type, access_hash = "user", input_peer.access_hash
+    else:
+        entity_type, access_hash = "chat", None
+
+    username = getattr(entity, "username", None)
+    async with async_session() as session:
+        query = select(TelegramChatPeer).where(
+            TelegramChatPeer.chat_key == chat_key,
+            TelegramChatPeer.account == account,
+        )
+        row = (await session.execute(query)).scalars().first()
+        if row is None:
+            row = TelegramChatPeer(chat_key=chat_key, account=account)
+            session.add(row)
+        row.chat_id = entity.id
+        row.access_hash = access_hash
+        row.entity_type = entity_type
+        row.username = username
+        row.is_public = bool(username)
+        row.resolved_at = _utc_now()
+        await session.commit()
+
+
+async def resolve_chat(client, chat_identifier: str) -> CachedChat:
+    """Resolve a chat through the cache, calling get_entity only on a miss.
+
+    Raises whatever `client.get_entity` raises for unknown chats.
+    """
+    chat_key = normalize_chat_key(chat_identifier)
+    account = TelegramAuthManager.account_key()
+    try:
+        cached = await get_chat(chat_key, account)
+    except Exception as e:
+        logger.warning(f"entity_cache: Chat cache lookup failed for '{chat_key}': {e}")
+        cached = None
+    if cached is not None:
+        logger.info(f"entity_cache: Chat '{chat_key}' served from cache.")
+        return cached
+
+    await telegram_limiter.acquire()
+    entity = await client.get_entity(chat_identifier)
+    try:
+        await store_chat(chat_key, account, entity)
+    except Exception as e:
+        logger.warning(f"entity_cache: Could not cache chat '{chat_key}': {e}")
+    return CachedChat(entity, entity.id, getattr(entity, "username", None))
+
+
+async def get_profiles(user_ids: list[int]) -> dict[int, TelegramUserProfile]:
+    """Return fresh cached profiles for the given user ids."""
+    if not user_ids:
+        return {}
+    async with async_session() as session:
+        query = select(TelegramUserProfile).where(
+            TelegramUserProfile.user_id.in_(user_ids)
+        )
+        rows = (await session.execute(query)).scalars().all()
+    return {
+        row.user_id: row
+        for row in rows
+        if _is_fresh(row.fetched_at, config.PROFILE_CACHE_TTL_HOURS)
+    }
+
+
+async def store_profiles(profiles: list[dict]) -> None:
+    """Create or refresh cached profiles.
+
+    Args:
+        profiles: Dicts with user_id, username, bio and channel_in_bio keys.
+    """
+    if not profiles:
+        return
+    by_id = {p["user_id"]: p for p in profiles}
+    async with async_session() as session:
+        query = select(TelegramUserProfile).where(
+            TelegramUserProfile.user_id.in_(list(by_id))
+        )
+        existing = {
+            row.user_id: row
+            for row in (await session.execute(query)).scalars().all()
+        }
+        now = _utc_now()
+        for user_id, data in by_id.items():
+            row = existing.get(user_id)
+            if row is None:
+                row = TelegramUserProfile(user_id=user_id)
+                session.add(row)
+            row.username = _trim(data.get("username"), 100)
+            row.bio = data.get("bio")
+            row.channel_in_bio = _trim(data.get("channel_in_bio"), 100)
+            row.fetched_at = now
+        await session.commit()
+
+
+async def find_unresolvable_chats(chat_identifiers: list[str]) -> list[str]:
+    """Return chats that Telegram cannot resolve, reading through the cache.
+
+    Chats resolved earlier by the same account need no Telegram call; the
+    client is only connected on a cache miss, and every resolved chat warms
+    the cache for the program's first run. Validation is best-effort: if
+    the client is not authorized or unavailable, nothing is reported and
+    the job reports chats it cannot find instead.
+    """
+    account = TelegramAuthManager.account_key()
+    unresolvable: list[str] = []
+    client = None
+    try:
+        for chat in chat_identifiers:
+            if await get_chat(normalize_chat_key(chat), account) is not None:
+                continue
+            if client is None:
+                if not await TelegramAuthManager.is_authorized():
+                    return []
+                client = await TelegramAuthManager.get_client()
+            try:
+                await resolve_chat(client, chat)
+            except FloodWaitError:
+                logger.warning("entity_cache: FloodWait during chat validation, skipping.")
+                return unresolvable
+            except (ValueError, UsernameInvalidError, UsernameNotOccupiedError):
+                unresolvable.append(chat)
+    except Exception as e:
+        logger.warning(f"entity_cache: Chat validation skipped: {e}")
+        return []
+    return unresolvable
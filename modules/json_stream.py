@@ -0,0 +1,115 @@
+"""Incremental JSON parsing of streamed LLM output.
+
+LLM responses in this project are JSON objects whose payload is one array
+(`potential_leads`, `pains`, `assignments`). JsonArrayStream is fed the
+completion chunk by chunk and emits every element of that array as soon as
+its closing brace arrives, so callers can act on early elements while the
+model is still generating, and a truncated response loses only its tail.
+"""
+import json
+from typing import Any, Callable
+
+
+class JsonArrayStream:
+    """Emit the objects of one named JSON array from a growing text."""
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.items: list[dict[str, Any]] = []
+        self._buffer = ""
+        self._pos = 0
+        self._array_open = False
+        self._done = False
+        self._depth = 0
+        self._obj_start = -1
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._buffer
+
+    def feed(self, chunk: str) -> list[dict[str, Any]]:
+        """Consume the next piece of text; return newly completed elements."""
+        if not chunk:
+            return []
+        self._buffer += chunk
+        if self._done:
+            return []
+
+        if not self._array_open:
+            key_idx = self._buffer.find(f'"{self.key}"')
+            if key_idx == -1:
+                return []
+            array_start = self._buffer.find("[", key_idx + len(self.key) + 2)
+            if array_start == -1:
+                return []
+            self._array_open = True
+            self._pos = array_start + 1
+
+        completed: list[dict[str, Any]] = []
+        text = self._buffer
+        i = self._pos
+        while i < len(text):
+            ch = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0 and self._obj_start != -1:
+                    try:
+                        obj = json.loads(text[self._obj_start:i + 1])
+                    except json.JSONDecodeError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        completed.append(obj)
+                    self._obj_start = -1
+            elif ch == "]" and self._depth == 0:
+                self._done = True
+                i += 1
+                break
+            i += 1
+        self._pos = i
+        self.items.extend(completed)
+        return completed
+
+
+def extract_array_items(text: str, key: str) -> list[dict[str, Any]]:
+    """Return the complete objects of array `key` in a (possibly cut) text."""
+    stream = JsonArrayStream(key)
+    stream.feed(text or "")
+    return stream.items
+
+
+async def astream_json(
+    llm,
+    messages: list,
+    stream: JsonArrayStream,
+    on_item: Callable[[dict[str, Any]], None] | None = None,
+) -> str:
+    """Stream an LLM completion through `stream`, returning the full text.
+
+    on_item is called for each array element as soon as it is complete. If
+    the call fails midway (e.g. a timeout), `stream.items` still holds every
+    element received so far.
+    """
+    async for chunk in llm.astream(messages):
+        content = getattr(chunk, "content", chunk)
+        if not isinstance(content, str):
+            continue
+        for item in stream.feed(content):
+            if on_item is not None:
+                on_item(item)
+    return stream.text
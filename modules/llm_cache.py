@@ -0,0 +1,107 @@
+"""LLM response cache: content-addressed, Redis-backed, with a TTL.
+
+Keys are sha256 hashes of everything that determines the answer (prompt
+version, model, inputs), so identical requests are served without an API
+call. Entries expire after the TTL; when Redis runs out of memory it evicts
+them according to its maxmemory-policy (volatile-lru recommended).
+
+The cache is best-effort: any Redis error is logged and treated as a miss.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import weakref
+
+import redis.asyncio as redis
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Per-loop clients: a redis.asyncio connection pool is bound to the loop that
+# created it (each Celery task runs in its own asyncio.run()).
+_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, redis.Redis]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _redis_client() -> redis.Redis:
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(loop)
+    if client is None:
+        client = redis.from_url(config.LLM_CACHE_REDIS_URL, decode_responses=True)
+        _CLIENTS[loop] = client
+    return client
+
+
+def make_key(*parts) -> str:
+    """Hash JSON-serializable parts into a stable cache key."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Cache of raw LLM response texts for one purpose (namespace)."""
+
+    def __init__(self, namespace: str, ttl_seconds: float) -> None:
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_key(self, key: str) -> str:
+        return f"llmcache:{self.namespace}:{key}"
+
+    def _stats_key(self) -> str:
+        return f"llmcache:{self.namespace}:stats"
+
+    async def _count(self, field: str) -> None:
+        try:
+            await _redis_client().hincrby(self._stats_key(), field, 1)
+        except Exception as e:
+            logger.debug(f"LLM cache stats update failed: {e}")
+
+    async def get(self, key: str) -> str | None:
+        """Return the cached response for key, or None on a miss."""
+        if not config.LLM_CACHE_ENABLED:
+            return None
+        try:
+            value = await _redis_client().get(self._entry_key(key))
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed ({self.namespace}): {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+            await self._count("misses")
+        else:
+            self.hits += 1
+            await self._count("hits")
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        """Store a response for key with the cache TTL."""
+        if not config.LLM_CACHE_ENABLED:
+            return
+        try:
+            await _redis_client().set(
+                self._entry_key(key), value, ex=max(1, int(self.ttl_seconds))
+            )
+        except Exception as e:
+            logger.warning(f"LLM cache store failed ({self.namespace}): {e}")
+
+    async def stats(self) -> dict[str, int]:
+        """Hit/miss counters shared by all workers (falls back to local ones)."""
+        try:
+            raw = await _redis_client().hgetall(self._stats_key())
+            return {
+                "hits": int(raw.get("hits", 0)),
+                "misses": int(raw.get("misses", 0)),
+            }
+        except Exception:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+qualification_cache = LLMResponseCache(
+    "qualification", ttl_seconds=config.LLM_CACHE_TTL_HOURS * 3600
+)
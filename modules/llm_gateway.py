@@ -0,0 +1,374 @@
+"""LLM gateway: the single entry point for chat completion calls.
+
+Every module talks to the provider through a GatewayLLM, which adds what
+independent ChatOpenAI instances lack:
+
+- one pooled async HTTP client per event loop, shared by all purposes;
+- requests- and tokens-per-minute limits shared by every process (bot and
+  Celery workers) through Redis fixed one-minute windows, with an
+  in-process token bucket as a fallback when Redis is unavailable;
+- a cap on requests in flight per process (LLM_MAX_CONCURRENT_REQUESTS),
+  so many concurrent jobs queue in the gateway instead of timing out while
+  waiting for a pooled connection;
+- retry with exponential backoff on 429/5xx and connection errors; a 429
+  pauses all callers for the Retry-After delay;
+- per-user daily token budgets (see budget_scope());
+- a model per purpose (qualification, pain extraction, clustering, posts).
+
+Token counts for the limits are estimated with prompt_packing; budgets are
+charged with the usage reported by the provider when it is available.
+"""
+import asyncio
+import contextlib
+import contextvars
+import datetime
+import logging
+import random
+import time
+import weakref
+from typing import Any, AsyncIterator
+
+import httpx
+import openai
+import redis.asyncio as redis
+from langchain_openai import ChatOpenAI
+
+import config
+from modules.prompt_packing import estimate_tokens
+from modules.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Tokens reserved for the completion when checking the tokens-per-minute limit
+_COMPLETION_TOKENS_RESERVE = 500
+_RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+_PAUSE_KEY = "llmgw:paused"
+
+
+class LLMBudgetExceededError(RuntimeError):
+    """Raised when the current user has used up the daily token budget."""
+
+
+# User whose budget LLM calls are charged to (None: not charged)
+_BUDGET_USER: contextvars.ContextVar[int | None] = contextvars.ContextVar(
+    "llm_budget_user", default=None
+)
+
+
+@contextlib.contextmanager
+def budget_scope(user_id: int | None):
+    """Charge LLM calls made inside the block (and tasks it spawns) to user_id."""
+    token = _BUDGET_USER.set(user_id)
+    try:
+        yield
+    finally:
+        _BUDGET_USER.reset(token)
+
+
+# Per-loop resources: httpx and redis.asyncio pools are bound to the loop
+# that created them (each Celery task runs in its own asyncio.run()).
+_HTTP_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_REDIS_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, redis.Redis]" = (
+    weakref.WeakKeyDictionary()
+)
+_REQUEST_SLOTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+_CHAT_MODELS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple, ChatOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _http_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _HTTP_CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        connections = max(1, config.LLM_HTTP_MAX_CONNECTIONS)
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=connections,
+                max_keepalive_connections=connections,
+            ),
+        )
+        _HTTP_CLIENTS[loop] = client
+    return client
+
+
+def _redis_client() -> redis.Redis:
+    loop = asyncio.get_running_loop()
+    client = _REDIS_CLIENTS.get(loop)
+    if client is None:
+        client = redis.from_url(config.LLM_GATEWAY_REDIS_URL, decode_responses=True)
+        _REDIS_CLIENTS[loop] = client
+    return client
+
+
+def _request_slot() -> contextlib.AbstractAsyncContextManager:
+    """Slot for one request in flight on the current loop."""
+    if config.LLM_MAX_CONCURRENT_REQUESTS <= 0:
+        return contextlib.nullcontext()
+    loop = asyncio.get_running_loop()
+    semaphore = _REQUEST_SLOTS.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(config.LLM_MAX_CONCURRENT_REQUESTS)
+        _REQUEST_SLOTS[loop] = semaphore
+    return semaphore
+
+
+async def aclose() -> None:
+    """Close the current loop's HTTP pool (call before the loop ends)."""
+    loop = asyncio.get_running_loop()
+    _CHAT_MODELS.pop(loop, None)
+    client = _HTTP_CLIENTS.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+class _MinuteWindowLimiter:
+    """Per-minute allowance shared by all processes through Redis.
+
+    Each acquire() adds its amount to the counter of the current one-minute
+    window; if that overshoots the limit the amount is given back and the
+    caller sleeps until the next window. Without Redis the limit is enforced
+    per process by a token bucket refilled at the same rate.
+    """
+
+    def __init__(self, name: str, per_minute: int) -> None:
+        self.name = name
+        self.per_minute = per_minute
+        self._local = TokenBucket(rate=max(per_minute, 1) / 60, capacity=max(per_minute, 1))
+        self._limiting_locally = False
+
+    async def acquire(self, amount: int = 1) -> None:
+        if self.per_minute <= 0:
+            return
+        amount = max(1, min(int(amount), self.per_minute))
+        while True:
+            now = time.time()
+            window = int(now // 60)
+            key = f"llmgw:{self.name}:{window}"
+            try:
+                client = _redis_client()
+                used = await client.incrby(key, amount)
+                if self._limiting_locally:
+                    self._limiting_locally = False
+                    logger.info(f"LLM gateway: shared {self.name} limit is back.")
+                if used == amount:
+                    await client.expire(key, 120)
+                if used <= self.per_minute:
+                    return
+                await client.decrby(key, amount)
+            except Exception as e:
+                if not self._limiting_locally:
+                    self._limiting_locally = True
+                    logger.warning(f"LLM gateway: shared {self.name} limit unavailable, limiting locally: {e}")
+                await self._local.acquire(amount)
+                return
+            await asyncio.sleep((window + 1) * 60 - now + random.uniform(0, 1))
+
+
+_request_limiter = _MinuteWindowLimiter("rpm", config.LLM_REQUESTS_PER_MINUTE)
+_token_limiter = _MinuteWindowLimiter("tpm", config.LLM_TOKENS_PER_MINUTE)
+
+
+async def _wait_if_paused() -> None:
+    try:
+        pause_ms = await _redis_client().pttl(_PAUSE_KEY)
+    except Exception:
+        return
+    if pause_ms and pause_ms > 0:
+        await asyncio.sleep(pause_ms / 1000)
+
+
+async def _pause_all(seconds: float) -> None:
+    """Hold off callers in every process after the provider returned 429."""
+    try:
+        await _redis_client().set(_PAUSE_KEY, "1", px=max(1, int(seconds * 1000)))
+    except Exception as e:
+        logger.debug(f"LLM gateway: could not share the 429 pause: {e}")
+
+
+async def _acquire_capacity(tokens: int) -> None:
+    await _wait_if_paused()
+    await _request_limiter.acquire(1)
+    await _token_limiter.acquire(tokens)
+
+
+def _budget_key(user_id: int) -> str:
+    day = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d")
+    return f"llmgw:budget:{user_id}:{day}"
+
+
+async def _check_budget(user_id: int | None) -> None:
+    if user_id is None or config.LLM_USER_DAILY_TOKEN_BUDGET <= 0:
+        return
+    try:
+        used = int(await _redis_client().get(_budget_key(user_id)) or 0)
+    except Exception as e:
+        logger.warning(f"LLM gateway: budget check failed for user {user_id}: {e}")
+        return
+    if used >= config.LLM_USER_DAILY_TOKEN_BUDGET:
+        raise LLMBudgetExceededError(
+            f"Daily LLM token budget exhausted for user {user_id} "
+            f"({used}/{config.LLM_USER_DAILY_TOKEN_BUDGET})"
+        )
+
+
+async def _charge_budget(user_id: int | None, tokens: int) -> None:
+    if user_id is None or config.LLM_USER_DAILY_TOKEN_BUDGET <= 0 or tokens <= 0:
+        return
+    try:
+        client = _redis_client()
+        key = _budget_key(user_id)
+        await client.incrby(key, tokens)
+        await client.expire(key, 2 * 24 * 3600)
+    except Exception as e:
+        logger.warning(f"LLM gateway: budget update failed for user {user_id}: {e}")
+
+
+def _estimate_messages(messages: list) -> int:
+    return sum(estimate_tokens(str(getattr(m, "content", m))) for m in messages)
+
+
+def _used_tokens(usage: dict | None, prompt_tokens: int, completion_text: str) -> int:
+    if usage and usage.get("total_tokens"):
+        return int(usage["total_tokens"])
+    return prompt_tokens + estimate_tokens(completion_text)
+
+
+def _retry_after(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(error: Exception, attempt: int) -> float | None:
+    """Seconds to wait before retrying after error, or None to give up."""
+    if attempt >= config.LLM_MAX_RETRIES:
+        return None
+    status = getattr(error, "status_code", None)
+    connection_error = isinstance(error, (openai.APIConnectionError, httpx.TransportError))
+    if status not in _RETRYABLE_STATUS_CODES and not connection_error:
+        return None
+    delay = config.LLM_RETRY_BASE_DELAY_SECONDS * (2 ** attempt) * random.uniform(0.8, 1.2)
+    if status == 429:
+        delay = max(delay, _retry_after(error) or 0)
+    return delay
+
+
+class GatewayLLM:
+    """Chat model for one purpose, called through the gateway.
+
+    Exposes the ainvoke()/astream() subset of ChatOpenAI used in this project.
+    """
+
+    def __init__(
+        self,
+        purpose: str,
+        *,
+        model: str,
+        temperature: float,
+        request_timeout: float,
+    ) -> None:
+        self.purpose = purpose
+        self.model = model
+        self.temperature = temperature
+        self.request_timeout = request_timeout
+
+    def __bool__(self) -> bool:
+        return bool(config.COMET_API_KEY)
+
+    def _chat_model(self) -> ChatOpenAI:
+        loop = asyncio.get_running_loop()
+        models = _CHAT_MODELS.setdefault(loop, {})
+        key = (config.COMET_API_BASE_URL, self.model, self.temperature, self.request_timeout)
+        chat_model = models.get(key)
+        if chat_model is None:
+            chat_model = ChatOpenAI(
+                openai_api_key=config.COMET_API_KEY,
+                openai_api_base=config.COMET_API_BASE_URL,
+                model=self.model,
+                temperature=self.temperature,
+                request_timeout=self.request_timeout,
+                max_retries=0,  # retries are done by the gateway
+                stream_usage=True,
+                http_async_client=_http_client(),
+            )
+            models[key] = chat_model
+        return chat_model
+
+    async def _before_retry(self, error: Exception, attempt: int) -> bool:
+        delay = _retry_delay(error, attempt)
+        if delay is None:
+            return False
+        if getattr(error, "status_code", None) == 429:
+            await _pause_all(delay)
+        logger.warning(
+            f"LLM gateway [{self.purpose}]: {type(error).__name__}: {error}; "
+            f"retry {attempt + 1}/{config.LLM_MAX_RETRIES} in {delay:.1f}s"
+        )
+        await asyncio.sleep(delay)
+        return True
+
+    async def ainvoke(self, messages: list) -> Any:
+        """Return the model response for messages."""
+        user_id = _BUDGET_USER.get()
+        await _check_budget(user_id)
+        prompt_tokens = _estimate_messages(messages)
+        attempt = 0
+        while True:
+            await _acquire_capacity(prompt_tokens + _COMPLETION_TOKENS_RESERVE)
+            try:
+                async with _request_slot():
+                    response = await self._chat_model().ainvoke(messages)
+            except Exception as e:
+                if not await self._before_retry(e, attempt):
+                    raise
+                attempt += 1
+                continue
+            content = getattr(response, "content", "")
+            await _charge_budget(
+                user_id,
+                _used_tokens(
+                    getattr(response, "usage_metadata", None),
+                    prompt_tokens,
+                    content if isinstance(content, str) else "",
+                ),
+            )
+            return response
+
+    async def astream(self, messages: list) -> AsyncIterator[Any]:
+        """Yield response chunks for messages.
+
+        A failed call is retried only if nothing was streamed yet.
+        """
+        user_id = _BUDGET_USER.get()
+        await _check_budget(user_id)
+        prompt_tokens = _estimate_messages(messages)
+        attempt = 0
+        while True:
+            await _acquire_capacity(prompt_tokens + _COMPLETION_TOKENS_RESERVE)
+            streamed: list[str] = []
+            usage = None
+            yielded = False
+            try:
+                async with _request_slot():
+                    async for chunk in self._chat_model().astream(messages):
+                        content = getattr(chunk, "content", "")
+                        if isinstance(content, str):
+                            streamed.append(content)
+                        usage = getattr(chunk, "usage_metadata", None) or usage
+                        yielded = True
+                        yield chunk
+            except Exception as e:
+                if yielded or not await self._before_retry(e, attempt):
+                    raise
+                attempt += 1
+                continue
+            await _charge_budget(user_id, _used_tokens(usage, prompt_tokens, "".join(streamed)))
+            return
@@ -1,15 +1,20 @@
 import asyncio
+import contextlib
 import random
-import re
 import logging
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import Optional
+from typing import AsyncIterator, Awaitable, Callable, Optional
 
 import telethon.tl.types
-from telethon.errors import FloodWaitError
+from telethon.errors import FloodWaitError, UsernameInvalidError, UsernameNotOccupiedError
+from telethon.tl import functions
 
 from modules.telegram_client import TelegramAuthManager, AuthorizationRequiredError
-from modules.qualifier import batch_analyze_chat
+from modules.qualifier import batch_analyze_chat_async
+from modules import entity_cache, llm_gateway, message_cursor, message_store, profile_fetcher
+from modules.profile_fetcher import find_channel_in_bio
+from modules.rate_limiter import telegram_limiter
 import config
 
 logging.basicConfig(
@@ -17,6 +22,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Telethon fetches history in pages of 100 messages
+_SENDER_PAGE_SIZE = 100
+_GET_USERS_BATCH_SIZE = 100
+
+# Process-wide LRU of resolved senders: user_id -> telethon User
+_SENDER_CACHE: "OrderedDict[int, telethon.tl.types.User]" = OrderedDict()
+
 
 class ParsingPausedError(Exception):
     """Raised when parsing is paused due to repeated FloodWait errors."""
@@ -24,17 +36,10 @@ class ParsingPausedError(Exception):
     pass
 
 
-def find_channel_in_bio(bio_text: str) -> str | None:
-    """Finds a potential personal channel link in a user's bio."""
-    if not bio_text:
-        return None
-    match = re.search(r'(?<!\w)@([a-zA-Z0-9_]{5,32})', bio_text)
-    if match:
-        return match.group(0)
-    match = re.search(r't\.me\/([a-zA-Z0-9_]{5,32})', bio_text)
-    if match:
-        return "t.me/" + match.group(1)
-    return None
+class ChatNotFoundError(Exception):
+    """Raised when Telegram cannot resolve the chat to parse."""
+
+    pass
 
 
 def generate_message_link(
@@ -62,16 +67,20 @@ def generate_message_link(
     return None
 
 
-def get_message_freshness(message_date: datetime) -> str:
+def get_message_freshness(
+    message_date: datetime, now: Optional[datetime] = None
+) -> str:
     """
     Determine freshness category for a message.
 
+    `now` (aware UTC) lets callers share one timestamp across many messages.
+
     Returns: 'hot', 'warm', 'cold', or 'stale'
     """
     if not message_date:
         return "stale"
 
-    now = datetime.now(timezone.utc)
+    now = now or datetime.now(timezone.utc)
     if message_date.tzinfo is None:
         message_date = message_date.replace(tzinfo=timezone.utc)
 
@@ -86,12 +95,14 @@ def get_message_freshness(message_date: datetime) -> str:
     return "stale"
 
 
-def format_message_age(message_date: datetime) -> str:
+def format_message_age(
+    message_date: datetime, now: Optional[datetime] = None
+) -> str:
     """Format message age for display."""
     if not message_date:
         return "дата неизвестна"
 
-    now = datetime.now(timezone.utc)
+    now = now or datetime.now(timezone.utc)
     if message_date.tzinfo is None:
         message_date = message_date.replace(tzinfo=timezone.utc)
 
@@ -111,6 +122,215 @@ def format_message_age(message_date: datetime) -> str:
         return "больше месяца назад"
 
 
+def _message_age_days(
+    message_date: Optional[datetime], now: Optional[datetime] = None
+) -> int:
+    """Return message age in full days (999 if the date is unknown)."""
+    if not message_date:
+        return 999
+    if message_date.tzinfo is None:
+        message_date = message_date.replace(tzinfo=timezone.utc)
+    return ((now or datetime.now(timezone.utc)) - message_date).days
+
+
+def _parse_window_date(raw_date: Optional[str]) -> Optional[datetime]:
+    """Parse ISO date stored in a cursor window record."""
+    if not raw_date:
+        return None
+    try:
+        return datetime.fromisoformat(raw_date)
+    except ValueError:
+        return None
+
+
+def _is_lead_sender(sender) -> bool:
+    """Check that a message sender is a real user we can contact."""
+    if not sender:
+        return False
+    if not isinstance(sender, telethon.tl.types.User):
+        return False
+    # Filter bots, deleted users, users without username
+    return not (sender.bot or sender.deleted or not sender.username)
+
+
+class _ChatInfo:
+    """Link metadata of the chat being parsed, shared by all its messages."""
+
+    __slots__ = ("username", "id", "is_public")
+
+    def __init__(self, username: Optional[str], chat_id: int, is_public: bool) -> None:
+        self.username = username
+        self.id = chat_id
+        self.is_public = is_public
+
+
+class _TextMessage:
+    """A text message held during aggregation.
+
+    Only id, text and date are kept per message; the dict form with chat
+    metadata, link, freshness and age is built on demand for the messages
+    that are actually returned.
+    """
+
+    __slots__ = ("id", "text", "date")
+
+    def __init__(self, message_id: int, text: str, date: Optional[datetime]) -> None:
+        self.id = message_id
+        self.text = text
+        self.date = date
+
+    def to_dict(self, chat: _ChatInfo) -> dict:
+        """Message with chat metadata and link (the all_messages format)."""
+        # Note: We store date as ISO string, not datetime object,
+        # to ensure JSON serialization works for database storage
+        return {
+            "message_id": self.id,
+            "text": self.text,
+            "date": self.date.isoformat() if self.date else None,
+            "chat_username": chat.username,
+            "chat_id": chat.id,
+            "is_public": chat.is_public,
+            "link": generate_message_link(
+                chat.username, chat.id, self.id, chat.is_public
+            ),
+        }
+
+    def to_candidate_dict(self, chat: _ChatInfo, now: datetime) -> dict:
+        """to_dict() plus freshness and age (the messages_with_metadata format)."""
+        data = self.to_dict(chat)
+        data["freshness"] = get_message_freshness(self.date, now)
+        data["age_display"] = format_message_age(self.date, now)
+        return data
+
+
+class _SenderActivity:
+    """Message count and first few messages of one lead sender."""
+
+    __slots__ = ("user", "message_count", "messages")
+
+    def __init__(self, user) -> None:
+        self.user = user
+        self.message_count = 0
+        self.messages: list[_TextMessage] = []
+
+
+class _WindowSender:
+    """Minimal sender rebuilt from a cursor window record (no network calls)."""
+
+    __slots__ = ("id", "username", "first_name", "last_name", "bot", "deleted", "about")
+
+    def __init__(self, data: dict) -> None:
+        self.id = data["id"]
+        self.username = data.get("username")
+        self.first_name = data.get("first_name")
+        self.last_name = data.get("last_name")
+        self.bot = False
+        self.deleted = False
+        self.about = None
+
+
+def _window_record(message, sender) -> dict:
+    """Build a compact, JSON-serializable record for the cursor window."""
+    return {
+        "id": message.id,
+        "date": message.date.isoformat() if message.date else None,
+        "text": message.text,
+        "sender": {
+            "id": sender.id,
+            "username": sender.username,
+            "first_name": sender.first_name,
+            "last_name": sender.last_name,
+        } if sender else None,
+    }
+
+
+def _cache_sender(user) -> None:
+    """Put a resolved user into the process-wide LRU of senders."""
+    _SENDER_CACHE[user.id] = user
+    _SENDER_CACHE.move_to_end(user.id)
+    while len(_SENDER_CACHE) > config.SENDER_CACHE_SIZE:
+        _SENDER_CACHE.popitem(last=False)
+
+
+def _cached_sender(user_id: int):
+    """Return a user from the LRU of senders, if present."""
+    user = _SENDER_CACHE.get(user_id)
+    if user is not None:
+        _SENDER_CACHE.move_to_end(user_id)
+    return user
+
+
+async def _fetch_users_batch(client, user_ids: list[int]) -> list:
+    """Fetch users with one GetUsersRequest per chunk of ids.
+
+    Only ids with a known access hash in the local session are requested,
+    so resolving input entities never costs a network call.
+    """
+    input_users = []
+    for user_id in user_ids:
+        try:
+            input_users.append(client.session.get_input_entity(user_id))
+        except (ValueError, AttributeError):
+            logger.debug(f"No cached access hash for user_id={user_id}, skipping.")
+
+    users = []
+    for start in range(0, len(input_users), _GET_USERS_BATCH_SIZE):
+        chunk = input_users[start:start + _GET_USERS_BATCH_SIZE]
+        for attempt in range(config.MAX_FLOODWAIT_RETRIES + 1):
+            await telegram_limiter.acquire()
+            try:
+                users.extend(
+                    await client(functions.users.GetUsersRequest(id=chunk))
+                )
+                break
+            except FloodWaitError as e:
+                if not await _handle_flood_wait(e, "get_users", attempt):
+                    raise ParsingPausedError(
+                        "FloodWait limit exceeded while resolving senders"
+                    )
+            except Exception as e:
+                logger.warning(f"Failed to resolve {len(chunk)} senders: {e}")
+                break
+    return users
+
+
+async def _resolve_senders(client, messages: list) -> dict[int, object]:
+    """Resolve senders of a page of messages without per-message round trips.
+
+    Resolution order:
+    1. `message.sender` - users bundled with the GetHistory response
+    2. process-wide LRU of previously resolved users
+    3. one batched GetUsersRequest for the remaining ids
+    """
+    senders: dict[int, object] = {}
+    unresolved: set[int] = set()
+
+    for message in messages:
+        sender_id = getattr(message, "sender_id", None)
+        if sender_id is None or sender_id in senders:
+            continue
+        sender = getattr(message, "sender", None)
+        if sender is not None:
+            senders[sender_id] = sender
+            if isinstance(sender, telethon.tl.types.User):
+                _cache_sender(sender)
+            continue
+        cached = _cached_sender(sender_id)
+        if cached is not None:
+            senders[sender_id] = cached
+        elif sender_id > 0:  # Negative ids are channels/chats, not users
+            unresolved.add(sender_id)
+
+    if unresolved:
+        logger.info(f"Resolving {len(unresolved)} senders with a batched request...")
+        for user in await _fetch_users_batch(client, sorted(unresolved)):
+            if isinstance(user, telethon.tl.types.User):
+                senders[user.id] = user
+                _cache_sender(user)
+
+    return senders
+
+
 async def _random_delay(delay_type: str) -> None:
     """Apply randomized delay based on safety mode."""
     min_delay, max_delay = config.get_delay(delay_type)
@@ -133,6 +353,8 @@ async def _handle_flood_wait(
         f"FloodWaitError during {operation}: waiting {wait_time} seconds "
         f"(retry {retry_count + 1}/{config.MAX_FLOODWAIT_RETRIES})"
     )
+    # Hold off every concurrent parser on this account, not just this one
+    telegram_limiter.pause(wait_time)
 
     if retry_count >= config.MAX_FLOODWAIT_RETRIES:
         logger.error(
@@ -144,16 +366,50 @@ async def _handle_flood_wait(
     return True
 
 
-async def parse_users_from_messages(
+def _read_store(
+    store: message_store.ChatStore, limit: int
+) -> tuple[dict[int, dict], list[message_store.StoredMessage]]:
+    """Read the store's lead senders and newest messages (blocking, for a thread)."""
+    return store.senders(), list(store.iter_newest(limit=limit))
+
+
+async def _no_messages() -> AsyncIterator:
+    """Empty history, used when the message store is fresh."""
+    return
+    yield
+
+
+async def _next_streamed_leads(
+    leads: asyncio.Queue, screening: asyncio.Task
+) -> list[dict]:
+    """Wait for leads streamed by the screening task; empty once it is done."""
+    while leads.empty() and not screening.done():
+        getter = asyncio.ensure_future(leads.get())
+        await asyncio.wait({getter, screening}, return_when=asyncio.FIRST_COMPLETED)
+        if getter.done():
+            leads.put_nowait(getter.result())
+            break
+        getter.cancel()
+    streamed = []
+    while not leads.empty():
+        streamed.append(leads.get_nowait())
+    return streamed
+
+
+async def iter_candidates(
     chat_identifier: str,
     only_with_channels: bool = False,
     messages_limit: int = 1000,
     max_messages_per_user: int = 5,
     progress_callback: Optional[callable] = None,
-    use_batch_analysis: bool = True
-) -> tuple[list[dict], list[dict]]:
+    use_batch_analysis: bool = True,
+    incremental: bool = False,
+    all_messages: Optional[list[dict]] = None,
+    on_message: Optional[Callable[[dict], Awaitable[None]]] = None
+) -> AsyncIterator[dict]:
     """
-    Parses active users by reading the message history of a chat.
+    Parses active users by reading the message history of a chat and yields
+    each candidate as soon as its stage-2 profile data is ready.
 
     Stores full message metadata including message_id, chat info, and date
     for generating message links.
@@ -162,6 +418,15 @@ async def parse_users_from_messages(
     1. Batch analysis (optional) - filters users by pain signals in messages
     2. Full profile fetch - only for users identified in stage 1
 
+    In incremental mode only messages newer than the stored per-(chat, account)
+    cursor are fetched; they are merged with the stored rolling window of
+    recent messages and the cursor is advanced afterwards.
+
+    With MESSAGE_STORE_ENABLED the on-disk message store replaces the
+    cursor: only messages newer than the stored ones are fetched and
+    appended, older ones are read back from disk, and a chat fetched
+    within MESSAGE_STORE_REFRESH_MINUTES is not read from Telegram at all.
+
     Args:
         chat_identifier: Chat username or ID to parse
         only_with_channels: Only return users who have channels in bio
@@ -169,11 +434,18 @@ async def parse_users_from_messages(
         max_messages_per_user: Maximum sample messages to store per user
         progress_callback: Optional callback(current, total, status) for progress
         use_batch_analysis: Use batch LLM analysis to pre-filter candidates
-
-    Returns:
-        Tuple of (candidates, all_messages):
-        - candidates: list of candidate dicts with message metadata and batch_analysis_data
-        - all_messages: list of ALL text messages (for pain analysis), regardless of sender
+        incremental: Fetch only new messages since the last run (see message_cursor)
+        all_messages: Optional list that receives ALL text messages (for pain
+            analysis), regardless of sender. Not collected when omitted.
+        on_message: Optional coroutine function awaited with each of those
+            messages as it is read (e.g. pain_collector.PainStream.add), so
+            the chat never has to be held in memory; reading waits for it
+
+    Yields:
+        Candidate dicts with message metadata and batch_analysis_data.
+
+    Raises:
+        ChatNotFoundError: Telegram cannot resolve chat_identifier.
     """
     if not await TelegramAuthManager.is_authorized():
         logger.warning(
@@ -187,65 +459,165 @@ async def parse_users_from_messages(
         f"(limit: {messages_limit} messages, mode: {config.SAFETY_MODE})"
     )
 
-    flood_wait_retries = 0
-
     try:
-        # Get chat entity with retry logic
+        # Get chat entity (through the entity cache) with retry logic
         entity = None
         for attempt in range(config.MAX_FLOODWAIT_RETRIES + 1):
             try:
-                entity = await client.get_entity(chat_identifier)
+                entity = await entity_cache.resolve_chat(client, chat_identifier)
                 break
             except FloodWaitError as e:
                 if not await _handle_flood_wait(e, "get_entity", attempt):
                     raise ParsingPausedError(
                         f"FloodWait limit exceeded getting entity: {chat_identifier}"
                     )
+            except (ValueError, UsernameInvalidError, UsernameNotOccupiedError) as e:
+                raise ChatNotFoundError(f"Chat {chat_identifier} not found: {e}") from e
 
         if entity is None:
             logger.error(f"Could not get entity for {chat_identifier}")
-            return [], []
+            return
 
         logger.info(
             f"Successfully got entity for '{chat_identifier}'. "
-            f"Type: {type(entity).__name__}"
+            f"Type: {type(entity.peer).__name__}"
         )
 
         # Determine if chat is public (has username)
-        chat_username = getattr(entity, 'username', None)
-        chat_id = entity.id
-        is_public = bool(chat_username)
+        chat = _ChatInfo(entity.username, entity.id, entity.is_public)
+        # One timestamp for age limits, freshness and age display of the run
+        now = datetime.now(timezone.utc)
 
         logger.info(
-            f"Chat info: username={chat_username}, id={chat_id}, "
-            f"is_public={is_public}"
+            f"Chat info: username={chat.username}, id={chat.id}, "
+            f"is_public={chat.is_public}"
         )
 
-        # Store user objects, message count, and detailed message data
-        unique_users: dict[int, dict] = {}
-        all_messages: list[dict] = []  # All text messages for pain analysis
+        # Incremental mode: only fetch messages newer than the stored cursor
+        chat_key = message_cursor.normalize_chat_key(chat_identifier)
+        account = TelegramAuthManager.account_key()
+        cursor = None
+        store = None
+        if config.MESSAGE_STORE_ENABLED:
+            try:
+                store = await asyncio.to_thread(message_store.open_chat, chat_key)
+            except Exception as e:
+                logger.warning(
+                    f"Could not open message store for '{chat_key}': {e}. "
+                    f"Falling back to full fetch."
+                )
+        if store is not None:
+            min_id = store.max_id
+        elif incremental:
+            try:
+                cursor = await message_cursor.load_cursor(chat_key, account)
+            except Exception as e:
+                logger.warning(
+                    f"Could not load message cursor for '{chat_key}': {e}. "
+                    f"Falling back to full fetch."
+                )
+
+        if store is None:
+            min_id = cursor.last_message_id if cursor else 0
+        # A recently fetched store is re-analysed without any history request
+        fetch_history = store is None or not store.is_fresh()
+        iter_kwargs = {"limit": messages_limit}
+        if min_id:
+            iter_kwargs["min_id"] = min_id
+
+        # Lead senders with their message count and first messages
+        unique_users: dict[int, _SenderActivity] = {}
+        # Compact records of newly fetched messages, only kept for the cursor
+        new_window: Optional[list[dict]] = [] if incremental and store is None else None
+        # Newly fetched messages and lead senders, appended to the store
+        new_stored: list[message_store.StoredMessage] = []
+        new_store_senders: dict[int, dict] = {}
+        max_message_id = min_id
+        iteration_complete = False
+        # False when messages_limit stopped the iteration before it got back
+        # to the previous high-water mark (min_id)
+        reached_min_id = not min_id
         messages_processed = 0
 
-        logger.info(f"Fetching last {messages_limit} messages...")
+        async def _add_text_message(message_id: int, text: str, date, sender) -> None:
+            """Aggregate one text message, either fetched or replayed from window."""
+            message = None
+            # Pass ALL text messages on for pain analysis (before sender filtering)
+            if all_messages is not None or on_message is not None:
+                message = _TextMessage(message_id, text, date)
+                message_data = message.to_dict(chat)
+                if all_messages is not None:
+                    all_messages.append(message_data)
+                if on_message is not None:
+                    await on_message(message_data)
+
+            if sender is None:
+                return
+
+            activity = unique_users.get(sender.id)
+            if activity is None:
+                activity = unique_users[sender.id] = _SenderActivity(sender)
+            activity.message_count += 1
+            # Keep up to max_messages_per_user messages per sender
+            if len(activity.messages) < max_messages_per_user:
+                activity.messages.append(message or _TextMessage(message_id, text, date))
+
+        if not fetch_history:
+            logger.info(
+                f"Message store of '{chat_key}' is fresh "
+                f"({store.count} messages), skipping history fetch."
+            )
+        elif min_id:
+            logger.info(
+                f"Incremental fetch: messages newer than id={min_id} "
+                f"(limit: {messages_limit})..."
+            )
+        else:
+            logger.info(f"Fetching last {messages_limit} messages...")
+
+        async def _process_page(page_messages: list) -> None:
+            """Resolve senders for a page of messages and aggregate them."""
+            senders = await _resolve_senders(client, page_messages)
+            lead_senders = {
+                sender_id: sender
+                for sender_id, sender in senders.items()
+                if _is_lead_sender(sender)
+            }
+            for page_message in page_messages:
+                sender = lead_senders.get(page_message.sender_id)
+                if new_window is not None:
+                    new_window.append(_window_record(page_message, sender))
+                if store is not None:
+                    new_stored.append(message_store.StoredMessage(
+                        page_message.id, page_message.sender_id,
+                        page_message.date, page_message.text,
+                    ))
+                    if sender is not None and sender.id not in new_store_senders:
+                        new_store_senders[sender.id] = _window_record(
+                            page_message, sender
+                        )["sender"]
+                await _add_text_message(
+                    page_message.id, page_message.text, page_message.date, sender
+                )
 
         # Iterate messages with delays and flood protection
+        page: list = []
         try:
-            async for message in client.iter_messages(entity, limit=messages_limit):
+            history = (
+                client.iter_messages(entity.peer, **iter_kwargs)
+                if fetch_history else _no_messages()
+            )
+            async for message in history:
                 messages_processed += 1
+                max_message_id = max(max_message_id, message.id)
 
                 # Early stop: check message age FIRST (before processing)
-                now = datetime.now(timezone.utc)
-                message_date = message.date
-                if message_date and message_date.tzinfo is None:
-                    message_date = message_date.replace(tzinfo=timezone.utc)
-
-                days_old = (now - message_date).days if message_date else 999
-
-                if days_old > config.MESSAGE_MAX_AGE_DAYS:
+                if _message_age_days(message.date, now) > config.MESSAGE_MAX_AGE_DAYS:
                     logger.info(
                         f"Early stop: reached message older than {config.MESSAGE_MAX_AGE_DAYS} days. "
                         f"Processed {messages_processed} messages total."
                     )
+                    reached_min_id = True  # Unread older messages are too old anyway
                     break  # All subsequent messages are even older - stop iteration
 
                 # Progress callback
@@ -260,96 +632,175 @@ async def parse_users_from_messages(
                 if messages_processed % 50 == 0:
                     await _random_delay("between_requests")
 
-                # Collect ALL text messages for pain analysis (before sender filtering)
-                if message.text:
-                    all_messages.append({
-                        "message_id": message.id,
-                        "text": message.text,
-                        "date": message.date.isoformat() if message.date else None,
-                        "chat_username": chat_username,
-                        "chat_id": chat_id,
-                        "is_public": is_public,
-                        "link": generate_message_link(
-                            chat_username, chat_id, message.id, is_public
-                        ),
-                    })
-
-                # Get sender
-                try:
-                    sender = await message.get_sender()
-                except FloodWaitError as e:
-                    if not await _handle_flood_wait(
-                        e, "get_sender", flood_wait_retries
-                    ):
-                        raise ParsingPausedError(
-                            "FloodWait limit exceeded during message parsing"
-                        )
-                    flood_wait_retries += 1
-                    continue
+                # Each history page is one request against the shared limiter
+                if messages_processed % _SENDER_PAGE_SIZE == 0:
+                    await telegram_limiter.acquire()
 
-                if not sender:
-                    continue
-                if not isinstance(sender, telethon.tl.types.User):
-                    continue
                 if not message.text:
                     continue
 
-                # Filter bots, deleted users, users without username
-                if sender.bot or sender.deleted or not sender.username:
-                    continue
+                # Senders are resolved per page, not per message
+                page.append(message)
+                if len(page) >= _SENDER_PAGE_SIZE:
+                    await _process_page(page)
+                    page = []
 
-                if sender.id not in unique_users:
-                    unique_users[sender.id] = {
-                        "user_obj": sender,
-                        "message_count": 0,
-                        "messages": []  # Store full message metadata
-                    }
-
-                # Increment message count
-                unique_users[sender.id]["message_count"] += 1
-
-                # Filter messages by age - only store recent ones
-                now = datetime.now(timezone.utc)
-                message_date = message.date
-                if message_date and message_date.tzinfo is None:
-                    message_date = message_date.replace(tzinfo=timezone.utc)
-
-                days_old = (now - message_date).days if message_date else 999
-
-                # Only store messages within MESSAGE_MAX_AGE_DAYS
-                if days_old <= config.MESSAGE_MAX_AGE_DAYS:
-                    # Store message with full metadata (up to max_messages_per_user)
-                    if len(unique_users[sender.id]["messages"]) < max_messages_per_user:
-                        # Note: We store date as ISO string, not datetime object,
-                        # to ensure JSON serialization works for database storage
-                        message_data = {
-                            "message_id": message.id,
-                            "text": message.text,
-                            "date": message.date.isoformat() if message.date else None,
-                            "chat_username": chat_username,
-                            "chat_id": chat_id,
-                            "is_public": is_public,
-                            "link": generate_message_link(
-                                chat_username, chat_id, message.id, is_public
-                            ),
-                            "freshness": get_message_freshness(message.date),
-                            "age_display": format_message_age(message.date)
-                        }
-                        unique_users[sender.id]["messages"].append(message_data)
+            iteration_complete = True
+            if messages_processed < messages_limit:
+                reached_min_id = True
 
         except FloodWaitError as e:
-            if not await _handle_flood_wait(e, "iter_messages", flood_wait_retries):
+            if not await _handle_flood_wait(e, "iter_messages", 0):
                 raise ParsingPausedError(
                     "FloodWait limit exceeded during message iteration"
                 )
 
+        if page:
+            await _process_page(page)
+
+        # Merge newly fetched messages with the stored rolling window
+        kept_window: list[dict] = []
+        if cursor and cursor.window:
+            budget = max(0, messages_limit - len(new_window))
+            for record in cursor.window[:budget]:
+                record_date = _parse_window_date(record.get("date"))
+                if _message_age_days(record_date, now) > config.MESSAGE_MAX_AGE_DAYS:
+                    break  # Window is stored newest-first
+                sender_data = record.get("sender")
+                sender = _WindowSender(sender_data) if sender_data else None
+                await _add_text_message(record["id"], record["text"], record_date, sender)
+                kept_window.append(record)
+            logger.info(
+                f"Merged {len(new_window)} new messages with "
+                f"{len(kept_window)} messages from stored window."
+            )
+
+        # Older messages are read back from the store, newest first
+        if store is not None:
+            budget = max(0, messages_limit - len(new_stored))
+            replayed = 0
+            try:
+                store_senders, stored_messages = await asyncio.to_thread(
+                    _read_store, store, budget
+                )
+                for stored in stored_messages:
+                    if _message_age_days(stored.date, now) > config.MESSAGE_MAX_AGE_DAYS:
+                        break
+                    sender_data = store_senders.get(stored.sender_id)
+                    sender = _WindowSender(sender_data) if sender_data else None
+                    await _add_text_message(stored.id, stored.text, stored.date, sender)
+                    replayed += 1
+            except Exception as e:
+                logger.warning(f"Could not read message store of '{chat_key}': {e}")
+            logger.info(
+                f"Merged {len(new_stored)} new messages with "
+                f"{replayed} messages from the message store."
+            )
+
+            # Same rule as the cursor: never leave a gap in the stored history
+            if fetch_history and iteration_complete and reached_min_id:
+                try:
+                    await asyncio.to_thread(
+                        store.append, new_stored, new_store_senders, max_id=max_message_id
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not update message store of '{chat_key}': {e}")
+
+        if iteration_complete and not reached_min_id:
+            logger.info(
+                f"More than {messages_limit} new messages in '{chat_key}': "
+                f"keeping the previous position (message {min_id})."
+            )
+
+        # Only advance the cursor if the iteration was not interrupted and
+        # got back to the old cursor, otherwise messages between the old
+        # cursor and the gap would be lost.
+        # With the message store on, the store keeps the position instead.
+        if incremental and store is None and iteration_complete and reached_min_id:
+            try:
+                await message_cursor.save_cursor(
+                    chat_key, account, max_message_id, new_window + kept_window
+                )
+            except Exception as e:
+                logger.warning(f"Could not save message cursor for '{chat_key}': {e}")
+
         logger.info(
             f"Total messages processed: {messages_processed}. "
             f"Found {len(unique_users)} unique active users."
         )
 
-        # STAGE 1: Batch analysis to pre-filter candidates (optional)
+        # STAGE 2: Fetch full profiles (bio) concurrently under the shared
+        # rate limiter, only for users selected by batch analysis. Candidates
+        # are yielded as soon as their profile arrives.
         batch_analysis_results = {}
+        candidates_found = 0
+        fetched_user_ids: set[int] = set()
+
+        async def _fetch_candidates(user_ids) -> AsyncIterator[dict]:  # noqa: ANN001
+            nonlocal candidates_found
+            selected_users = []
+            for user_id in user_ids:
+                if user_id in fetched_user_ids:
+                    continue
+                fetched_user_ids.add(user_id)
+                activity = unique_users[user_id]
+                # Skip users with no recent messages (all were filtered out by age)
+                if not activity.messages:
+                    logger.debug(
+                        f"Skipping @{activity.user.username}: no messages within "
+                        f"last {config.MESSAGE_MAX_AGE_DAYS} days"
+                    )
+                    continue
+                selected_users.append(activity.user)
+            if not selected_users:
+                return
+
+            logger.info(
+                f"Fetching full user profiles for {len(selected_users)} users..."
+            )
+            async for user, bio in profile_fetcher.iter_bios(client, selected_users):
+                activity = unique_users[user.id]
+                channel_in_bio = find_channel_in_bio(bio)
+
+                if only_with_channels and not channel_in_bio:
+                    continue
+
+                # Link, freshness and age are only derived for candidates' messages
+                messages_with_metadata = [
+                    message.to_candidate_dict(chat, now) for message in activity.messages
+                ]
+                # Extract sample messages text for backward compatibility
+                sample_messages_text = [m["text"] for m in messages_with_metadata]
+
+                # Determine if any message is fresh
+                has_fresh_message = any(
+                    m["freshness"] == "hot" for m in messages_with_metadata
+                )
+
+                # Get batch analysis data if available
+                batch_data = batch_analysis_results.get(user.username, {})
+
+                candidates_found += 1
+                yield {
+                    "user_id": user.id,
+                    "username": user.username,
+                    "first_name": user.first_name,
+                    "last_name": user.last_name,
+                    "bio": bio,
+                    "has_channel": bool(channel_in_bio),
+                    "channel_username": channel_in_bio,
+                    "source_chat": chat_identifier,
+                    "source_chat_username": chat.username,
+                    "source_chat_id": chat.id,
+                    "source_chat_is_public": chat.is_public,
+                    "messages_in_chat": activity.message_count,
+                    "sample_messages": sample_messages_text,  # Backward compatible
+                    "messages_with_metadata": messages_with_metadata,  # Full metadata
+                    "has_fresh_message": has_fresh_message,
+                    "batch_analysis_data": batch_data,  # Batch screening results
+                }
+
+        # STAGE 1: Batch analysis to pre-filter candidates (optional)
         selected_user_ids = set(unique_users.keys())  # By default, all users
 
         if use_batch_analysis and len(unique_users) > 0:
@@ -359,24 +810,48 @@ async def parse_users_from_messages(
 
             # Prepare messages for batch analysis
             batch_messages = []
-            for user_id, user_data in unique_users.items():
-                user_obj = user_data["user_obj"]
-                # Aggregate all message texts for this user
-                all_texts = [msg["text"] for msg in user_data["messages"]]
-                combined_text = " | ".join(all_texts[:3])  # Use first 3 messages
+            user_ids_by_username = {}
+            for user_id, activity in unique_users.items():
+                # Aggregate the first 3 message texts for this user
+                combined_text = " | ".join(msg.text for msg in activity.messages[:3])
+                first_date = activity.messages[0].date if activity.messages else None
 
                 batch_messages.append({
-                    "username": f"@{user_obj.username}",
+                    "username": f"@{activity.user.username}",
                     "text": combined_text,
-                    "date": user_data["messages"][0]["date"] if user_data["messages"] else None,
-                    "messages_count": user_data["message_count"]
+                    "date": first_date.isoformat() if first_date else None,
+                    "messages_count": activity.message_count
                 })
+                user_ids_by_username[activity.user.username] = user_id
 
-            # Call batch analysis
-            batch_result = await asyncio.to_thread(
-                batch_analyze_chat,
-                batch_messages,
+            # Leads parsed out of the streamed screening response go to
+            # stage 2 right away, while the rest of the chat is still screened
+            streamed_leads: asyncio.Queue = asyncio.Queue()
+            screening = asyncio.create_task(
+                batch_analyze_chat_async(batch_messages, on_lead=streamed_leads.put_nowait)
             )
+            try:
+                while leads := await _next_streamed_leads(streamed_leads, screening):
+                    early_user_ids = []
+                    for lead in leads:
+                        username = lead["username"].lstrip("@")
+                        if username in user_ids_by_username:
+                            batch_analysis_results[username] = lead
+                            early_user_ids.append(user_ids_by_username[username])
+                    async for candidate in _fetch_candidates(early_user_ids):
+                        yield candidate
+                try:
+                    batch_result = screening.result()
+                except llm_gateway.LLMBudgetExceededError:
+                    raise
+                except Exception as e:
+                    # Same fallback as a failed batch: keep every candidate
+                    batch_result = {"error": str(e), "potential_leads": []}
+            finally:
+                if not screening.done():
+                    screening.cancel()
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await screening
 
             if "error" in batch_result:
                 logger.warning(
@@ -389,11 +864,16 @@ async def parse_users_from_messages(
                 selected_usernames = {
                     lead["username"].lstrip("@") for lead in potential_leads
                 }
+                # Users from chunks that failed screening stay candidates
+                selected_usernames |= {
+                    username.lstrip("@")
+                    for username in batch_result.get("unscreened_usernames", [])
+                }
 
                 # Filter unique_users to only those selected by batch analysis
                 selected_user_ids = {
-                    user_id for user_id, data in unique_users.items()
-                    if data["user_obj"].username in selected_usernames
+                    user_id for user_id, activity in unique_users.items()
+                    if activity.user.username in selected_usernames
                 }
 
                 # Store batch analysis results for later use
@@ -417,111 +897,69 @@ async def parse_users_from_messages(
         else:
             logger.info("Batch analysis disabled. Processing all candidates.")
 
-        # STAGE 2: Fetch full user entities to get bio and other profile details
-        # Only fetch profiles for users selected by batch analysis
-        logger.info(
-            f"Fetching full user profiles for {len(selected_user_ids)} users..."
-        )
-        full_users: dict[int, telethon.tl.types.User] = {}
-
-        for idx, user_id in enumerate(selected_user_ids):
-            # Apply delay between profile fetches
-            if idx > 0 and idx % 10 == 0:
-                await _random_delay("between_requests")
-
-            try:
-                full_user = await client.get_entity(user_id)
-                full_users[user_id] = full_user
-            except FloodWaitError as e:
-                if not await _handle_flood_wait(e, "get_entity_profile", 0):
-                    logger.warning(
-                        f"Stopping profile fetch due to FloodWait at user {idx}"
-                    )
-                    break
-                # After waiting, try again
-                try:
-                    full_user = await client.get_entity(user_id)
-                    full_users[user_id] = full_user
-                except Exception as retry_e:
-                    logger.warning(
-                        f"Failed to fetch profile for user_id={user_id} "
-                        f"after FloodWait retry: {retry_e}"
-                    )
-                    full_users[user_id] = unique_users[user_id]["user_obj"]
-            except Exception as e:
-                logger.warning(
-                    f"Failed to fetch full profile for user_id={user_id}: {e}"
-                )
-                full_users[user_id] = unique_users[user_id]["user_obj"]
-
-        # Build candidate list (only for users selected by batch analysis)
-        candidate_list = []
-        for user_id in selected_user_ids:
-            user_data = unique_users[user_id]
-            user = full_users.get(user_id, user_data["user_obj"])
-
-            bio = getattr(user, 'about', None)
-            channel_in_bio = find_channel_in_bio(bio)
-
-            if only_with_channels and not channel_in_bio:
-                continue
-
-            # Skip users with no recent messages (all were filtered out by age)
-            if not user_data["messages"]:
-                logger.debug(
-                    f"Skipping @{user.username}: no messages within "
-                    f"last {config.MESSAGE_MAX_AGE_DAYS} days"
-                )
-                continue
-
-            # Extract sample messages text for backward compatibility
-            sample_messages_text = [m["text"] for m in user_data["messages"]]
-
-            # Determine if any message is fresh
-            has_fresh_message = any(
-                m["freshness"] == "hot" for m in user_data["messages"]
-            )
-
-            # Get batch analysis data if available
-            batch_data = batch_analysis_results.get(user.username, {})
-
-            candidate = {
-                "user_id": user.id,
-                "username": user.username,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "bio": bio,
-                "has_channel": bool(channel_in_bio),
-                "channel_username": channel_in_bio,
-                "source_chat": chat_identifier,
-                "source_chat_username": chat_username,
-                "source_chat_id": chat_id,
-                "source_chat_is_public": is_public,
-                "messages_in_chat": user_data["message_count"],
-                "sample_messages": sample_messages_text,  # Backward compatible
-                "messages_with_metadata": user_data["messages"],  # Full metadata
-                "has_fresh_message": has_fresh_message,
-                "batch_analysis_data": batch_data,  # Batch screening results
-            }
-            candidate_list.append(candidate)
+        # Selected users whose profiles were not fetched during screening
+        async for candidate in _fetch_candidates(selected_user_ids):
+            yield candidate
 
         if use_batch_analysis and len(unique_users) > 0:
             logger.info(
-                f"After batch filtering: {len(candidate_list)} candidates "
+                f"After batch filtering: {candidates_found} candidates "
                 f"(from {len(unique_users)} total users) selected for detailed qualification."
             )
         else:
             logger.info(
-                f"Found {len(candidate_list)} potential leads from message history."
+                f"Found {candidates_found} potential leads from message history."
+            )
+        if all_messages is not None:
+            logger.info(
+                f"Collected {len(all_messages)} total text messages for pain analysis."
             )
-        logger.info(f"Collected {len(all_messages)} total text messages for pain analysis.")
-        return candidate_list, all_messages
 
-    except ParsingPausedError:
+    except (ParsingPausedError, ChatNotFoundError, llm_gateway.LLMBudgetExceededError):
         raise  # Re-raise to be handled by caller
     except Exception as e:
         logger.error(f"Failed to parse messages from {chat_identifier}: {e}")
-        return [], []
+
+
+async def parse_users_from_messages(
+    chat_identifier: str,
+    only_with_channels: bool = False,
+    messages_limit: int = 1000,
+    max_messages_per_user: int = 5,
+    progress_callback: Optional[callable] = None,
+    use_batch_analysis: bool = True,
+    incremental: bool = False,
+    collect_all_messages: bool = False
+) -> tuple[list[dict], list[dict]]:
+    """
+    Parses active users by reading the message history of a chat.
+
+    Collects everything produced by iter_candidates(). Holding every text
+    message of the chat costs memory, so all_messages is only filled with
+    `collect_all_messages`; to process them without keeping the list, pass
+    `on_message` to iter_candidates() instead.
+
+    Returns:
+        Tuple of (candidates, all_messages):
+        - candidates: list of candidate dicts with message metadata and batch_analysis_data
+        - all_messages: list of ALL text messages (for pain analysis), regardless
+          of sender; empty unless collect_all_messages is set
+    """
+    all_messages: list[dict] = []
+    candidates = [
+        candidate
+        async for candidate in iter_candidates(
+            chat_identifier,
+            only_with_channels=only_with_channels,
+            messages_limit=messages_limit,
+            max_messages_per_user=max_messages_per_user,
+            progress_callback=progress_callback,
+            use_batch_analysis=use_batch_analysis,
+            incremental=incremental,
+            all_messages=all_messages if collect_all_messages else None,
+        )
+    ]
+    return candidates, all_messages
 
 
 async def main():
@@ -531,7 +969,8 @@ async def main():
 
     try:
         candidates, all_messages = await parse_users_from_messages(
-            test_chat, only_with_channels=False, messages_limit=100
+            test_chat, only_with_channels=False, messages_limit=100,
+            collect_all_messages=True
         )
 
         print(f"\n--- Collected {len(all_messages)} total text messages ---")
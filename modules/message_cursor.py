@@ -0,0 +1,60 @@
+"""Message cursor: persistent per-(chat, account) high-water marks.
+
+Lets scheduled runs fetch only messages newer than the last processed one
+and merge them with the stored rolling window of recent messages.
+"""
+import datetime
+import logging
+
+from sqlalchemy import select
+
+from bot.db_config import async_session
+from bot.models.chat_cursor import ChatCursor
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_chat_key(chat_identifier: str) -> str:
+    """Normalize chat identifier (`@Chat`, `t.me/chat`) to a stable key."""
+    key = str(chat_identifier).strip()
+    if key.startswith("https://"):
+        key = key[len("https://"):]
+    if key.startswith("t.me/"):
+        key = key[len("t.me/"):]
+    return key.lstrip("@").lower()[:100]
+
+
+async def load_cursor(chat_key: str, account: str) -> ChatCursor | None:
+    """Return the stored cursor for a chat/account pair, if any."""
+    async with async_session() as session:
+        query = select(ChatCursor).where(
+            ChatCursor.chat_key == chat_key,
+            ChatCursor.account == account,
+        )
+        return (await session.execute(query)).scalars().first()
+
+
+async def save_cursor(
+    chat_key: str,
+    account: str,
+    last_message_id: int,
+    window: list[dict],
+) -> None:
+    """Create or update the cursor for a chat/account pair."""
+    async with async_session() as session:
+        query = select(ChatCursor).where(
+            ChatCursor.chat_key == chat_key,
+            ChatCursor.account == account,
+        )
+        cursor = (await session.execute(query)).scalars().first()
+        if cursor is None:
+            cursor = ChatCursor(chat_key=chat_key, account=account)
+            session.add(cursor)
+        cursor.last_message_id = last_message_id
+        cursor.window = window
+        cursor.updated_at = datetime.datetime.utcnow()
+        await session.commit()
+    logger.info(
+        f"message_cursor: Saved cursor for '{chat_key}' "
+        f"(last_message_id={last_message_id}, window={len(window)})."
+    )
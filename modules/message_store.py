@@ -0,0 +1,296 @@
+"""Message store: rolling on-disk history of parsed chats.
+
+Each chat keeps its text messages in an append-only, columnar layout under
+MESSAGE_STORE_DIR/<chat_key>/, so a program can be re-analysed (new niche,
+new prompt) without fetching the history from Telegram again:
+
+- ids.<gen>, senders.<gen>, dates.<gen>: int64 columns (message id,
+  sender id or 0, unix date or 0), ascending by message id;
+- ends.<gen>: int64 end offset of each message's text in text.<gen>
+  (UTF-8, concatenated);
+- senders.json: lead senders (id -> username, first/last name);
+- meta.json: committed row count, text size, max message id, last fetch
+  time and the column generation.
+
+Readers memory-map the columns and only trust the first `count` rows of
+meta.json, which is replaced atomically after the columns are written, so
+a crashed append is simply ignored. When a chat grows beyond
+MESSAGE_STORE_MAX_MESSAGES the newest rows are copied to a new generation
+and meta.json is switched over to it. Writers take an flock per chat.
+
+All calls block on file I/O (flock, fsync, mmap); async callers run them
+with asyncio.to_thread so the event loop keeps serving other jobs.
+"""
+import contextlib
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_VERSION = 1
+_INT64 = struct.Struct("<q")
+_COLUMNS = ("ids", "senders", "dates", "ends")
+
+
+class StoredMessage:
+    """One text message read back from the store."""
+
+    __slots__ = ("id", "sender_id", "date", "text")
+
+    def __init__(self, message_id: int, sender_id: Optional[int], date: Optional[datetime], text: str) -> None:
+        self.id = message_id
+        self.sender_id = sender_id
+        self.date = date
+        self.text = text
+
+
+def _chat_dir_name(chat_key: str) -> str:
+    """File-system safe directory name for a normalized chat key."""
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in chat_key)
+    return safe or "_"
+
+
+def _pack_column(values: list[int]) -> bytes:
+    return struct.pack(f"<{len(values)}q", *values)
+
+
+class _MappedColumns:
+    """Read-only memory maps of one generation's columns and text."""
+
+    def __init__(self, directory: Path, generation: int, count: int, text_bytes: int) -> None:
+        self._stack = contextlib.ExitStack()
+        # Every view of a map must be released before the map can be closed
+        self._views: list[memoryview] = []
+        self.columns: dict[str, memoryview] = {}
+        try:
+            for name in _COLUMNS:
+                self.columns[name] = self._track(
+                    self._map(directory / f"{name}.{generation}", count * _INT64.size).cast("q")
+                )
+            self.text = self._map(directory / f"text.{generation}", text_bytes)
+        except BaseException:
+            self.close()
+            raise
+
+    def _track(self, view: memoryview) -> memoryview:
+        self._views.append(view)
+        return view
+
+    def _map(self, path: Path, size: int) -> memoryview:
+        """Map the first `size` bytes of a file."""
+        if size == 0:
+            return memoryview(b"")
+        f = self._stack.enter_context(open(path, "rb"))
+        mapped = self._stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        if len(mapped) < size:
+            raise ValueError(f"{path} is shorter than its committed size")
+        return self._track(self._track(memoryview(mapped))[:size])
+
+    def close(self) -> None:
+        for view in reversed(self._views):
+            view.release()
+        self._stack.close()
+
+
+class ChatStore:
+    """Stored history of one chat. Cheap to create; files are opened per call."""
+
+    def __init__(self, chat_key: str, root: Optional[Path] = None) -> None:
+        self.chat_key = chat_key
+        self.directory = Path(root or config.MESSAGE_STORE_DIR) / _chat_dir_name(chat_key)
+        self.meta = self._read_meta()
+
+    def _read_meta(self) -> dict:
+        try:
+            meta = json.loads((self.directory / "meta.json").read_text("utf-8"))
+        except FileNotFoundError:
+            meta = {}
+        if meta.get("version") != _VERSION:
+            meta = {"version": _VERSION, "generation": 0, "count": 0,
+                    "text_bytes": 0, "max_id": 0, "fetched_at": 0}
+        return meta
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp = self.directory / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta), "utf-8")
+        os.replace(tmp, self.directory / "meta.json")
+        self.meta = meta
+
+    @property
+    def count(self) -> int:
+        return self.meta["count"]
+
+    @property
+    def max_id(self) -> int:
+        return self.meta["max_id"]
+
+    def is_fresh(self, max_age_minutes: Optional[float] = None) -> bool:
+        """True if the history was fetched recently enough to skip Telegram."""
+        if max_age_minutes is None:
+            max_age_minutes = config.MESSAGE_STORE_REFRESH_MINUTES
+        if not self.count or max_age_minutes <= 0:
+            return False
+        return time.time() - self.meta["fetched_at"] <= max_age_minutes * 60
+
+    def senders(self) -> dict[int, dict]:
+        """Lead senders seen in the chat: id -> {id, username, first_name, last_name}."""
+        try:
+            raw = json.loads((self.directory / "senders.json").read_text("utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+        return {int(sender_id): data for sender_id, data in raw.items()}
+
+    def iter_newest(self, limit: Optional[int] = None, before_id: Optional[int] = None) -> Iterator[StoredMessage]:
+        """Yield stored messages newest first, optionally only ids < before_id."""
+        meta = self.meta
+        if not meta["count"]:
+            return
+        mapped = _MappedColumns(self.directory, meta["generation"], meta["count"], meta["text_bytes"])
+        try:
+            ids, sender_ids, dates, ends = (mapped.columns[name] for name in _COLUMNS)
+            yielded = 0
+            for row in range(meta["count"] - 1, -1, -1):
+                if limit is not None and yielded >= limit:
+                    break
+                message_id = ids[row]
+                if before_id is not None and message_id >= before_id:
+                    continue
+                start = ends[row - 1] if row else 0
+                date = dates[row]
+                sender_id = sender_ids[row]
+                yield StoredMessage(
+                    message_id,
+                    sender_id or None,
+                    datetime.fromtimestamp(date, timezone.utc) if date else None,
+                    bytes(mapped.text[start:ends[row]]).decode("utf-8"),
+                )
+                yielded += 1
+        finally:
+            mapped.close()
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Another process may have appended since we last looked
+                self.meta = self._read_meta()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(
+        self,
+        messages: list[StoredMessage],
+        senders: Optional[dict[int, dict]] = None,
+        max_id: int = 0,
+    ) -> int:
+        """Append messages newer than max_id and mark the chat as fetched now.
+
+        Args:
+            messages: Messages in any order; already stored ids are skipped.
+            senders: Lead senders to add or refresh, by id.
+            max_id: Highest message id seen by the fetch, including messages
+                without text, so the next fetch starts after it.
+
+        Returns:
+            Number of messages appended.
+        """
+        with self._locked():
+            meta = dict(self.meta)
+            new = sorted(
+                (m for m in messages if m.id > meta["max_id"]), key=lambda m: m.id
+            )
+            # Drop duplicates within the batch
+            new = [m for i, m in enumerate(new) if i == 0 or m.id != new[i - 1].id]
+
+            if new:
+                generation = meta["generation"]
+                texts = [m.text.encode("utf-8") for m in new]
+                ends, end = [], meta["text_bytes"]
+                for text in texts:
+                    end += len(text)
+                    ends.append(end)
+                columns = {
+                    "ids": [m.id for m in new],
+                    "senders": [m.sender_id or 0 for m in new],
+                    "dates": [int(m.date.timestamp()) if m.date else 0 for m in new],
+                    "ends": ends,
+                }
+                for name, values in columns.items():
+                    self._write_at(f"{name}.{generation}", meta["count"] * _INT64.size, _pack_column(values))
+                self._write_at(f"text.{generation}", meta["text_bytes"], b"".join(texts))
+                meta["count"] += len(new)
+                meta["text_bytes"] = end
+                meta["max_id"] = new[-1].id
+
+            if senders:
+                stored = self.senders()
+                stored.update(senders)
+                tmp = self.directory / "senders.json.tmp"
+                tmp.write_text(json.dumps({str(k): v for k, v in stored.items()}, ensure_ascii=False), "utf-8")
+                os.replace(tmp, self.directory / "senders.json")
+
+            meta["max_id"] = max(meta["max_id"], max_id)
+            meta["fetched_at"] = time.time()
+            self._write_meta(meta)
+            if meta["count"] > max(1, config.MESSAGE_STORE_MAX_MESSAGES):
+                self._compact(config.MESSAGE_STORE_MAX_MESSAGES)
+        return len(new)
+
+    def _write_at(self, name: str, offset: int, data: bytes) -> None:
+        """Write data at offset, discarding anything after it (uncommitted tail)."""
+        path = self.directory / name
+        with open(path, "r+b" if path.exists() else "w+b") as f:
+            f.truncate(offset)
+            f.seek(offset)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self, keep: int) -> None:
+        """Copy the newest `keep` rows into a new generation and switch to it."""
+        meta = dict(self.meta)
+        old_generation = meta["generation"]
+        generation = old_generation + 1
+        first_row = meta["count"] - keep
+        mapped = _MappedColumns(self.directory, old_generation, meta["count"], meta["text_bytes"])
+        try:
+            ends = mapped.columns["ends"]
+            text_start = ends[first_row - 1] if first_row else 0
+            for name in ("ids", "senders", "dates"):
+                self._write_at(f"{name}.{generation}", 0, mapped.columns[name][first_row:].tobytes())
+            self._write_at(
+                f"ends.{generation}", 0,
+                _pack_column([end - text_start for end in ends[first_row:]]),
+            )
+            self._write_at(f"text.{generation}", 0, bytes(mapped.text[text_start:]))
+            text_bytes = meta["text_bytes"] - text_start
+        finally:
+            mapped.close()
+
+        meta.update(generation=generation, count=keep, text_bytes=text_bytes)
+        self._write_meta(meta)
+        # Readers that still map the old files keep working until they close them
+        for name in (*_COLUMNS, "text"):
+            with contextlib.suppress(FileNotFoundError):
+                (self.directory / f"{name}.{old_generation}").unlink()
+        logger.info(
+            f"message_store: Compacted '{self.chat_key}' to its newest {keep} messages."
+        )
+
+
+def open_chat(chat_key: str) -> ChatStore:
+    """Return the store of a normalized chat key (see message_cursor.normalize_chat_key)."""
+    return ChatStore(chat_key)
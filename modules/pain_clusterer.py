@@ -4,40 +4,34 @@ import logging
 from datetime import datetime, timezone, timedelta
 from typing import Any
 
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import config
 from bot.models.pain import Pain, PainCluster
+from modules import json_stream, llm_gateway, prompt_registry
 
 logger = logging.getLogger(__name__)
 
-_PROMPT_CACHE: str | None = None
+_PROMPT_PATH = "prompts/pain_clustering.txt"
+_PROMPT_PLACEHOLDERS = (
+    "existing_clusters",
+    "new_pains",
+)
 _INTENSITY_MAP = {"low": 1, "medium": 2, "high": 3}
 
-try:
-    _llm = ChatOpenAI(
-        openai_api_key=config.COMET_API_KEY,
-        openai_api_base=config.COMET_API_BASE_URL,
-        model=config.COMET_API_MODEL,
-        temperature=0.3,
-        request_timeout=90,
-    )
-    logger.info("pain_clusterer: LLM client initialized.")
-except Exception as _e:
-    _llm = None
-    logger.error(f"pain_clusterer: Failed to initialize LLM client: {_e}")
+_llm = llm_gateway.GatewayLLM(
+    "pain_clustering",
+    model=config.PAIN_CLUSTERING_MODEL,
+    temperature=0.3,
+    request_timeout=90,
+)
 
 
-def _load_prompt() -> str:
-    """Load and cache the pain clustering prompt template."""
-    global _PROMPT_CACHE
-    if _PROMPT_CACHE is None:
-        with open("prompts/pain_clustering.txt", "r", encoding="utf-8") as f:
-            _PROMPT_CACHE = f.read()
-    return _PROMPT_CACHE
+def _load_prompt() -> prompt_registry.PromptTemplate:
+    """Return the pain clustering prompt template from the shared registry."""
+    return prompt_registry.get_prompt(_PROMPT_PATH, _PROMPT_PLACEHOLDERS)
 
 
 def _parse_llm_json(raw: str) -> dict:
@@ -55,7 +49,7 @@ def _parse_llm_json(raw: str) -> dict:
 
 
 def _render_prompt(
-    template: str,
+    template: "prompt_registry.PromptTemplate | str",
     *,
     existing_clusters: str,
     new_pains: str,
@@ -65,10 +59,10 @@ def _render_prompt(
     We intentionally avoid str.format() because prompt templates contain JSON
     examples with many curly braces.
     """
-    return (
-        template
-        .replace("{existing_clusters}", existing_clusters)
-        .replace("{new_pains}", new_pains)
+    return prompt_registry.render(
+        template,
+        existing_clusters=existing_clusters,
+        new_pains=new_pains,
     )
 
 
@@ -184,17 +178,25 @@ async def cluster_new_pains(program_id: int, session: AsyncSession) -> int:
         logger.error("pain_clusterer: LLM not initialized.")
         return 0
 
+    stream = json_stream.JsonArrayStream("assignments")
     try:
-        response = await _llm.ainvoke([HumanMessage(content=prompt)])
-        result = _parse_llm_json(response.content)
+        response_text = await json_stream.astream_json(
+            _llm, [HumanMessage(content=prompt)], stream
+        )
+        assignments: list[dict[str, Any]] = (
+            _parse_llm_json(response_text).get("assignments", [])
+        )
     except json.JSONDecodeError as e:
-        logger.warning(f"pain_clusterer: JSON parse error: {e}")
-        return 0
+        # Keep every assignment that was complete before the output broke off
+        assignments = stream.items
+        logger.warning(
+            f"pain_clusterer: JSON parse error: {e}. "
+            f"Recovered {len(assignments)} complete assignments."
+        )
     except Exception as e:
         logger.error(f"pain_clusterer: LLM call failed: {e}")
         return 0
 
-    assignments: list[dict[str, Any]] = result.get("assignments", [])
     if not assignments:
         logger.info("pain_clusterer: LLM returned no assignments.")
         return 0
@@ -6,39 +6,56 @@ import random
 from datetime import datetime, timezone
 from typing import Any
 
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
-from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import config
 from bot.models.pain import Pain
+from modules import json_stream, llm_gateway, prompt_packing, prompt_registry
 
 logger = logging.getLogger(__name__)
 
-_PROMPT_CACHE: str | None = None
-
-try:
-    _llm = ChatOpenAI(
-        openai_api_key=config.COMET_API_KEY,
-        openai_api_base=config.COMET_API_BASE_URL,
-        model=config.COMET_API_MODEL,
-        temperature=0.2,
-        request_timeout=60,
-    )
-    logger.info("pain_collector: LLM client initialized.")
-except Exception as _e:
-    _llm = None
-    logger.error(f"pain_collector: Failed to initialize LLM client: {_e}")
-
-
-def _load_prompt() -> str:
-    """Load and cache the pain extraction prompt template."""
-    global _PROMPT_CACHE
-    if _PROMPT_CACHE is None:
-        with open("prompts/pain_extraction.txt", "r", encoding="utf-8") as f:
-            _PROMPT_CACHE = f.read()
-    return _PROMPT_CACHE
+_PROMPT_PATH = "prompts/pain_extraction.txt"
+_PROMPT_PLACEHOLDERS = (
+    "chat_name",
+    "messages",
+)
+
+# Pain extraction calls in flight per streamed chat
+_STREAM_CONCURRENCY = 2
+# Batches held per streamed chat (in flight or waiting); add() waits for a
+# slot so a chat read faster than pains are extracted slows the reader down
+_STREAM_MAX_PENDING = 2 * _STREAM_CONCURRENCY
+
+# Columns set when inserting pains; every row of one INSERT has all of them
+_PAIN_INSERT_COLUMNS = (
+    "user_id",
+    "program_id",
+    "text",
+    "original_quote",
+    "category",
+    "intensity",
+    "business_type",
+    "source_chat",
+    "source_message_id",
+    "source_message_link",
+    "source_user_id",
+    "source_username",
+    "message_date",
+)
+
+_llm = llm_gateway.GatewayLLM(
+    "pain_extraction",
+    model=config.PAIN_EXTRACTION_MODEL,
+    temperature=0.2,
+    request_timeout=60,
+)
+
+
+def _load_prompt() -> prompt_registry.PromptTemplate:
+    """Return the pain extraction prompt template from the shared registry."""
+    return prompt_registry.get_prompt(_PROMPT_PATH, _PROMPT_PLACEHOLDERS)
 
 
 def _parse_llm_json(raw: str) -> dict:
@@ -111,7 +128,7 @@ def _parse_message_date(raw_date: Any) -> datetime | None:
 
 
 def _render_prompt(
-    template: str,
+    template: "prompt_registry.PromptTemplate | str",
     *,
     chat_name: str,
     messages: str,
@@ -121,48 +138,130 @@ def _render_prompt(
     We intentionally avoid str.format() because prompt templates contain JSON
     examples with many curly braces.
     """
-    return (
-        template
-        .replace("{chat_name}", chat_name)
-        .replace("{messages}", messages)
+    return prompt_registry.render(
+        template,
+        chat_name=chat_name,
+        messages=messages,
     )
 
 
 async def _extract_pains_batch(
     messages_batch: list[dict],
     chat_name: str,
-    prompt_template: str,
+    prompt_template: prompt_registry.PromptTemplate,
 ) -> list[dict[str, Any]]:
     """Call LLM asynchronously on one batch; return list of raw pain dicts."""
     if not _llm:
         logger.error("pain_collector: LLM not initialized, skipping batch.")
         return []
 
-    formatted = [
-        {"index": i, "text": msg["text"]}
-        for i, msg in enumerate(messages_batch)
-    ]
-    messages_json = json.dumps(formatted, ensure_ascii=False, indent=2)
+    # Indices stay those of messages_batch, so deduplicated or dropped
+    # messages do not shift source_message_index
+    packed = prompt_packing.pack_items(
+        [
+            {"index": i, "text": msg["text"]}
+            for i, msg in enumerate(messages_batch)
+        ],
+        max_item_tokens=config.PROMPT_MAX_MESSAGE_TOKENS,
+        token_budget=config.PAIN_PROMPT_TOKEN_BUDGET,
+    )
     prompt = _render_prompt(
         prompt_template,
         chat_name=chat_name,
-        messages=messages_json,
+        messages=prompt_packing.compact_json(packed.items),
     )
+    prompt_packing.log_prompt_estimate("pain_collector: batch", prompt, packed)
 
+    stream = json_stream.JsonArrayStream("pains")
     try:
-        response = await _llm.ainvoke([HumanMessage(content=prompt)])
-        result = _parse_llm_json(response.content)
+        response_text = await json_stream.astream_json(
+            _llm, [HumanMessage(content=prompt)], stream
+        )
+        result = _parse_llm_json(response_text)
         pains = result.get("pains", [])
         logger.info(f"pain_collector: Batch returned {len(pains)} pains.")
         return pains
     except json.JSONDecodeError as e:
-        logger.warning(f"pain_collector: JSON parse error in batch: {e}")
-        return []
+        # Keep every pain that was complete before the output broke off
+        logger.warning(
+            f"pain_collector: JSON parse error in batch: {e}. "
+            f"Recovered {len(stream.items)} complete pains."
+        )
+        return stream.items
     except Exception as e:
         logger.error(f"pain_collector: LLM call failed: {e}")
         return []
 
 
+async def insert_pains(session: AsyncSession, rows: list[dict[str, Any]]) -> int:
+    """Insert pain rows with one statement, skipping known ones.
+
+    Duplicates on uq_pain_message_quote (already stored, inserted by a
+    concurrent worker, or repeated within `rows`) are left out by
+    ON CONFLICT DO NOTHING.
+
+    Returns:
+        Number of pains actually inserted.
+    """
+    if not rows:
+        return 0
+    stmt = (
+        pg_insert(Pain)
+        .values([{column: row.get(column) for column in _PAIN_INSERT_COLUMNS} for row in rows])
+        .on_conflict_do_nothing(constraint="uq_pain_message_quote")
+        .returning(Pain.id)
+    )
+    result = await session.execute(stmt)
+    return len(result.scalars().all())
+
+
+async def _store_batch_pains(
+    batch: list[dict],
+    raw_pains: list[dict[str, Any]],
+    user_id: int,
+    program_id: int,
+    session: AsyncSession,
+) -> int:
+    """Insert the new pains of one extracted batch; return their count."""
+    rows = []
+    for raw in raw_pains:
+        idx = raw.get("source_message_index", 0)
+        if not isinstance(idx, int) or idx < 0 or idx >= len(batch):
+            logger.warning(
+                f"pain_collector: Invalid source_message_index={idx}, skipping."
+            )
+            continue
+
+        source_msg = batch[idx]
+        text = _normalize_text(raw.get("text"))
+        original_quote = _normalize_text(raw.get("original_quote"))
+
+        # Skip malformed LLM rows that would violate NOT NULL constraints
+        # or create unusable pain records.
+        if not text or not original_quote:
+            logger.debug(
+                "pain_collector: Skipping malformed pain row "
+                "(empty text/original_quote)."
+            )
+            continue
+
+        rows.append({
+            "user_id": user_id,
+            "program_id": program_id,
+            "text": text,
+            "original_quote": original_quote,
+            "category": _normalize_category(raw.get("category")),
+            "intensity": _normalize_intensity(raw.get("intensity")),
+            "business_type": _normalize_text(raw.get("business_type"), None),
+            "source_chat": source_msg.get("chat_username") or "",
+            "source_message_id": source_msg["message_id"],
+            "source_message_link": source_msg.get("link"),
+            "message_date": _parse_message_date(source_msg.get("date")),
+        })
+
+    return await insert_pains(session, rows)
+
+
 async def collect_pains(
     all_messages: list[dict],
     user_id: int,
@@ -202,67 +301,9 @@ async def collect_pains(
         )
 
         raw_pains = await _extract_pains_batch(batch, chat_name, prompt_template)
-
-        for raw in raw_pains:
-            idx = raw.get("source_message_index", 0)
-            if not isinstance(idx, int) or idx < 0 or idx >= len(batch):
-                logger.warning(
-                    f"pain_collector: Invalid source_message_index={idx}, skipping."
-                )
-                continue
-
-            source_msg = batch[idx]
-            text = _normalize_text(raw.get("text"))
-            original_quote = _normalize_text(raw.get("original_quote"))
-            category = _normalize_category(raw.get("category"))
-            intensity = _normalize_intensity(raw.get("intensity"))
-            business_type = _normalize_text(raw.get("business_type"), None)
-            source_chat = source_msg.get("chat_username") or ""
-
-            # Skip malformed LLM rows that would violate NOT NULL constraints
-            # or create unusable pain records.
-            if not text or not original_quote:
-                logger.debug(
-                    "pain_collector: Skipping malformed pain row "
-                    "(empty text/original_quote)."
-                )
-                continue
-
-            # Deduplication check
-            with session.no_autoflush:
-                existing = (
-                    await session.execute(
-                        select(Pain).where(
-                            Pain.user_id == user_id,
-                            Pain.source_message_id == source_msg["message_id"],
-                            Pain.source_chat == source_chat,
-                            Pain.original_quote == original_quote,
-                        )
-                    )
-                ).scalars().first()
-
-            if existing:
-                continue
-
-            msg_date = _parse_message_date(source_msg.get("date"))
-
-            pain = Pain(
-                user_id=user_id,
-                program_id=program_id,
-                text=text,
-                original_quote=original_quote,
-                category=category,
-                intensity=intensity,
-                business_type=business_type,
-                source_chat=source_chat,
-                source_message_id=source_msg["message_id"],
-                source_message_link=source_msg.get("link"),
-                message_date=msg_date,
-            )
-            session.add(pain)
-            new_pains_count += 1
-
-        await session.flush()
+        new_pains_count += await _store_batch_pains(
+            batch, raw_pains, user_id, program_id, session
+        )
 
         # Delay between batches to respect rate limits
         if batch_num < total_batches - 1:
@@ -277,3 +318,93 @@ async def collect_pains(
         )
 
     return new_pains_count
+
+
+class PainStream:
+    """Extracts pains from chat messages while the chat is still being read.
+
+    The parser awaits `add()` for every text message; each full batch of
+    PAIN_BATCH_SIZE messages is extracted in a background task (at most
+    _STREAM_CONCURRENCY at once) and its pains are saved under `db_lock`.
+    Once _STREAM_MAX_PENDING batches are pending, `add()` waits for one of
+    them to finish, so at most that many batches are held in memory instead
+    of the whole chat. `close()` submits the last partial batch, waits for
+    all batches and commits; `cancel()` drops them.
+    """
+
+    def __init__(
+        self,
+        user_id: int,
+        program_id: int,
+        chat_name: str,
+        session: AsyncSession,
+        *,
+        db_lock: asyncio.Lock | None = None,
+    ) -> None:
+        self.user_id = user_id
+        self.program_id = program_id
+        self.chat_name = chat_name
+        self.session = session
+        self.new_pains = 0
+        self.enabled = config.PAIN_COLLECTION_ENABLED
+        self._db_lock = db_lock or asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(_STREAM_CONCURRENCY)
+        self._pending_slots = asyncio.Semaphore(_STREAM_MAX_PENDING)
+        self._batch: list[dict] = []
+        self._batches_submitted = 0
+        self._tasks: set[asyncio.Task] = set()
+
+    async def add(self, message: dict) -> None:
+        if not self.enabled:
+            return
+        self._batch.append(message)
+        if len(self._batch) >= max(1, config.PAIN_BATCH_SIZE):
+            await self._submit()
+
+    async def _submit(self) -> None:
+        batch, self._batch = self._batch, []
+        await self._pending_slots.acquire()
+        self._batches_submitted += 1
+        task = asyncio.create_task(self._process(batch, self._batches_submitted))
+        self._tasks.add(task)
+        task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self._pending_slots.release()
+
+    async def _process(self, batch: list[dict], batch_num: int) -> None:
+        async with self._semaphore:
+            logger.info(
+                f"pain_collector: Streamed batch {batch_num} "
+                f"({len(batch)} messages) from '{self.chat_name}'."
+            )
+            raw_pains = await _extract_pains_batch(batch, self.chat_name, _load_prompt())
+        async with self._db_lock:
+            self.new_pains += await _store_batch_pains(
+                batch, raw_pains, self.user_id, self.program_id, self.session
+            )
+
+    async def close(self) -> int:
+        """Process the remaining messages, commit and return the new pain count."""
+        try:
+            if self._batch:
+                await self._submit()
+            while self._tasks:
+                await asyncio.gather(*self._tasks)
+        except BaseException:
+            self.cancel()
+            raise
+        if self.new_pains:
+            async with self._db_lock:
+                await self.session.commit()
+            logger.info(
+                f"pain_collector: Saved {self.new_pains} new pains "
+                f"from '{self.chat_name}' for program_id={self.program_id}."
+            )
+        return self.new_pains
+
+    def cancel(self) -> None:
+        self._batch = []
+        for task in self._tasks:
+            task.cancel()
@@ -0,0 +1,178 @@
+"""Profile fetcher: rate-limited concurrent full-profile fetch for stage 2.
+
+Bios are only available via users.GetFullUser (one user per call), so the
+calls run through a bounded pool governed by the shared token bucket.
+Results are cached in-process and in the DB-backed entity cache with a TTL
+so repeat candidates across runs and programs skip the fetch.
+"""
+import asyncio
+import logging
+import re
+import time
+from typing import AsyncIterator
+
+import telethon.tl.types
+from telethon.errors import FloodWaitError
+from telethon.tl import functions
+
+import config
+from modules import entity_cache
+from modules.rate_limiter import telegram_limiter
+
+logger = logging.getLogger(__name__)
+
+# user_id -> (fetched_at monotonic timestamp, bio)
+_BIO_CACHE: dict[int, tuple[float, str | None]] = {}
+
+
+def find_channel_in_bio(bio_text: str) -> str | None:
+    """Finds a potential personal channel link in a user's bio."""
+    if not bio_text:
+        return None
+    match = re.search(r'(?<!\w)@([a-zA-Z0-9_]{5,32})', bio_text)
+    if match:
+        return match.group(0)
+    match = re.search(r't\.me\/([a-zA-Z0-9_]{5,32})', bio_text)
+    if match:
+        return "t.me/" + match.group(1)
+    return None
+
+
+def _cache_ttl_seconds() -> float:
+    return config.PROFILE_CACHE_TTL_HOURS * 3600
+
+
+def get_cached_bio(user_id: int) -> tuple[bool, str | None]:
+    """Return (hit, bio) from the in-process bio cache."""
+    entry = _BIO_CACHE.get(user_id)
+    if entry is None:
+        return False, None
+    fetched_at, bio = entry
+    if time.monotonic() - fetched_at > _cache_ttl_seconds():
+        _BIO_CACHE.pop(user_id, None)
+        return False, None
+    return True, bio
+
+
+def cache_bio(user_id: int, bio: str | None) -> None:
+    """Store a bio in the in-process bio cache."""
+    _BIO_CACHE[user_id] = (time.monotonic(), bio)
+
+
+async def _fetch_bio(client, user, semaphore: asyncio.Semaphore) -> str | None:
+    """Fetch one user's bio with GetFullUser, retrying after FloodWait."""
+    # A real User carries its access hash; fall back to the session cache by id
+    peer = user if isinstance(user, telethon.tl.types.User) else user.id
+    async with semaphore:
+        for attempt in range(config.MAX_FLOODWAIT_RETRIES + 1):
+            await telegram_limiter.acquire()
+            try:
+                full = await client(functions.users.GetFullUserRequest(id=peer))
+                return full.full_user.about
+            except FloodWaitError as e:
+                if attempt >= config.MAX_FLOODWAIT_RETRIES:
+                    raise
+                wait_time = e.seconds + config.FLOODWAIT_EXTRA_SECONDS
+                logger.warning(
+                    f"FloodWaitError during get_full_user: waiting {wait_time} seconds "
+                    f"(retry {attempt + 1}/{config.MAX_FLOODWAIT_RETRIES})"
+                )
+                # The next acquire() waits out the pause for every caller
+                telegram_limiter.pause(wait_time)
+    return None
+
+
+async def _fetch_profile(client, user, semaphore: asyncio.Semaphore):
+    """Fetch one bio, returning (user, bio, error) instead of raising."""
+    try:
+        return user, await _fetch_bio(client, user, semaphore), None
+    except Exception as e:
+        return user, None, e
+
+
+async def iter_bios(client, users: list) -> AsyncIterator[tuple[object, str | None]]:
+    """Yield (user, bio) pairs as soon as each bio is available.
+
+    Fresh bios from the in-process and DB caches are yielded first, the rest
+    in completion order of the rate-limited fetch pool. Users whose fetch
+    failed are yielded with a None bio (and are not cached). Fetched profiles
+    are written to the DB cache once the generator finishes or is closed.
+
+    Args:
+        client: Connected Telethon client.
+        users: User objects (anything with `id`) to fetch bios for.
+    """
+    to_fetch = []
+    for user in users:
+        hit, bio = get_cached_bio(user.id)
+        if hit:
+            yield user, bio
+        else:
+            to_fetch.append(user)
+
+    if not to_fetch:
+        return
+
+    # Persistent profile cache shared across runs, programs and workers
+    try:
+        stored = await entity_cache.get_profiles([user.id for user in to_fetch])
+    except Exception as e:
+        logger.warning(f"Profile cache lookup failed: {e}")
+        stored = {}
+    for user in to_fetch:
+        profile = stored.get(user.id)
+        if profile is not None:
+            cache_bio(user.id, profile.bio)
+            yield user, profile.bio
+    to_fetch = [user for user in to_fetch if user.id not in stored]
+
+    if not to_fetch:
+        return
+
+    logger.info(
+        f"Fetching {len(to_fetch)} full profiles "
+        f"({len(users) - len(to_fetch)} served from cache)..."
+    )
+    semaphore = asyncio.Semaphore(max(1, config.PROFILE_FETCH_CONCURRENCY))
+    tasks = [
+        asyncio.create_task(_fetch_profile(client, user, semaphore))
+        for user in to_fetch
+    ]
+    fetched_profiles = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            user, bio, error = await next_done
+            if error is not None:
+                logger.warning(f"Failed to fetch full profile for user_id={user.id}: {error}")
+            else:
+                cache_bio(user.id, bio)
+                fetched_profiles.append({
+                    "user_id": user.id,
+                    "username": getattr(user, "username", None),
+                    "bio": bio,
+                    "channel_in_bio": find_channel_in_bio(bio),
+                })
+            yield user, bio
+    finally:
+        for task in tasks:
+            task.cancel()
+        if fetched_profiles:
+            try:
+                await entity_cache.store_profiles(fetched_profiles)
+            except Exception as e:
+                logger.warning(
+                    f"Could not store {len(fetched_profiles)} profiles in cache: {e}"
+                )
+
+
+async def fetch_bios(client, users: list) -> dict[int, str | None]:
+    """Fetch bios for users, serving fresh ones from the TTL cache.
+
+    Args:
+        client: Connected Telethon client.
+        users: User objects (anything with `id`) to fetch bios for.
+
+    Returns:
+        Mapping user_id -> bio. Users whose fetch failed map to None.
+    """
+    return {user.id: bio async for user, bio in iter_bios(client, users)}
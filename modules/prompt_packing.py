@@ -0,0 +1,113 @@
+"""Prompt packing: compact serialization and token budgets for LLM calls.
+
+Token counts are estimated offline with a character heuristic (no tokenizer
+download): ~4 characters per token for ASCII text and ~2 for other scripts
+(Cyrillic takes noticeably more tokens per character). The estimates are
+meant for budgeting and tuning batch sizes, not for billing.
+"""
+import json
+import logging
+import re
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in text."""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for char in text if char.isascii())
+    other_chars = len(text) - ascii_chars
+    return ascii_chars // 4 + other_chars // 2 + 1
+
+
+def compact_json(value: Any) -> str:
+    """Serialize to JSON without insignificant whitespace."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _collapse_whitespace(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", text or "").strip()
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Collapse whitespace and cut text to roughly max_tokens tokens."""
+    text = _collapse_whitespace(text)
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Binary search for the longest prefix that fits the budget
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) + 1 <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + "…"
+
+
+class PackResult:
+    """Items packed for one LLM call plus what packing did to them."""
+
+    __slots__ = ("items", "estimated_tokens", "truncated", "duplicates", "dropped")
+
+    def __init__(self) -> None:
+        self.items: list[dict] = []
+        self.estimated_tokens = 0
+        self.truncated = 0
+        self.duplicates = 0
+        self.dropped = 0
+
+
+def pack_items(
+    items: list[dict],
+    *,
+    text_key: str = "text",
+    max_item_tokens: int,
+    token_budget: int,
+    dedupe: bool = True,
+) -> PackResult:
+    """Fit items into a per-call token budget.
+
+    Each item's text is whitespace-collapsed and truncated to max_item_tokens;
+    with dedupe, items whose normalized text was already seen are skipped.
+    Items that no longer fit into token_budget (estimated on the compact JSON
+    of each item) are dropped. Input items are not modified.
+    """
+    result = PackResult()
+    seen_texts: set[str] = set()
+    for item in items:
+        text = _collapse_whitespace(item.get(text_key) or "")
+        packed_text = truncate_to_tokens(text, max_item_tokens)
+        if dedupe:
+            dedupe_key = packed_text.lower()
+            if dedupe_key in seen_texts:
+                result.duplicates += 1
+                continue
+            seen_texts.add(dedupe_key)
+        packed = {**item, text_key: packed_text}
+        tokens = estimate_tokens(compact_json(packed))
+        if result.items and result.estimated_tokens + tokens > token_budget:
+            result.dropped += 1
+            continue
+        if packed_text != text:
+            result.truncated += 1
+        result.items.append(packed)
+        result.estimated_tokens += tokens
+    return result
+
+
+def log_prompt_estimate(purpose: str, prompt: str, pack: PackResult | None = None) -> int:
+    """Log the estimated prompt size of one LLM call and return it."""
+    tokens = estimate_tokens(prompt)
+    details = ""
+    if pack is not None:
+        details = (
+            f" ({len(pack.items)} items, {pack.truncated} truncated, "
+            f"{pack.duplicates} duplicates, {pack.dropped} dropped)"
+        )
+    logger.info(f"{purpose}: ~{tokens} prompt tokens{details}")
+    return tokens
@@ -0,0 +1,93 @@
+"""Prompt registry: prompt templates loaded once and shared across modules.
+
+Templates are read from disk on first use and re-read only when the file's
+mtime changes. Each template is pre-split around its known placeholders so
+rendering is a single join. The template also carries a short content hash
+(`version`) that caches can use as a key.
+
+Only known placeholders are substituted: prompt files contain JSON examples
+with many curly braces, so str.format() cannot be used.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def _split(text: str, placeholders: tuple[str, ...]) -> tuple[list[str], list[str]]:
+    """Split text into literal chunks and the placeholder names between them."""
+    if not placeholders:
+        return [text], []
+    pattern = "|".join(re.escape(name) for name in placeholders)
+    pieces = re.split(r"\{(" + pattern + r")\}", text)
+    return pieces[0::2], pieces[1::2]
+
+
+class PromptTemplate:
+    """An immutable, pre-split prompt template."""
+
+    __slots__ = ("path", "text", "version", "mtime", "placeholders", "_literals", "_names")
+
+    def __init__(
+        self,
+        text: str,
+        placeholders: tuple[str, ...] = (),
+        path: str | None = None,
+        mtime: int | None = None,
+    ) -> None:
+        self.path = path
+        self.text = text
+        self.mtime = mtime
+        self.placeholders = placeholders
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        self._literals, self._names = _split(text, placeholders)
+
+    def __bool__(self) -> bool:
+        return bool(self.text)
+
+    def render(self, **values) -> str:
+        """Substitute the given placeholders; others are left untouched."""
+        parts = [self._literals[0]]
+        for name, literal in zip(self._names, self._literals[1:]):
+            value = values.get(name)
+            parts.append("{" + name + "}" if value is None else str(value))
+            parts.append(literal)
+        return "".join(parts)
+
+
+_REGISTRY: dict[tuple[str, tuple[str, ...]], PromptTemplate] = {}
+_LOCK = threading.Lock()
+
+
+def get_prompt(path: str, placeholders: tuple[str, ...] = ()) -> PromptTemplate:
+    """Return the template for path, reloading it if the file changed.
+
+    Raises:
+        FileNotFoundError: If the prompt file does not exist.
+    """
+    key = (path, tuple(placeholders))
+    mtime = os.stat(path).st_mtime_ns
+    template = _REGISTRY.get(key)
+    if template is not None and template.mtime == mtime:
+        return template
+
+    with _LOCK:
+        template = _REGISTRY.get(key)
+        if template is not None and template.mtime == mtime:
+            return template
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        template = PromptTemplate(text, key[1], path=path, mtime=mtime)
+        _REGISTRY[key] = template
+        logger.info(f"Loaded prompt template {path} (version {template.version})")
+        return template
+
+
+def render(template: "PromptTemplate | str", **values) -> str:
+    """Render a registry template or a raw template string."""
+    if not isinstance(template, PromptTemplate):
+        template = PromptTemplate(template, tuple(values))
+    return template.render(**values)
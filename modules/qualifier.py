@@ -2,19 +2,24 @@ import json
 import asyncio
 import logging
 import re
+import sys
 import time
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable
 
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 
 import config
+from modules import json_stream, llm_cache, llm_gateway, prompt_packing, prompt_registry
+from modules.llm_cache import qualification_cache
 
 logging.basicConfig(
     level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+_QUALIFICATION_PROMPT_PATH = "prompts/qualification_v2.txt"
+_BATCH_ANALYSIS_PROMPT_PATH = "prompts/chat_batch_analysis.txt"
+
 
 def _extract_json_payload(raw: str) -> str:
     """Extract JSON object from raw LLM output."""
@@ -53,62 +58,11 @@ def _recover_partial_batch_response(
     If model output is cut in the middle, recover complete lead objects from
     the `potential_leads` array and return a valid minimal response.
     """
-    text = (raw or "").strip()
-    if not text:
-        return None
-
-    arr_key = '"potential_leads"'
-    arr_idx = text.find(arr_key)
-    if arr_idx == -1:
-        return None
-
-    arr_start = text.find("[", arr_idx)
-    if arr_start == -1:
-        return None
-
-    # Parse complete JSON objects inside potential_leads array.
-    leads: list[Dict[str, Any]] = []
-    depth = 0
-    obj_start = -1
-    in_string = False
-    escaped = False
-    i = arr_start + 1
-    while i < len(text):
-        ch = text[i]
-
-        if in_string:
-            if escaped:
-                escaped = False
-            elif ch == "\\":
-                escaped = True
-            elif ch == '"':
-                in_string = False
-            i += 1
-            continue
-
-        if ch == '"':
-            in_string = True
-        elif ch == "{":
-            if depth == 0:
-                obj_start = i
-            depth += 1
-        elif ch == "}":
-            if depth > 0:
-                depth -= 1
-                if depth == 0 and obj_start != -1:
-                    chunk = text[obj_start : i + 1]
-                    try:
-                        obj = json.loads(chunk)
-                    except json.JSONDecodeError:
-                        obj = None
-                    if isinstance(obj, dict) and obj.get("username"):
-                        leads.append(obj)
-                    obj_start = -1
-        elif ch == "]" and depth == 0:
-            break
-
-        i += 1
-
+    leads = [
+        lead
+        for lead in json_stream.extract_array_items(raw, "potential_leads")
+        if lead.get("username")
+    ]
     if not leads:
         return None
 
@@ -125,31 +79,26 @@ def _recover_partial_batch_response(
         "recovered_from_truncated_json": True,
     }
 
-# Initialize LLM once at the module level to save memory
-try:
-    llm = ChatOpenAI(
-        openai_api_key=config.COMET_API_KEY,
-        openai_api_base=config.COMET_API_BASE_URL,
-        model=config.COMET_API_MODEL,
-        temperature=0.5,
-        request_timeout=60
-    )
-    logger.info("LLM client initialized successfully.")
-except Exception as e:
-    llm = None
-    logger.error(f"Failed to initialize LLM client: {e}")
+# Shared, rate-limited client for qualification and batch analysis
+llm = llm_gateway.GatewayLLM(
+    "qualification",
+    model=config.QUALIFICATION_MODEL,
+    temperature=0.5,
+    request_timeout=60,
+)
 
 
-def load_qualification_prompt() -> str:
-    """Loads the v2 qualification prompt from the file."""
+def load_qualification_prompt() -> prompt_registry.PromptTemplate | None:
+    """Returns the v2 qualification prompt from the shared prompt registry."""
     try:
-        with open('prompts/qualification_v2.txt', 'r', encoding='utf-8') as f:
-            return f.read()
+        return prompt_registry.get_prompt(
+            _QUALIFICATION_PROMPT_PATH, ("services_description",)
+        )
     except FileNotFoundError:
         logger.error(
-            "Qualification prompt file not found at 'prompts/qualification_v2.txt'"
+            f"Qualification prompt file not found at '{_QUALIFICATION_PROMPT_PATH}'"
         )
-        return ""
+        return None
 
 
 def get_freshness_emoji(freshness: str) -> str:
@@ -237,7 +186,51 @@ def get_freshness_summary(candidate_data: dict) -> Dict[str, Any]:
     }
 
 
-def qualify_lead(
+def _qualification_cache_key(
+    prompt_template,
+    niche: str,
+    services_text: str,
+    candidate_data: dict,
+) -> str:
+    """Content-addressed cache key for one qualification request.
+
+    Volatile fields (age_display, freshness, messages_in_chat, links) are
+    left out so the same person with the same messages hits the cache
+    across chats and days.
+    """
+    prompt_version = getattr(prompt_template, "version", None) or llm_cache.make_key(
+        str(prompt_template)
+    )
+    messages = candidate_data.get("messages_with_metadata") or []
+    message_texts = [msg.get("text", "") for msg in messages] or list(
+        candidate_data.get("sample_messages") or []
+    )
+    return llm_cache.make_key(
+        prompt_version,
+        config.QUALIFICATION_MODEL,
+        niche,
+        services_text,
+        {
+            "username": candidate_data.get("username"),
+            "first_name": candidate_data.get("first_name"),
+            "last_name": candidate_data.get("last_name"),
+            "bio": candidate_data.get("bio"),
+            "messages": message_texts,
+        },
+    )
+
+
+async def _ainvoke_with_timeout(messages: list):
+    """Call the LLM natively on the event loop with a per-call timeout.
+
+    Cancelling the awaiting task cancels the underlying HTTP request.
+    """
+    return await asyncio.wait_for(
+        llm.ainvoke(messages), timeout=config.LLM_CALL_TIMEOUT_SECONDS
+    )
+
+
+async def qualify_lead_async(
     candidate_data: dict,
     niche: str,
     user_services_description: str = "",
@@ -256,7 +249,9 @@ def qualify_lead(
     services_text = (user_services_description or "").strip()
     if not services_text:
         services_text = "Пользователь не указал описание услуг."
-    prompt_template = prompt_template.replace("{services_description}", services_text)
+    prompt_text = prompt_registry.render(
+        prompt_template, services_description=services_text
+    )
 
     # Build input data
     input_data = (
@@ -280,25 +275,36 @@ def qualify_lead(
         )
     )
     human_message = HumanMessage(
-        content=f"{prompt_template}\n\nВот полные данные для анализа:\n{input_data}"
+        content=f"{prompt_text}\n\nВот полные данные для анализа:\n{input_data}"
     )
 
     try:
         username = candidate_data.get('username', 'N/A')
         logger.info(f"Qualifying lead: @{username}. Waiting for LLM...")
 
-        start_time = time.time()
-        response = llm.invoke([system_message, human_message])
-        end_time = time.time()
-        duration = end_time - start_time
-
-        logger.info(
-            f"LLM response received for @{username}. "
-            f"Call duration: {duration:.2f} seconds."
+        cache_key = _qualification_cache_key(
+            prompt_template, niche, services_text, candidate_data
         )
+        response_text = await qualification_cache.get(cache_key)
+        from_cache = response_text is not None
+        if from_cache:
+            logger.info(f"Qualification cache hit for @{username}, skipping LLM call.")
+        else:
+            start_time = time.time()
+            response = await _ainvoke_with_timeout([system_message, human_message])
+            end_time = time.time()
+            duration = end_time - start_time
+            response_text = response.content
 
-        parsed_response = _parse_llm_json(response.content)
+            logger.info(
+                f"LLM response received for @{username}. "
+                f"Call duration: {duration:.2f} seconds."
+            )
+
+        parsed_response = _parse_llm_json(response_text)
         logger.info(f"Successfully parsed LLM response for @{username}")
+        if not from_cache:
+            await qualification_cache.set(cache_key, response_text)
 
         # Get freshness summary for metadata (display only)
         freshness_summary = get_freshness_summary(candidate_data)
@@ -367,13 +373,23 @@ def qualify_lead(
             **parsed_response
         }
 
+    except asyncio.TimeoutError:
+        username = candidate_data.get('username', 'N/A')
+        logger.error(
+            f"LLM call timed out after {config.LLM_CALL_TIMEOUT_SECONDS}s "
+            f"while qualifying @{username}"
+        )
+        return {"error": "LLM call timed out"}
     except json.JSONDecodeError as e:
         username = candidate_data.get('username', 'N/A')
         logger.error(
             f"Failed to decode JSON from LLM response for @{username}: {e}"
         )
-        logger.error(f"Raw response content: {response.content[:500]}")
-        return {"error": "JSONDecodeError", "raw_response": response.content}
+        logger.error(f"Raw response content: {response_text[:500]}")
+        return {"error": "JSONDecodeError", "raw_response": response_text}
+    except llm_gateway.LLMBudgetExceededError:
+        # Not a per-lead failure: the whole run has to stop
+        raise
     except Exception as e:
         username = candidate_data.get('username', 'N/A')
         logger.error(
@@ -382,35 +398,38 @@ def qualify_lead(
         return {"error": str(e)}
 
 
-async def qualify_lead_async(
+def qualify_lead(
     candidate_data: dict,
     niche: str,
     user_services_description: str = "",
 ) -> dict:
-    """Async wrapper that runs blocking qualification in a worker thread."""
-    return await asyncio.to_thread(
-        qualify_lead,
-        candidate_data,
-        niche,
-        user_services_description,
+    """Blocking shim around qualify_lead_async for callers without a loop."""
+    return asyncio.run(
+        qualify_lead_async(candidate_data, niche, user_services_description)
     )
 
 
-def load_batch_analysis_prompt() -> str:
-    """Loads the batch chat analysis prompt from the file."""
+def load_batch_analysis_prompt() -> prompt_registry.PromptTemplate | None:
+    """Returns the batch chat analysis prompt from the shared prompt registry."""
     try:
-        with open('prompts/chat_batch_analysis.txt', 'r', encoding='utf-8') as f:
-            return f.read()
+        return prompt_registry.get_prompt(_BATCH_ANALYSIS_PROMPT_PATH)
     except FileNotFoundError:
         logger.error(
-            "Batch analysis prompt file not found at 'prompts/chat_batch_analysis.txt'"
+            f"Batch analysis prompt file not found at '{_BATCH_ANALYSIS_PROMPT_PATH}'"
         )
-        return ""
+        return None
 
 
-def batch_analyze_chat(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+async def batch_analyze_chat_async(
+    messages: List[Dict[str, Any]],
+    on_lead: Callable[[Dict[str, Any]], None] | None = None,
+) -> Dict[str, Any]:
     """
-    Analyzes an entire chat's messages in one LLM call to identify potential leads.
+    Analyzes an entire chat's messages to identify potential leads.
+
+    Users are split into token-budgeted chunks that are screened
+    concurrently; the chunk results are merged. Truncated or invalid JSON is
+    recovered or retried per chunk, so a failure never re-sends the chat.
 
     This is the first stage of two-stage qualification:
     1. Batch screening (this function) - identifies candidates with pain/problems
@@ -422,12 +441,16 @@ def batch_analyze_chat(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
             - text: str (message text)
             - date: str (ISO format date)
             - messages_count: int (total messages from this user)
+        on_lead: Optional callback invoked with each potential lead as soon
+            as the streamed LLM output contains it (once per username)
 
     Returns:
         Dictionary with:
         - potential_leads: List[Dict] with username, priority, pain_summary, etc.
         - filtering_stats: Dict with analysis statistics
-        - error: str (if error occurred)
+        - unscreened_usernames: List[str] of users in chunks that failed
+          (only when some, but not all, chunks failed)
+        - error: str (if every chunk failed)
     """
     if not llm:
         return {"error": "LLM client is not initialized.", "potential_leads": []}
@@ -438,9 +461,7 @@ def batch_analyze_chat(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
             "error": "Could not load batch analysis prompt.",
             "potential_leads": []
         }
-
-    # Format messages for the prompt
-    messages_json = json.dumps(messages, ensure_ascii=False, indent=2)
+    prompt_text = prompt_registry.render(prompt_template)
 
     system_message = SystemMessage(
         content=(
@@ -450,9 +471,140 @@ def batch_analyze_chat(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
             "Return ONLY valid JSON as specified in the prompt."
         )
     )
+
+    # Trim and whitespace-collapse texts; users are never deduplicated here
+    packed = prompt_packing.pack_items(
+        messages,
+        max_item_tokens=config.PROMPT_MAX_MESSAGE_TOKENS,
+        token_budget=sys.maxsize,
+        dedupe=False,
+    )
+    chunks = _chunk_batch_messages(
+        packed.items,
+        token_budget=config.BATCH_ANALYSIS_CHUNK_TOKENS,
+        max_users=config.BATCH_ANALYSIS_CHUNK_MAX_USERS,
+    )
+    reported_usernames: set[str] = set()
+
+    def _report_lead(lead: Dict[str, Any]) -> None:
+        username = (lead.get("username") or "").lstrip("@")
+        if on_lead is None or not username or username in reported_usernames:
+            return
+        reported_usernames.add(username)
+        on_lead(lead)
+
+    if len(chunks) == 1:
+        return await _analyze_batch_chunk(
+            system_message, prompt_text, chunks[0], _report_lead
+        )
+
+    logger.info(
+        f"Batch analysis: {len(messages)} users split into {len(chunks)} chunks."
+    )
+    semaphore = asyncio.Semaphore(max(1, config.BATCH_ANALYSIS_CONCURRENCY))
+
+    async def _run_chunk(chunk: List[Dict[str, Any]]) -> Dict[str, Any]:
+        async with semaphore:
+            return await _analyze_batch_chunk(
+                system_message, prompt_text, chunk, _report_lead
+            )
+
+    results = await asyncio.gather(*(_run_chunk(chunk) for chunk in chunks))
+    return _merge_batch_results(chunks, results)
+
+
+def _chunk_batch_messages(
+    messages: List[Dict[str, Any]],
+    token_budget: int,
+    max_users: int,
+) -> List[List[Dict[str, Any]]]:
+    """Split batch messages into chunks bounded by tokens and user count."""
+    chunks: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    current_tokens = 0
+    for message in messages:
+        tokens = prompt_packing.estimate_tokens(prompt_packing.compact_json(message))
+        if current and (
+            current_tokens + tokens > token_budget or len(current) >= max_users
+        ):
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(message)
+        current_tokens += tokens
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
+
+
+def _merge_batch_results(
+    chunks: List[List[Dict[str, Any]]],
+    results: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Merge per-chunk batch analysis results into one response."""
+    failed = [
+        (chunk, result) for chunk, result in zip(chunks, results)
+        if "error" in result
+    ]
+    if len(failed) == len(results):
+        return failed[0][1]
+
+    potential_leads: List[Dict[str, Any]] = []
+    seen_usernames: set[str] = set()
+    filtering_stats: Dict[str, Any] = {}
+    total_analyzed = 0
+    recovered = False
+    for chunk, result in zip(chunks, results):
+        if "error" in result:
+            continue
+        total_analyzed += result.get("total_messages_analyzed") or len(chunk)
+        recovered = recovered or bool(result.get("recovered_from_truncated_json"))
+        for lead in result.get("potential_leads") or []:
+            username = (lead.get("username") or "").lstrip("@")
+            if not username or username in seen_usernames:
+                continue
+            seen_usernames.add(username)
+            potential_leads.append(lead)
+        for key, value in (result.get("filtering_stats") or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                filtering_stats[key] = filtering_stats.get(key, 0) + value
+
+    merged: Dict[str, Any] = {
+        "total_messages_analyzed": total_analyzed,
+        "potential_leads": potential_leads,
+        "filtering_stats": filtering_stats,
+    }
+    if recovered:
+        merged["recovered_from_truncated_json"] = True
+    if failed:
+        merged["unscreened_usernames"] = [
+            message["username"] for chunk, _result in failed for message in chunk
+        ]
+        logger.warning(
+            f"Batch analysis: {len(failed)} of {len(results)} chunks failed; "
+            f"{len(merged['unscreened_usernames'])} users left unscreened."
+        )
+    return merged
+
+
+async def _analyze_batch_chunk(
+    system_message: SystemMessage,
+    prompt_text: str,
+    messages: List[Dict[str, Any]],
+    on_lead: Callable[[Dict[str, Any]], None] | None = None,
+) -> Dict[str, Any]:
+    """Screen one chunk of users, recovering or retrying only this chunk.
+
+    The completion is streamed; each lead is passed to on_lead as soon as
+    it is complete.
+    """
+    messages_json = prompt_packing.compact_json(messages)
     human_message = HumanMessage(
-        content=f"{prompt_template}\n\nСообщения для анализа:\n{messages_json}"
+        content=f"{prompt_text}\n\nСообщения для анализа:\n{messages_json}"
     )
+    prompt_packing.log_prompt_estimate(
+        f"Batch analysis chunk of {len(messages)} users", human_message.content
+    )
+    stream = json_stream.JsonArrayStream("potential_leads")
 
     try:
         logger.info(
@@ -460,7 +612,12 @@ def batch_analyze_chat(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
         )
 
         start_time = time.time()
-        response = llm.invoke([system_message, human_message])
+        response_text = await asyncio.wait_for(
+            json_stream.astream_json(
+                llm, [system_message, human_message], stream, on_item=on_lead
+            ),
+            timeout=config.LLM_CALL_TIMEOUT_SECONDS,
+        )
         end_time = time.time()
         duration = end_time - start_time
 
@@ -469,7 +626,7 @@ def batch_analyze_chat(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
             f"Call duration: {duration:.2f} seconds."
         )
 
-        parsed_response = _parse_llm_json(response.content)
+        parsed_response = _parse_llm_json(response_text)
         logger.info(
             f"Successfully parsed batch analysis. "
             f"Found {len(parsed_response.get('potential_leads', []))} potential leads."
@@ -479,9 +636,9 @@ def batch_analyze_chat(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
 
     except json.JSONDecodeError as e:
         logger.error(f"Failed to decode JSON from batch analysis LLM response: {e}")
-        logger.error(f"Raw response content: {response.content[:500]}")
+        logger.error(f"Raw response content: {stream.text[:500]}")
 
-        recovered = _recover_partial_batch_response(response.content, len(messages))
+        recovered = _recover_partial_batch_response(stream.text, len(messages))
         if recovered:
             logger.warning(
                 "Recovered partial batch analysis response from truncated JSON. "
@@ -489,27 +646,34 @@ def batch_analyze_chat(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
             )
             return recovered
 
+        retry_stream = json_stream.JsonArrayStream("potential_leads")
         try:
             retry_message = HumanMessage(
                 content=(
-                    f"{prompt_template}\n\nСообщения для анализа:\n{messages_json}\n\n"
+                    f"{prompt_text}\n\nСообщения для анализа:\n{messages_json}\n\n"
                     "ВАЖНО: прошлый ответ был невалидным JSON. "
                     "Верни ТОЛЬКО валидный JSON без markdown/пояснений. "
                     "Ограничь potential_leads максимум 20, ответ сделай компактным."
                 )
             )
-            retry_response = llm.invoke([system_message, retry_message])
-            parsed_retry = _parse_llm_json(retry_response.content)
+            retry_text = await asyncio.wait_for(
+                json_stream.astream_json(
+                    llm, [system_message, retry_message], retry_stream, on_item=on_lead
+                ),
+                timeout=config.LLM_CALL_TIMEOUT_SECONDS,
+            )
+            parsed_retry = _parse_llm_json(retry_text)
             logger.info(
                 "Batch analysis retry succeeded. "
                 f"Found {len(parsed_retry.get('potential_leads', []))} potential leads."
             )
             return parsed_retry
+        except llm_gateway.LLMBudgetExceededError:
+            raise
         except Exception as retry_e:
             logger.error(f"Batch analysis retry failed: {retry_e}")
             recovered_retry = _recover_partial_batch_response(
-                retry_response.content if 'retry_response' in locals() else "",
-                len(messages),
+                retry_stream.text, len(messages)
             )
             if recovered_retry:
                 logger.warning(
@@ -519,19 +683,29 @@ def batch_analyze_chat(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
                 return recovered_retry
             return {
                 "error": "JSONDecodeError",
-                "raw_response": response.content,
+                "raw_response": stream.text,
                 "potential_leads": []
             }
+    except asyncio.TimeoutError:
+        logger.error(
+            f"Batch analysis LLM call timed out after {config.LLM_CALL_TIMEOUT_SECONDS}s"
+        )
+        # Leads streamed before the timeout are kept; only the tail is lost
+        recovered = _recover_partial_batch_response(stream.text, len(messages))
+        if recovered:
+            return recovered
+        return {"error": "LLM call timed out", "potential_leads": []}
+    except llm_gateway.LLMBudgetExceededError:
+        # Not a per-chunk failure: the whole run has to stop
+        raise
     except Exception as e:
         logger.error(f"An error occurred during batch chat analysis: {e}")
         return {"error": str(e), "potential_leads": []}
 
 
-async def batch_analyze_chat_async(
-    messages: List[Dict[str, Any]]
-) -> Dict[str, Any]:
-    """Async wrapper that runs blocking batch analysis in a worker thread."""
-    return await asyncio.to_thread(batch_analyze_chat, messages)
+def batch_analyze_chat(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Blocking shim around batch_analyze_chat_async for callers without a loop."""
+    return asyncio.run(batch_analyze_chat_async(messages))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,86 @@
+"""Rate limiter: async token bucket shared by Telegram API calls."""
+import asyncio
+import logging
+import time
+import weakref
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket that lets callers reserve request slots.
+
+    Each `acquire()` takes one token (or `amount` of them). When the bucket
+    is empty the caller reserves the next free slot (the balance goes
+    negative) and sleeps until it is due, so concurrent callers are spaced
+    out without a lock. This keeps the bucket independent of the event loop
+    it was created in.
+    """
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        # During a pause _updated_at lies in the future: nothing accrues yet
+        elapsed = max(0.0, now - self._updated_at)
+        self._updated_at = max(self._updated_at, now)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Hold off every caller for `seconds` (e.g. after a FloodWaitError).
+
+        Tokens are drained and only start to accrue when the pause ends, so
+        callers resume at the configured rate instead of bursting right after
+        the pause.
+        """
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._refill(now)
+        self._tokens = min(self._tokens, 0.0)
+        self._updated_at = self._paused_until
+        logger.warning(f"rate_limiter: Paused for {seconds:.0f} seconds.")
+
+    async def acquire(self, amount: float = 1) -> None:
+        """Wait until `amount` tokens (one request by default) are available."""
+        while True:
+            pause_left = self._paused_until - time.monotonic()
+            if pause_left <= 0:
+                break
+            await asyncio.sleep(pause_left)
+
+        self._refill(time.monotonic())
+        self._tokens -= min(amount, self.capacity)
+        if self._tokens >= 0:
+            return
+        await asyncio.sleep(-self._tokens / self.rate)
+
+
+# Per-loop registry so semaphores are never shared across event loops
+# (each Celery task runs in its own asyncio.run()).
+_ACCOUNT_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def account_semaphore(account: str) -> asyncio.Semaphore:
+    """Return the semaphore limiting concurrent chat parsing per account."""
+    loop = asyncio.get_running_loop()
+    semaphores = _ACCOUNT_SEMAPHORES.setdefault(loop, {})
+    if account not in semaphores:
+        semaphores[account] = asyncio.Semaphore(
+            max(1, config.PARSE_CONCURRENCY_PER_ACCOUNT)
+        )
+    return semaphores[account]
+
+
+# Shared by every Telegram API call made through the parser
+telegram_limiter = TokenBucket(
+    rate=config.TELEGRAM_REQUESTS_PER_SECOND,
+    capacity=config.TELEGRAM_REQUESTS_BURST,
+)
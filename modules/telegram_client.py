@@ -5,6 +5,8 @@ import config
 
 logger = logging.getLogger(__name__)
 
+SESSION_NAME = 'leadcore_session'
+
 class TelegramAuthManager:
     """
     Manages the state of the Telegram client and its authentication flow.
@@ -18,7 +20,7 @@ class TelegramAuthManager:
     def get_instance(cls):
         if cls._client is None:
             cls._client = TelegramClient(
-                'leadcore_session',
+                SESSION_NAME,
                 config.TELEGRAM_API_ID,
                 config.TELEGRAM_API_HASH,
                 # The connection is managed manually now
@@ -35,7 +37,7 @@ class TelegramAuthManager:
             # so the old client would raise "event loop must not change".
             # Session is file-based — authorization is preserved across instances.
             cls._client = TelegramClient(
-                'leadcore_session',
+                SESSION_NAME,
                 config.TELEGRAM_API_ID,
                 config.TELEGRAM_API_HASH,
                 auto_reconnect=True,
@@ -44,6 +46,11 @@ class TelegramAuthManager:
             await cls._client.connect()
         return cls._client
 
+    @classmethod
+    def account_key(cls) -> str:
+        """Stable identifier of the Telegram account behind the session."""
+        return config.TELEGRAM_PHONE or SESSION_NAME
+
     @classmethod
     async def is_authorized(cls) -> bool:
         client = await cls.get_client()
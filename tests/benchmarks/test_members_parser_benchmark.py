@@ -0,0 +1,57 @@
+"""pytest-benchmark suite for members_parser.parse_users_from_messages.
+
+Runs only when pytest-benchmark is installed (requirements-dev.txt):
+
+    PYTHONPATH=. pytest tests/benchmarks --benchmark-columns=min,median,ops
+
+Each benchmark records messages_per_second and the tracemalloc figures of
+one extra traced round in extra_info (see `--benchmark-json`).
+"""
+
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from loadtest.bench_parser import SAMPLE_FIXTURE, ParserBench  # noqa: E402
+from loadtest.fake_telegram import ChatFixture, synthesize_fixture  # noqa: E402
+
+pytestmark = pytest.mark.benchmark(group="members_parser", warmup=False)
+
+
+def _run(benchmark, fixture: ChatFixture, **bench_options) -> tuple[list[dict], list[dict]]:  # noqa: ANN001, ANN003
+    with ParserBench(fixture, **bench_options) as bench:
+        served_before = bench.client.messages_served
+        result = benchmark.pedantic(bench.run_round, rounds=5, iterations=1)
+        messages = (bench.client.messages_served - served_before) // 5
+        benchmark.extra_info["messages"] = messages
+        benchmark.extra_info["messages_per_second"] = round(
+            messages / benchmark.stats.stats.median
+        )
+        benchmark.extra_info.update(bench.traced_round())
+    return result
+
+
+@pytest.mark.parametrize("messages", [1_000, 10_000, 50_000])
+def test_parse_synthetic_chat(benchmark, messages: int) -> None:  # noqa: ANN001
+    fixture = synthesize_fixture(messages=messages, users=max(50, messages // 20), seed=1)
+
+    candidates, all_messages = _run(benchmark, fixture)
+
+    assert candidates
+    assert all_messages == []
+
+
+def test_parse_synthetic_chat_collecting_all_messages(benchmark) -> None:  # noqa: ANN001
+    fixture = synthesize_fixture(messages=10_000, users=500, seed=1)
+
+    _, all_messages = _run(benchmark, fixture, collect_all_messages=True)
+
+    assert 0 < len(all_messages) <= 10_000
+
+
+def test_parse_sample_fixture(benchmark) -> None:  # noqa: ANN001
+    candidates, _ = _run(benchmark, ChatFixture.load(SAMPLE_FIXTURE))
+
+    assert candidates
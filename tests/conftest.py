@@ -7,6 +7,7 @@ import datetime
 import pytest
 
 from bot.models.user import User
+from loadtest.fakes import InMemoryRedis
 
 
 @pytest.fixture
@@ -34,3 +35,9 @@ def user_factory():
         )
 
     return _build
+
+
+@pytest.fixture
+def memory_redis():
+    """In-memory Redis for tests; patch it in as the module's client."""
+    return InMemoryRedis()
@@ -0,0 +1,192 @@
+"""Unit tests for bot.job_runner."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from bot import job_runner as jr
+
+
+class _FakeStreams:
+    """The stream and consumer group commands used by the runner."""
+
+    def __init__(self) -> None:
+        self.entries: dict[str, dict] = {}
+        self.last_delivered = 0
+        # job id -> [consumer, delivery time, times delivered]
+        self.pending: dict[str, list] = {}
+        self._seq = 0
+
+    def add(self, program_id: int, chat_id: int) -> str:
+        self._seq += 1
+        job_id = f"{self._seq}-0"
+        self.entries[job_id] = {"program_id": str(program_id), "chat_id": str(chat_id)}
+        return job_id
+
+    async def xgroup_create(self, name, groupname, id="$", mkstream=False):  # noqa: ANN001, A002
+        return True
+
+    async def xreadgroup(self, groupname, consumername, streams, count=None, block=None):  # noqa: ANN001
+        new = [job_id for job_id in self.entries if int(job_id.split("-")[0]) > self.last_delivered]
+        new = new[:count]
+        if not new:
+            await asyncio.sleep(block / 1000)
+            return []
+        for job_id in new:
+            self.last_delivered = int(job_id.split("-")[0])
+            self.pending[job_id] = [consumername, time.monotonic(), 1]
+        return [["stream", [(job_id, dict(self.entries[job_id])) for job_id in new]]]
+
+    async def xautoclaim(self, name, groupname, consumername, min_idle_time, start_id="0-0", count=None):  # noqa: ANN001
+        now = time.monotonic()
+        claimed = []
+        for job_id, state in self.pending.items():
+            if len(claimed) == count:
+                break
+            if (now - state[1]) * 1000 >= min_idle_time:
+                state[:] = [consumername, now, state[2] + 1]
+                claimed.append((job_id, dict(self.entries[job_id])))
+        return ["0-0", claimed, []]
+
+    async def xpending_range(self, name, groupname, min, max, count):  # noqa: ANN001, A002
+        state = self.pending.get(min)
+        return [{"message_id": min, "times_delivered": state[2]}] if state else []
+
+    async def xclaim(self, name, groupname, consumername, min_idle_time, message_ids, justid=False):  # noqa: ANN001
+        for job_id in message_ids:
+            self.pending[job_id][:2] = [consumername, time.monotonic()]
+        return list(message_ids)
+
+    async def xack(self, name, groupname, *ids):  # noqa: ANN001
+        for job_id in ids:
+            self.pending.pop(job_id, None)
+
+    async def xdel(self, name, *ids):  # noqa: ANN001
+        for job_id in ids:
+            self.entries.pop(job_id, None)
+
+
+def _runner(streams: _FakeStreams, handler, **kwargs) -> jr.JobRunner:  # noqa: ANN001
+    options = {"concurrency": 3, "consumer": "test", "visibility_timeout": 10,
+               "max_attempts": 2, "shutdown_timeout": 5, "block_ms": 10}
+    options.update(kwargs)
+    return jr.JobRunner(streams, handler, **options)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_jobs_run_concurrently_up_to_the_limit_and_are_acked() -> None:
+    streams = _FakeStreams()
+    for program_id in range(1, 6):
+        streams.add(program_id, 10)
+    running: set[int] = set()
+    peak = 0
+    done: list[int] = []
+
+    async def _handler(program_id: int, chat_id: int) -> None:
+        nonlocal peak
+        running.add(program_id)
+        peak = max(peak, len(running))
+        await asyncio.sleep(0.05)
+        running.discard(program_id)
+        done.append(program_id)
+        if len(done) == 5:
+            runner.stop()
+
+    runner = _runner(streams, _handler)
+    await asyncio.wait_for(runner.run(), timeout=5)
+
+    assert sorted(done) == [1, 2, 3, 4, 5]
+    assert peak == 3
+    assert streams.entries == {} and streams.pending == {}
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_after_visibility_timeout_then_dropped() -> None:
+    streams = _FakeStreams()
+    streams.add(1, 10)
+    attempts: list[float] = []
+
+    async def _handler(program_id: int, chat_id: int) -> None:
+        attempts.append(time.monotonic())
+        raise RuntimeError("boom")
+
+    runner = _runner(streams, _handler, visibility_timeout=0.05)
+    run = asyncio.create_task(runner.run())
+    while streams.entries:
+        await asyncio.sleep(0.01)
+    runner.stop()
+    await asyncio.wait_for(run, timeout=5)
+
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.05
+    assert streams.pending == {}
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_heartbeat_keeps_long_jobs_from_being_reclaimed() -> None:
+    streams = _FakeStreams()
+    streams.add(1, 10)
+    calls = 0
+
+    async def _handler(program_id: int, chat_id: int) -> None:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.2)
+        runner.stop()
+
+    runner = _runner(streams, _handler, visibility_timeout=0.06)
+    other = _runner(streams, _handler, consumer="other", visibility_timeout=0.06)
+    other_run = asyncio.create_task(other.run())
+    await asyncio.wait_for(runner.run(), timeout=5)
+    other.stop()
+    await other_run
+
+    assert calls == 1
+    assert streams.entries == {}
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_shutdown_waits_for_running_jobs_then_leaves_the_rest_pending() -> None:
+    streams = _FakeStreams()
+    quick = streams.add(1, 10)
+    slow = streams.add(2, 10)
+    started = asyncio.Event()
+    finished: list[int] = []
+
+    async def _handler(program_id: int, chat_id: int) -> None:
+        started.set()
+        await asyncio.sleep(0.05 if program_id == 1 else 10)
+        finished.append(program_id)
+
+    runner = _runner(streams, _handler, shutdown_timeout=0.2)
+    run = asyncio.create_task(runner.run())
+    await started.wait()
+    await asyncio.sleep(0)
+    runner.stop()
+    await asyncio.wait_for(run, timeout=5)
+
+    assert finished == [1]
+    assert quick not in streams.entries
+    assert slow in streams.entries and slow in streams.pending
+    assert runner.running_jobs == 0
+
+
+@pytest.mark.unit
+def test_enqueue_program_job_uses_the_stream_when_enabled(monkeypatch) -> None:
+    from bot import tasks
+
+    queued: list[tuple[int, int]] = []
+    monkeypatch.setattr(tasks.config, "JOB_RUNNER_ENABLED", True)
+    monkeypatch.setattr(
+        tasks.job_runner, "enqueue", lambda program_id, chat_id: queued.append((program_id, chat_id)) or "1-0"
+    )
+
+    assert tasks.enqueue_program_job(7, 10) == "1-0"
+    assert queued == [(7, 10)]
@@ -0,0 +1,81 @@
+"""Unit tests for bot.worker_loop."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from bot import worker_loop as wl
+
+
+@pytest.fixture
+def loop_runner(monkeypatch):
+    closed: list[str] = []
+
+    async def _aclose() -> None:
+        closed.append("llm")
+
+    async def _disconnect() -> None:
+        closed.append("telegram")
+
+    async def _dispose() -> None:
+        closed.append("db")
+
+    monkeypatch.setattr(wl.llm_gateway, "aclose", _aclose)
+    monkeypatch.setattr(wl.TelegramAuthManager, "disconnect", staticmethod(_disconnect))
+    monkeypatch.setattr(wl, "dispose_engine", _dispose)
+    runner = wl.WorkerLoop()
+    runner.closed = closed
+    yield runner
+    runner.shutdown()
+
+
+@pytest.mark.unit
+def test_tasks_share_one_loop_until_shutdown(loop_runner) -> None:
+    async def _current_loop():
+        return asyncio.get_running_loop()
+
+    first = loop_runner.run(_current_loop())
+    second = loop_runner.run(_current_loop())
+
+    assert first is second
+    assert loop_runner.running
+    assert not first.is_closed()
+
+    loop_runner.shutdown()
+    loop_runner.shutdown()
+
+    assert not loop_runner.running
+    assert first.is_closed()
+    assert loop_runner.closed == ["llm", "telegram", "db"]
+    # A new task starts a fresh loop
+    assert loop_runner.run(_current_loop()) is not first
+
+
+@pytest.mark.unit
+def test_errors_propagate_to_the_task(loop_runner) -> None:
+    async def _fail() -> None:
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        loop_runner.run(_fail())
+    assert loop_runner.running
+
+
+@pytest.mark.unit
+def test_program_jobs_reuse_the_worker_bot(loop_runner, monkeypatch) -> None:
+    bots: list[object] = []
+
+    async def _run_program_job(program_id: int, chat_id: int, bot=None) -> None:  # noqa: ANN001
+        bots.append(bot)
+
+    monkeypatch.setattr(wl, "worker_loop", loop_runner)
+    monkeypatch.setattr(wl.program_runner, "run_program_job", _run_program_job)
+    monkeypatch.setattr(wl.config, "TELEGRAM_BOT_TOKEN", "123456:TEST")
+
+    wl.run_program_job(1, 10)
+    wl.run_program_job(2, 10)
+
+    assert bots[0] is not None
+    assert bots[0] is bots[1]
@@ -104,12 +104,17 @@ async def test_enter_chats_rejects_invalid_input() -> None:
 
 @pytest.mark.unit
 @pytest.mark.asyncio
-async def test_enter_chats_accepts_valid_and_moves_to_confirm() -> None:
+async def test_enter_chats_accepts_valid_and_moves_to_confirm(monkeypatch) -> None:
     message = FakeMessage(FakeUser(id=4), text="@chat_one\nt.me/chat_two")
     state = FakeState()
     await state.update_data(name="Prog")
     await state.set_state(ProgramCreate.enter_chats)
 
+    async def _all_resolvable(chats):  # noqa: ANN001
+        return []
+
+    monkeypatch.setattr(program_create, "find_unresolvable_chats", _all_resolvable)
+
     await program_create.enter_chats(message, state)
 
     assert state.state == ProgramCreate.confirm_settings
@@ -117,6 +122,26 @@ async def test_enter_chats_accepts_valid_and_moves_to_confirm() -> None:
     assert "Шаг 4 из 4" in message.answers[0][0]
 
 
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_enter_chats_drops_unresolvable_chats(monkeypatch) -> None:
+    message = FakeMessage(FakeUser(id=4), text="@chat_one\n@chat_missing")
+    state = FakeState()
+    await state.update_data(name="Prog")
+    await state.set_state(ProgramCreate.enter_chats)
+
+    async def _unresolvable(chats):  # noqa: ANN001
+        return ["chat_missing"]
+
+    monkeypatch.setattr(program_create, "find_unresolvable_chats", _unresolvable)
+
+    await program_create.enter_chats(message, state)
+
+    assert "Не удалось найти чаты: @chat_missing" in message.answers[0][0]
+    assert state.state == ProgramCreate.confirm_settings
+    assert state.data["chats"] == ["chat_one"]
+
+
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_cancel_creation_clears_state() -> None:
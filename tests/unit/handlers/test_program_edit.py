@@ -161,6 +161,30 @@ async def test_edit_chats_not_found_and_done() -> None:
     assert "Что ещё изменить?" in callback_done.message.edits[0][0]
 
 
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_edit_chats_process_skips_existing_and_unresolvable(monkeypatch) -> None:
+    message = FakeMessage(FakeUser(id=1), text="@chat1\n@new_chat\nt.me/bad_chat")
+    state = FakeState()
+    await state.update_data(program_id=10)
+    session = _Session()
+    session.queue.append(_Result(rows=[_program()]))
+    checked: list[list[str]] = []
+
+    async def _unresolvable(chats):  # noqa: ANN001
+        checked.append(list(chats))
+        return ["bad_chat"]
+
+    monkeypatch.setattr(program_edit, "find_unresolvable_chats", _unresolvable)
+
+    await program_edit.edit_chats_process(message, state, session)
+
+    assert checked == [["new_chat", "bad_chat"]]
+    assert "Не удалось найти чаты: @bad_chat" in message.answers[0][0]
+    assert "Добавлено чатов: @new_chat" in message.answers[1][0]
+    assert session.commits == 1
+
+
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_edit_settings_show_and_toggles(monkeypatch) -> None:
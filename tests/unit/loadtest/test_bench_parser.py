@@ -0,0 +1,25 @@
+"""Unit tests for loadtest.bench_parser."""
+
+from __future__ import annotations
+
+import pytest
+
+from loadtest import bench_parser
+from loadtest.fake_telegram import synthesize_fixture
+
+
+@pytest.mark.unit
+def test_measure_reports_throughput_and_memory() -> None:
+    fixture = synthesize_fixture(messages=300, users=30, seed=2)
+    original_get_delay = bench_parser.config.get_delay
+
+    with bench_parser.ParserBench(fixture) as bench:
+        report = bench.measure(rounds=2)
+
+    assert report["messages"] == 300
+    assert report["messages_per_second"] > 0
+    assert report["memory"]["messages"] == 300
+    assert report["memory"]["candidates"] > 0
+    assert report["memory"]["peak_bytes"] >= report["memory"]["retained_bytes"] > 0
+    assert bench_parser.config.get_delay is original_get_delay
+    assert "messages/s" in bench_parser.format_report(report)
@@ -0,0 +1,86 @@
+"""Unit tests for loadtest.fake_llm (served locally, talked to via the gateway)."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from loadtest import fake_llm
+from loadtest.fakes import InMemoryRedis
+from modules import json_stream, llm_gateway
+
+
+@pytest.fixture
+async def serve(monkeypatch):
+    servers: list[fake_llm.FakeLLMServer] = []
+    monkeypatch.setattr(llm_gateway, "_redis_client", lambda redis=InMemoryRedis(): redis)
+    monkeypatch.setattr(llm_gateway.config, "LLM_RETRY_BASE_DELAY_SECONDS", 0)
+
+    async def _serve(**settings) -> fake_llm.FakeLLMServer:
+        server = fake_llm.FakeLLMServer(
+            fake_llm.FakeLLMSettings(latency="fixed", latency_ms=0, seed=1, **settings)
+        )
+        base_url = await server.start(access_log=False)
+        monkeypatch.setattr(llm_gateway.config, "COMET_API_KEY", "fake")
+        monkeypatch.setattr(llm_gateway.config, "COMET_API_BASE_URL", base_url)
+        servers.append(server)
+        return server
+
+    yield _serve
+    await llm_gateway.aclose()
+    for server in servers:
+        await server.stop()
+
+
+def _llm() -> llm_gateway.GatewayLLM:
+    return llm_gateway.GatewayLLM("test", model="fake", temperature=0, request_timeout=5)
+
+
+@pytest.mark.unit
+def test_classify_prompt_uses_prompt_file_phrases() -> None:
+    with open("prompts/chat_batch_analysis.txt", encoding="utf-8") as f:
+        assert fake_llm.classify_prompt(f.read()) == "batch_analysis"
+    with open("prompts/qualification_v2.txt", encoding="utf-8") as f:
+        assert fake_llm.classify_prompt(f.read()) == "qualification"
+    assert fake_llm.classify_prompt("hello") == "generic"
+
+
+@pytest.mark.unit
+async def test_completion_returns_canned_response(serve) -> None:
+    server = await serve(responses={"generic": '{"ok":true}'})
+
+    response = await _llm().ainvoke([HumanMessage(content="hello")])
+
+    assert json.loads(response.content) == {"ok": True}
+    assert server.calls == {"generic": 1}
+
+
+@pytest.mark.unit
+async def test_stream_feeds_batch_leads_from_prompt(serve) -> None:
+    await serve()
+    with open("prompts/chat_batch_analysis.txt", encoding="utf-8") as f:
+        prompt = f.read() + '\n[{"username":"@a","text":"x"},{"username":"@b","text":"y"}]'
+    stream = json_stream.JsonArrayStream("potential_leads")
+
+    text = await json_stream.astream_json(_llm(), [HumanMessage(content=prompt)], stream)
+
+    payload = json.loads(text)
+    assert payload["total_messages_analyzed"] == 2
+    assert stream.items == payload["potential_leads"]
+
+
+@pytest.mark.unit
+async def test_injected_rate_limit_and_truncation(serve) -> None:
+    server = await serve(rate_limit_rate=1.0, retry_after_seconds=0)
+    with pytest.raises(Exception) as error:
+        await _llm().ainvoke([HumanMessage(content="hello")])
+    assert getattr(error.value, "status_code", None) == 429
+    # Initial call plus LLM_MAX_RETRIES retries
+    assert server.injected["rate_limit"] == 1 + llm_gateway.config.LLM_MAX_RETRIES
+
+    server = await serve(truncate_rate=1.0, responses={"generic": '{"items":[1,2,3]}'})
+    response = await _llm().ainvoke([HumanMessage(content="hello")])
+    assert response.content == '{"items"'
+    assert server.injected["truncated"] == 1
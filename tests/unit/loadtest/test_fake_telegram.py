@@ -0,0 +1,158 @@
+"""Unit tests for loadtest.fake_telegram."""
+
+from __future__ import annotations
+
+import pytest
+
+from loadtest import fake_telegram as ft
+from modules import members_parser as mp
+from modules.telegram_client import TelegramAuthManager
+
+_CHAT_ID = 1_500_000_001
+
+
+def _fixture(flood_waits: list[dict] | None = None) -> ft.ChatFixture:
+    users = [
+        [1, 11, "alice", "Alice", None, "", "Пишу в @alice_channel"],
+        [2, 22, "bob", "Bob", "B", "h", None],
+        [3, 33, "helper_bot", "Bot", None, "b", None],
+        [4, 44, None, "Deleted", None, "d", None],
+        [5, 55, None, "Anon", None, "", None],
+    ]
+    messages = [
+        [10, 60, 1, "Заявки теряются"],
+        [9, 120, 2, "Ищу бота для записи"],
+        [8, 180, 3, "Реклама"],
+        [7, 240, 4, "Привет"],
+        [6, 300, 5, "+1"],
+        [5, 360, -(_CHAT_ID + 1), "Пост канала"],
+        [4, 420, 1, None],
+        [3, 86400 * 60, 1, "Старое сообщение"],
+    ]
+    chat = {"id": _CHAT_ID, "username": "shop_chat", "title": "Shop"}
+    return ft.ChatFixture(chat, users, messages, flood_waits)
+
+
+@pytest.fixture(autouse=True)
+def _fast_parser(monkeypatch):
+    async def _no_wait(amount=1):  # noqa: ANN001
+        return None
+
+    monkeypatch.setattr(mp, "_SENDER_CACHE", mp.OrderedDict())
+    monkeypatch.setattr(mp.profile_fetcher, "_BIO_CACHE", {})
+    monkeypatch.setattr(mp.telegram_limiter, "acquire", _no_wait)
+    monkeypatch.setattr(mp.config, "get_delay", lambda _delay_type: (0, 0))
+    monkeypatch.setattr(mp.config, "FLOODWAIT_EXTRA_SECONDS", 0)
+    monkeypatch.setattr(mp.config, "MESSAGE_MAX_AGE_DAYS", 10)
+
+
+async def _parse(client: ft.FakeTelegramClient) -> tuple[list[dict], list[dict]]:
+    with ft.installed(client):
+        return await mp.parse_users_from_messages(
+            "@shop_chat",
+            messages_limit=100,
+            use_batch_analysis=False,
+            collect_all_messages=True,
+        )
+
+
+@pytest.mark.unit
+async def test_parser_replays_fixture_through_fake_client() -> None:
+    client = ft.FakeTelegramClient([_fixture()])
+
+    candidates, all_messages = await _parse(client)
+
+    by_username = {c["username"]: c for c in candidates}
+    assert set(by_username) == {"alice", "bob"}
+    assert by_username["alice"]["channel_username"] == "@alice_channel"
+    assert by_username["alice"]["source_chat_id"] == _CHAT_ID
+    assert [m["message_id"] for m in all_messages] == [10, 9, 8, 7, 6, 5]
+    # bob is not bundled with the history response
+    assert client.requests["get_users"] == 1
+    assert client.requests["get_full_user"] == 2
+    assert client.messages_served == 8
+
+
+@pytest.mark.unit
+async def test_scripted_flood_wait_interrupts_history() -> None:
+    fixture = _fixture([{"request": "iter_messages", "at": 2, "seconds": 0}])
+    client = ft.FakeTelegramClient([fixture])
+
+    candidates, all_messages = await _parse(client)
+
+    assert client.flood_waits_raised == [("iter_messages", 2)]
+    assert [m["message_id"] for m in all_messages] == [10, 9]
+    assert {c["username"] for c in candidates} == {"alice", "bob"}
+
+
+@pytest.mark.unit
+async def test_scripted_flood_wait_on_full_user_is_retried() -> None:
+    fixture = _fixture([{"request": "get_full_user", "at": 0, "seconds": 1}])
+    client = ft.FakeTelegramClient([fixture])
+
+    candidates, _ = await _parse(client)
+
+    assert client.flood_waits_raised == [("get_full_user", 0)]
+    assert client.requests["get_full_user"] == 3
+    assert {c["username"] for c in candidates} == {"alice", "bob"}
+
+
+@pytest.mark.unit
+async def test_get_entity_accepts_usual_chat_identifiers() -> None:
+    client = ft.FakeTelegramClient([_fixture()])
+
+    for identifier in ("@Shop_Chat", "https://t.me/shop_chat", _CHAT_ID, f"-100{_CHAT_ID}"):
+        entity = await client.get_entity(identifier)
+        assert entity.id == _CHAT_ID
+    with pytest.raises(ValueError):
+        await client.get_entity("@missing")
+
+
+@pytest.mark.unit
+async def test_installed_restores_auth_manager() -> None:
+    original = vars(TelegramAuthManager)["get_client"]
+    client = ft.FakeTelegramClient([], authorized=False)
+
+    with ft.installed(client):
+        assert await TelegramAuthManager.get_client() is client
+        assert await TelegramAuthManager.is_authorized() is False
+
+    assert vars(TelegramAuthManager)["get_client"] is original
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("name", ["chat.json", "chat.json.gz"])
+def test_fixture_save_load_round_trip(tmp_path, name: str) -> None:
+    fixture = ft.synthesize_fixture(messages=50, users=10, seed=5)
+    fixture.flood_waits = [{"request": "get_users", "at": 1, "seconds": 2}]
+
+    fixture.save(tmp_path / name)
+
+    assert ft.ChatFixture.load(tmp_path / name).to_dict() == fixture.to_dict()
+
+
+@pytest.mark.unit
+def test_synthesize_fixture_is_deterministic() -> None:
+    first = ft.synthesize_fixture(messages=200, users=20, seed=9)
+    second = ft.synthesize_fixture(messages=200, users=20, seed=9)
+
+    assert first.to_dict() == second.to_dict()
+    assert [row[0] for row in first.messages] == list(range(200, 0, -1))
+
+
+@pytest.mark.unit
+def test_unknown_flood_wait_request_is_rejected() -> None:
+    data = _fixture([{"request": "send_message", "at": 0}]).to_dict()
+
+    with pytest.raises(ValueError):
+        ft.ChatFixture.from_dict(data)
+
+
+@pytest.mark.unit
+def test_sample_fixture_loads() -> None:
+    from loadtest.bench_parser import SAMPLE_FIXTURE
+
+    fixture = ft.ChatFixture.load(SAMPLE_FIXTURE)
+
+    assert fixture.chat_identifier == "@sample_chat"
+    assert len(fixture.messages) == 600
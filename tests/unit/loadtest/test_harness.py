@@ -0,0 +1,35 @@
+"""Unit tests for loadtest.harness."""
+
+from __future__ import annotations
+
+import pytest
+
+from loadtest import fake_llm, harness
+from loadtest.fakes import SyntheticChatSource
+
+
+@pytest.mark.unit
+def test_percentile_nearest_rank() -> None:
+    values = [float(v) for v in range(1, 101)]
+    assert harness.percentile(values, 50) == 50
+    assert harness.percentile(values, 95) == 95
+    assert harness.percentile([], 95) == 0
+
+
+@pytest.mark.unit
+async def test_run_load_test_reports_stages_and_llm_calls() -> None:
+    settings = fake_llm.FakeLLMSettings(latency="fixed", latency_ms=0, seed=3)
+    source = SyntheticChatSource(
+        users_per_chat=10, history_page_ms=0, profile_ms=0, seed=3
+    )
+
+    report = await harness.run_load_test(
+        settings, source, chats=2, workers=4, db_latency_ms=0
+    )
+
+    assert report["candidates"] > 0
+    assert report["llm"]["calls"]["batch_analysis"] == 2
+    assert report["llm"]["calls"]["qualification"] == report["candidates"]
+    assert report["stages"]["qualification"]["count"] == report["candidates"]
+    assert report["stages"]["candidate_to_lead"]["count"] == report["leads"]
+    assert "LLM calls per lead" in harness.format_report(report)
@@ -0,0 +1,123 @@
+"""Unit tests for modules.entity_cache."""
+
+from __future__ import annotations
+
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from modules import entity_cache as ec
+
+
+@pytest.mark.unit
+def test_is_fresh_respects_ttl() -> None:
+    now = ec._utc_now()
+    assert ec._is_fresh(now - datetime.timedelta(hours=1), ttl_hours=2) is True
+    assert ec._is_fresh(now - datetime.timedelta(hours=3), ttl_hours=2) is False
+    assert ec._is_fresh(None, ttl_hours=2) is False
+
+
+@pytest.mark.unit
+def test_peer_from_row_builds_input_peers() -> None:
+    channel = ec._peer_from_row(
+        SimpleNamespace(entity_type="channel", chat_id=123, access_hash=456)
+    )
+    assert isinstance(channel, ec.types.InputPeerChannel)
+    assert channel.access_hash == 456
+
+    chat = ec._peer_from_row(
+        SimpleNamespace(entity_type="chat", chat_id=77, access_hash=None)
+    )
+    assert isinstance(chat, ec.types.InputPeerChat)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_resolve_chat_reads_through_cache_per_account(monkeypatch) -> None:
+    stored: list[tuple[str, str]] = []
+    cached = ec.CachedChat("peer", 123, "cached_chat")
+    account = ["+100"]
+
+    async def _get_chat(chat_key, account_key):  # noqa: ANN001
+        if (chat_key, account_key) == ("cached_chat", "+100"):
+            return cached
+        return None
+
+    async def _store_chat(chat_key, account_key, entity):  # noqa: ANN001
+        stored.append((chat_key, account_key))
+
+    class _Client:
+        def __init__(self) -> None:
+            self.calls: list[str] = []
+
+        async def get_entity(self, identifier):  # noqa: ANN001
+            self.calls.append(identifier)
+            return SimpleNamespace(id=999, username="fresh_chat")
+
+    async def _no_wait() -> None:
+        return None
+
+    monkeypatch.setattr(ec, "get_chat", _get_chat)
+    monkeypatch.setattr(ec, "store_chat", _store_chat)
+    monkeypatch.setattr(ec.telegram_limiter, "acquire", _no_wait)
+    monkeypatch.setattr(ec.TelegramAuthManager, "account_key", classmethod(lambda cls: account[0]))
+    client = _Client()
+
+    assert await ec.resolve_chat(client, "@Cached_Chat") is cached
+    resolved = await ec.resolve_chat(client, "t.me/fresh_chat")
+    # Another account cannot use the first account's access hash
+    account[0] = "+200"
+    await ec.resolve_chat(client, "@Cached_Chat")
+
+    assert client.calls == ["t.me/fresh_chat", "@Cached_Chat"]
+    assert stored == [("fresh_chat", "+100"), ("cached_chat", "+200")]
+    assert resolved.id == 999
+    assert resolved.is_public is True
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_find_unresolvable_chats_is_best_effort(monkeypatch) -> None:
+    cached = {("cached_chat", "acc")}
+
+    async def _get_chat(chat_key, account_key):  # noqa: ANN001
+        return ec.CachedChat("peer", 1, chat_key) if (chat_key, account_key) in cached else None
+
+    async def _not_authorized() -> bool:
+        return False
+
+    monkeypatch.setattr(ec, "get_chat", _get_chat)
+    monkeypatch.setattr(ec.TelegramAuthManager, "account_key", classmethod(lambda cls: "acc"))
+    monkeypatch.setattr(ec.TelegramAuthManager, "is_authorized", staticmethod(_not_authorized))
+
+    assert await ec.find_unresolvable_chats(["chat_a"]) == []
+
+    async def _authorized() -> bool:
+        return True
+
+    clients: list[str] = []
+
+    async def _get_client():
+        clients.append("client")
+        return "client"
+
+    resolved: list[str] = []
+
+    async def _resolve(client, chat):  # noqa: ANN001
+        resolved.append(chat)
+        if chat == "missing":
+            raise ec.UsernameNotOccupiedError(request=None)
+        return ec.CachedChat("peer", 1, chat)
+
+    monkeypatch.setattr(ec.TelegramAuthManager, "is_authorized", staticmethod(_authorized))
+    monkeypatch.setattr(ec.TelegramAuthManager, "get_client", staticmethod(_get_client))
+    monkeypatch.setattr(ec, "resolve_chat", _resolve)
+
+    # Cached chats need no client at all
+    assert await ec.find_unresolvable_chats(["@cached_chat"]) == []
+    assert clients == []
+
+    assert await ec.find_unresolvable_chats(["@cached_chat", "ok_chat", "missing"]) == ["missing"]
+    assert resolved == ["ok_chat", "missing"]
+    assert clients == ["client"]
@@ -0,0 +1,73 @@
+"""Unit tests for modules.json_stream."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from modules import json_stream as js
+
+
+@pytest.mark.unit
+def test_feed_emits_items_as_they_complete_across_chunks() -> None:
+    stream = js.JsonArrayStream("pains")
+    text = '{"total": 2, "pains": [{"quote": "a"}, {"quote": "b", "tags": {"x": 1}}], "extra": [{"no": 1}]}'
+
+    emitted = []
+    for start in range(0, len(text), 7):
+        emitted.append(stream.feed(text[start:start + 7]))
+
+    assert [item for batch in emitted for item in batch] == [
+        {"quote": "a"},
+        {"quote": "b", "tags": {"x": 1}},
+    ]
+    # Items are emitted at the chunk that closes them, not at the end
+    assert emitted[-1] == []
+    assert stream.text == text
+
+
+@pytest.mark.unit
+def test_feed_ignores_braces_and_quotes_inside_strings() -> None:
+    stream = js.JsonArrayStream("potential_leads")
+    stream.feed('{"potential_leads":[{"username":"@u1","reason":"needs {bot] \\"now\\""},')
+    stream.feed('{"username":"@u2"}]}')
+
+    assert stream.items == [
+        {"username": "@u1", "reason": 'needs {bot] "now"'},
+        {"username": "@u2"},
+    ]
+
+
+@pytest.mark.unit
+def test_extract_array_items_keeps_complete_items_of_truncated_text() -> None:
+    truncated = '{"assignments":[{"pain_id":1,"cluster_id":10},{"pain_id":2,"clu'
+
+    assert js.extract_array_items(truncated, "assignments") == [
+        {"pain_id": 1, "cluster_id": 10}
+    ]
+    assert js.extract_array_items("not json", "assignments") == []
+    assert js.extract_array_items("", "assignments") == []
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_astream_json_reports_items_before_the_stream_ends() -> None:
+    seen_when_reported: list[int] = []
+    chunks_sent = 0
+
+    class _LLM:
+        async def astream(self, _messages):  # noqa: ANN001
+            nonlocal chunks_sent
+            for part in ('{"potential_leads":[{"username":"@a"}', ',{"username":"@b"}', "]}"):
+                chunks_sent += 1
+                yield SimpleNamespace(content=part)
+
+    stream = js.JsonArrayStream("potential_leads")
+    text = await js.astream_json(
+        _LLM(), [], stream, on_item=lambda _item: seen_when_reported.append(chunks_sent)
+    )
+
+    assert text == '{"potential_leads":[{"username":"@a"},{"username":"@b"}]}'
+    assert seen_when_reported == [1, 2]
+    assert [item["username"] for item in stream.items] == ["@a", "@b"]
@@ -0,0 +1,59 @@
+"""Unit tests for modules.llm_cache."""
+
+from __future__ import annotations
+
+import pytest
+
+from modules import llm_cache
+
+
+class _BrokenRedis:
+    async def get(self, key):  # noqa: ANN001
+        raise ConnectionError("down")
+
+    async def set(self, key, value, ex=None):  # noqa: ANN001
+        raise ConnectionError("down")
+
+    async def hincrby(self, key, field, amount):  # noqa: ANN001
+        raise ConnectionError("down")
+
+    async def hgetall(self, key):  # noqa: ANN001
+        raise ConnectionError("down")
+
+
+@pytest.mark.unit
+def test_make_key_is_stable_and_order_independent_for_dicts() -> None:
+    assert llm_cache.make_key("v1", {"a": 1, "b": 2}) == llm_cache.make_key(
+        "v1", {"b": 2, "a": 1}
+    )
+    assert llm_cache.make_key("v1", "x") != llm_cache.make_key("v2", "x")
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_cache_round_trip_with_ttl_and_counters(monkeypatch, memory_redis) -> None:
+    monkeypatch.setattr(llm_cache, "_redis_client", lambda: memory_redis)
+    monkeypatch.setattr(llm_cache.config, "LLM_CACHE_ENABLED", True)
+    cache = llm_cache.LLMResponseCache("test", ttl_seconds=3600)
+
+    assert await cache.get("k") is None
+    await cache.set("k", "response")
+    assert await cache.get("k") == "response"
+
+    assert 3_590_000 < await memory_redis.pttl("llmcache:test:k") <= 3_600_000
+    assert await cache.stats() == {"hits": 1, "misses": 1}
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_cache_errors_and_disabled_cache_are_misses(monkeypatch) -> None:
+    monkeypatch.setattr(llm_cache, "_redis_client", lambda: _BrokenRedis())
+    monkeypatch.setattr(llm_cache.config, "LLM_CACHE_ENABLED", True)
+    cache = llm_cache.LLMResponseCache("test", ttl_seconds=60)
+
+    await cache.set("k", "v")
+    assert await cache.get("k") is None
+    assert await cache.stats() == {"hits": 0, "misses": 1}
+
+    monkeypatch.setattr(llm_cache.config, "LLM_CACHE_ENABLED", False)
+    assert await cache.get("k") is None
@@ -0,0 +1,226 @@
+"""Unit tests for modules.llm_gateway."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from modules import llm_gateway as gw
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int, retry_after: str | None = None) -> None:
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": retry_after} if retry_after else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch, memory_redis):
+    monkeypatch.setattr(gw, "_redis_client", lambda: memory_redis)
+    monkeypatch.setattr(gw.config, "LLM_RETRY_BASE_DELAY_SECONDS", 0)
+    monkeypatch.setattr(gw.config, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(gw.config, "LLM_USER_DAILY_TOKEN_BUDGET", 0)
+    return memory_redis
+
+
+def _gateway_llm(monkeypatch, chat_model) -> gw.GatewayLLM:  # noqa: ANN001
+    llm = gw.GatewayLLM("test", model="m", temperature=0, request_timeout=1)
+    monkeypatch.setattr(llm, "_chat_model", lambda: chat_model)
+    return llm
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_ainvoke_retries_rate_limit_and_pauses_everyone(monkeypatch, fake_redis) -> None:
+    sleeps: list[float] = []
+
+    async def _sleep(seconds):  # noqa: ANN001
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(gw.asyncio, "sleep", _sleep)
+
+    class _Chat:
+        calls = 0
+
+        async def ainvoke(self, _messages):  # noqa: ANN001
+            self.calls += 1
+            if self.calls == 1:
+                raise _StatusError(429, retry_after="3")
+            return SimpleNamespace(content="ok")
+
+    chat = _Chat()
+    response = await _gateway_llm(monkeypatch, chat).ainvoke([SimpleNamespace(content="hi")])
+
+    assert response.content == "ok"
+    assert chat.calls == 2
+    # The fake sleep does not advance the clock, so the retry still sees the pause
+    assert sleeps[0] == 3.0
+    assert 2_900 < await fake_redis.pttl(gw._PAUSE_KEY) <= 3_000
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_ainvoke_does_not_retry_client_errors(monkeypatch, fake_redis) -> None:
+    class _Chat:
+        calls = 0
+
+        async def ainvoke(self, _messages):  # noqa: ANN001
+            self.calls += 1
+            raise _StatusError(400)
+
+    chat = _Chat()
+    with pytest.raises(_StatusError):
+        await _gateway_llm(monkeypatch, chat).ainvoke([])
+    assert chat.calls == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_astream_retries_only_before_first_chunk(monkeypatch, fake_redis) -> None:
+    class _Chat:
+        calls = 0
+
+        async def astream(self, _messages):  # noqa: ANN001
+            self.calls += 1
+            if self.calls == 1:
+                raise _StatusError(503)
+            yield SimpleNamespace(content="par")
+            raise _StatusError(503)
+
+    chat = _Chat()
+    received: list[str] = []
+    with pytest.raises(_StatusError):
+        async for chunk in _gateway_llm(monkeypatch, chat).astream([]):
+            received.append(chunk.content)
+
+    assert chat.calls == 2
+    assert received == ["par"]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_budget_is_charged_and_enforced_per_user(monkeypatch, fake_redis) -> None:
+    monkeypatch.setattr(gw.config, "LLM_USER_DAILY_TOKEN_BUDGET", 100)
+
+    class _Chat:
+        async def ainvoke(self, _messages):  # noqa: ANN001
+            return SimpleNamespace(content="ok", usage_metadata={"total_tokens": 60})
+
+    llm = _gateway_llm(monkeypatch, _Chat())
+    await llm.ainvoke([])  # not charged: no user in scope
+    with gw.budget_scope(7):
+        await llm.ainvoke([])
+        await llm.ainvoke([])
+        with pytest.raises(gw.LLMBudgetExceededError):
+            await llm.ainvoke([])
+    with gw.budget_scope(8):
+        await llm.ainvoke([])
+
+    assert await fake_redis.get(gw._budget_key(7)) == 120
+    assert await fake_redis.get(gw._budget_key(8)) == 60
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_minute_window_limiter_waits_for_next_window(monkeypatch, fake_redis) -> None:
+    clock = {"now": 600.0}
+    sleeps: list[float] = []
+
+    async def _sleep(seconds):  # noqa: ANN001
+        sleeps.append(seconds)
+        clock["now"] += seconds
+
+    monkeypatch.setattr(gw.time, "time", lambda: clock["now"])
+    monkeypatch.setattr(gw.asyncio, "sleep", _sleep)
+    monkeypatch.setattr(gw.random, "uniform", lambda _a, _b: 0)
+    limiter = gw._MinuteWindowLimiter("tpm", 100)
+
+    await limiter.acquire(60)
+    await limiter.acquire(40)
+    clock["now"] += 15
+    await limiter.acquire(10)
+
+    assert sleeps == [45.0]
+    assert await fake_redis.get("llmgw:tpm:10") == 100
+    assert await fake_redis.get("llmgw:tpm:11") == 10
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_minute_window_limiter_falls_back_to_local_bucket(monkeypatch) -> None:
+    class _BrokenRedis:
+        async def incrby(self, *_args):  # noqa: ANN002
+            raise ConnectionError("down")
+
+    monkeypatch.setattr(gw, "_redis_client", lambda: _BrokenRedis())
+    limiter = gw._MinuteWindowLimiter("rpm", 60)
+    acquired: list[float] = []
+
+    async def _acquire(amount):  # noqa: ANN001
+        acquired.append(amount)
+
+    monkeypatch.setattr(limiter._local, "acquire", _acquire)
+    await limiter.acquire(1)
+
+    assert acquired == [1]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_minute_window_limiter_logs_fallback_once(monkeypatch, caplog, memory_redis) -> None:
+    state = {"down": True}
+
+    class _FlakyRedis:
+        async def incrby(self, key, amount):  # noqa: ANN001
+            if state["down"]:
+                raise ConnectionError("down")
+            return await memory_redis.incrby(key, amount)
+
+        async def expire(self, key, seconds):  # noqa: ANN001
+            await memory_redis.expire(key, seconds)
+
+    monkeypatch.setattr(gw, "_redis_client", lambda: _FlakyRedis())
+    limiter = gw._MinuteWindowLimiter("rpm", 60)
+
+    async def _acquire(_amount):  # noqa: ANN001
+        return None
+
+    monkeypatch.setattr(limiter._local, "acquire", _acquire)
+    caplog.set_level("INFO", logger=gw.logger.name)
+
+    for _ in range(3):
+        await limiter.acquire(1)
+    state["down"] = False
+    for _ in range(2):
+        await limiter.acquire(1)
+
+    messages = [r.getMessage() for r in caplog.records]
+    assert sum("limiting locally" in m for m in messages) == 1
+    assert sum("limit is back" in m for m in messages) == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_requests_in_flight_are_capped_per_loop(monkeypatch, fake_redis) -> None:
+    monkeypatch.setattr(gw.config, "LLM_MAX_CONCURRENT_REQUESTS", 2)
+    monkeypatch.setattr(gw, "_REQUEST_SLOTS", gw.weakref.WeakKeyDictionary())
+
+    class _Chat:
+        in_flight = 0
+        peak = 0
+
+        async def ainvoke(self, _messages):  # noqa: ANN001
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            await gw.asyncio.sleep(0.01)
+            self.in_flight -= 1
+            return SimpleNamespace(content="ok")
+
+    chat = _Chat()
+    llm = _gateway_llm(monkeypatch, chat)
+    await gw.asyncio.gather(*(llm.ainvoke([]) for _ in range(5)))
+
+    assert chat.peak == 2
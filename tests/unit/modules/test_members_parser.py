@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime, timedelta, timezone
 from types import SimpleNamespace
 
@@ -11,6 +12,30 @@ from modules import members_parser as mp
 from modules.telegram_client import AuthorizationRequiredError
 
 
+@pytest.fixture(autouse=True)
+def _isolated_caches(monkeypatch):
+    monkeypatch.setattr(mp, "_SENDER_CACHE", mp.OrderedDict())
+    monkeypatch.setattr(mp.profile_fetcher, "_BIO_CACHE", {})
+
+    async def _no_chat(chat_key, account):  # noqa: ANN001
+        return None
+
+    async def _no_profiles(user_ids):  # noqa: ANN001
+        return {}
+
+    async def _store(*args):  # noqa: ANN002
+        return None
+
+    async def _no_wait() -> None:
+        return None
+
+    monkeypatch.setattr(mp.telegram_limiter, "acquire", _no_wait)
+    monkeypatch.setattr(mp.entity_cache, "get_chat", _no_chat)
+    monkeypatch.setattr(mp.entity_cache, "store_chat", _store)
+    monkeypatch.setattr(mp.entity_cache, "get_profiles", _no_profiles)
+    monkeypatch.setattr(mp.entity_cache, "store_profiles", _store)
+
+
 class _FakeTgUser:
     def __init__(
         self,
@@ -37,10 +62,8 @@ class _FakeMessage:
         self.id = msg_id
         self.text = text
         self.date = date
-        self._sender = sender
-
-    async def get_sender(self):
-        return self._sender
+        self.sender = sender
+        self.sender_id = sender.id if sender else None
 
 
 class _FakeClient:
@@ -50,12 +73,15 @@ class _FakeClient:
         self.full_users = full_users
 
     async def get_entity(self, identifier):  # noqa: ANN001
-        if isinstance(identifier, str):
-            return self.chat_entity
-        return self.full_users[identifier]
+        return self.chat_entity
+
+    async def __call__(self, request):  # noqa: ANN001
+        user = self.full_users[request.id.id]
+        return SimpleNamespace(full_user=SimpleNamespace(about=user.about))
 
-    async def iter_messages(self, _entity, limit: int):  # noqa: ANN001
-        for msg in self.messages[:limit]:
+    async def iter_messages(self, _entity, limit: int, min_id: int = 0):  # noqa: ANN001
+        self.min_id = min_id
+        for msg in [m for m in self.messages if m.id > min_id][:limit]:
             yield msg
 
 
@@ -73,6 +99,50 @@ def test_members_parser_small_helpers() -> None:
     assert mp.format_message_age(now - timedelta(days=1)) == "вчера"
 
 
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_resolve_senders_uses_bundled_lru_and_one_batch(monkeypatch) -> None:
+    monkeypatch.setattr(mp.telethon.tl.types, "User", _FakeTgUser)
+    now = datetime.now(timezone.utc)
+    alice = _FakeTgUser(1, "alice")
+    mp._cache_sender(_FakeTgUser(2, "bob"))
+
+    def _message(msg_id: int, sender_id: int, sender=None):  # noqa: ANN001
+        msg = _FakeMessage(msg_id, "text", now, sender)
+        msg.sender_id = sender_id
+        return msg
+
+    class _BatchClient:
+        def __init__(self) -> None:
+            self.requests = []
+            self.session = SimpleNamespace(get_input_entity=lambda uid: f"input-{uid}")
+
+        async def __call__(self, request):  # noqa: ANN001
+            self.requests.append(request)
+            return [_FakeTgUser(3, "carol"), _FakeTgUser(4, "dave")]
+
+    client = _BatchClient()
+    senders = await mp._resolve_senders(
+        client,
+        [
+            _message(1, 1, alice),
+            _message(2, 2),
+            _message(3, 3),
+            _message(4, 4),
+            _message(5, 3),
+            _message(6, -100123),
+        ],
+    )
+
+    assert senders[1] is alice
+    assert senders[2].username == "bob"
+    assert senders[3].username == "carol"
+    assert senders[4].username == "dave"
+    assert len(client.requests) == 1
+    assert client.requests[0].id == ["input-3", "input-4"]
+    assert set(mp._SENDER_CACHE) == {1, 2, 3, 4}
+
+
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_parse_users_from_messages_requires_auth(monkeypatch) -> None:
@@ -125,6 +195,7 @@ async def test_parse_users_from_messages_happy_path_without_batch(monkeypatch) -
         use_batch_analysis=False,
         messages_limit=100,
         max_messages_per_user=5,
+        collect_all_messages=True,
     )
 
     assert len(all_messages) == 2
@@ -163,14 +234,525 @@ async def test_parse_users_from_messages_with_batch_filter(monkeypatch) -> None:
 
     monkeypatch.setattr(mp.TelegramAuthManager, "is_authorized", staticmethod(_auth))
     monkeypatch.setattr(mp.TelegramAuthManager, "get_client", staticmethod(_get_client))
-    monkeypatch.setattr(
-        mp,
-        "batch_analyze_chat",
-        lambda payload: {"potential_leads": [{"username": "@alice"}], "filtering_stats": {}},  # noqa: ARG005
-    )
+    async def _batch(payload, on_lead=None):  # noqa: ANN001, ARG001
+        return {"potential_leads": [{"username": "@alice"}], "filtering_stats": {}}
+
+    monkeypatch.setattr(mp, "batch_analyze_chat_async", _batch)
 
     candidates, _messages = await mp.parse_users_from_messages(
         "@chat_public", use_batch_analysis=True, messages_limit=10
     )
     assert len(candidates) == 1
     assert candidates[0]["username"] == "alice"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_streamed_leads_are_yielded_before_screening_ends(monkeypatch) -> None:
+    monkeypatch.setattr(mp.telethon.tl.types, "User", _FakeTgUser)
+    now = datetime.now(timezone.utc)
+    alice = _FakeTgUser(1, "alice")
+    bob = _FakeTgUser(2, "bob")
+    messages = [
+        _FakeMessage(41, "alice pain", now - timedelta(days=1), alice),
+        _FakeMessage(42, "bob pain", now - timedelta(days=1), bob),
+    ]
+    entity = SimpleNamespace(username="chat_public", id=-100777001)
+    full_users = {
+        1: _FakeTgUser(1, "alice", about="about alice"),
+        2: _FakeTgUser(2, "bob", about="about bob"),
+    }
+    client = _FakeClient(entity, messages, full_users)
+
+    async def _auth() -> bool:
+        return True
+
+    async def _get_client():
+        return client
+
+    monkeypatch.setattr(mp.TelegramAuthManager, "is_authorized", staticmethod(_auth))
+    monkeypatch.setattr(mp.TelegramAuthManager, "get_client", staticmethod(_get_client))
+    screening_done = asyncio.Event()
+    alice_lead = {"username": "@alice", "pain_score": 8}
+
+    async def _batch(payload, on_lead=None):  # noqa: ANN001, ARG001
+        on_lead(alice_lead)
+        await screening_done.wait()
+        return {"potential_leads": [alice_lead, {"username": "@bob"}]}
+
+    monkeypatch.setattr(mp, "batch_analyze_chat_async", _batch)
+
+    candidates = mp.iter_candidates("@chat_public", use_batch_analysis=True, messages_limit=10)
+    first = await asyncio.wait_for(candidates.__anext__(), timeout=5)
+    assert first["username"] == "alice"
+    assert first["batch_analysis_data"] == alice_lead
+    assert not screening_done.is_set()
+
+    screening_done.set()
+    rest = [candidate async for candidate in candidates]
+    assert [candidate["username"] for candidate in rest] == ["bob"]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_parse_users_from_messages_incremental_merges_window(monkeypatch) -> None:
+    monkeypatch.setattr(mp.telethon.tl.types, "User", _FakeTgUser)
+    now = datetime.now(timezone.utc)
+    alice = _FakeTgUser(1, "alice")
+    messages = [
+        _FakeMessage(32, "new alice pain", now - timedelta(hours=1), alice),
+        _FakeMessage(30, "already seen", now - timedelta(days=1), alice),
+    ]
+    entity = SimpleNamespace(username="chat_public", id=-100888000)
+    client = _FakeClient(entity, messages, {1: _FakeTgUser(1, "alice")})
+    stored_window = [
+        {
+            "id": 30,
+            "date": (now - timedelta(days=1)).isoformat(),
+            "text": "already seen",
+            "sender": {"id": 1, "username": "alice", "first_name": "A", "last_name": None},
+        },
+        {
+            "id": 29,
+            "date": (now - timedelta(days=2)).isoformat(),
+            "text": "from bob",
+            "sender": {"id": 2, "username": "bob", "first_name": "B", "last_name": None},
+        },
+        {
+            "id": 5,
+            "date": (now - timedelta(days=mp.config.MESSAGE_MAX_AGE_DAYS + 1)).isoformat(),
+            "text": "expired",
+            "sender": None,
+        },
+    ]
+    saved: dict = {}
+
+    async def _auth() -> bool:
+        return True
+
+    async def _get_client():
+        return client
+
+    async def _load_cursor(chat_key, account):  # noqa: ANN001
+        assert chat_key == "chat_public"
+        return SimpleNamespace(last_message_id=30, window=stored_window)
+
+    async def _save_cursor(chat_key, account, last_message_id, window):  # noqa: ANN001
+        saved.update(last_message_id=last_message_id, window=window)
+
+    monkeypatch.setattr(mp.TelegramAuthManager, "is_authorized", staticmethod(_auth))
+    monkeypatch.setattr(mp.TelegramAuthManager, "get_client", staticmethod(_get_client))
+    monkeypatch.setattr(mp.message_cursor, "load_cursor", _load_cursor)
+    monkeypatch.setattr(mp.message_cursor, "save_cursor", _save_cursor)
+
+    candidates, all_messages = await mp.parse_users_from_messages(
+        "@chat_public",
+        use_batch_analysis=False,
+        messages_limit=10,
+        incremental=True,
+        collect_all_messages=True,
+    )
+
+    assert client.min_id == 30
+    assert [m["message_id"] for m in all_messages] == [32, 30, 29]
+    by_username = {c["username"]: c for c in candidates}
+    assert by_username["alice"]["messages_in_chat"] == 2
+    assert by_username["bob"]["messages_in_chat"] == 1
+    assert saved["last_message_id"] == 32
+    assert [r["id"] for r in saved["window"]] == [32, 30, 29]
+
+
+@pytest.mark.unit
+async def test_cursor_is_kept_when_messages_limit_stops_before_it(monkeypatch) -> None:
+    monkeypatch.setattr(mp.telethon.tl.types, "User", _FakeTgUser)
+    now = datetime.now(timezone.utc)
+    alice = _FakeTgUser(1, "alice")
+    messages = [
+        _FakeMessage(message_id, "pain", now - timedelta(minutes=message_id), alice)
+        for message_id in (43, 42, 41)
+    ]
+    entity = SimpleNamespace(username="chat_public", id=-100888002)
+    client = _FakeClient(entity, messages, {1: alice})
+    saved: list[int] = []
+
+    async def _auth() -> bool:
+        return True
+
+    async def _get_client():
+        return client
+
+    async def _load_cursor(chat_key, account):  # noqa: ANN001
+        return SimpleNamespace(last_message_id=40, window=[])
+
+    async def _save_cursor(chat_key, account, last_message_id, window):  # noqa: ANN001
+        saved.append(last_message_id)
+
+    monkeypatch.setattr(mp.TelegramAuthManager, "is_authorized", staticmethod(_auth))
+    monkeypatch.setattr(mp.TelegramAuthManager, "get_client", staticmethod(_get_client))
+    monkeypatch.setattr(mp.message_cursor, "load_cursor", _load_cursor)
+    monkeypatch.setattr(mp.message_cursor, "save_cursor", _save_cursor)
+
+    async def _parse(limit: int) -> None:
+        await mp.parse_users_from_messages(
+            "@chat_public", use_batch_analysis=False, messages_limit=limit, incremental=True
+        )
+
+    # Message 41 is never read: moving the cursor to 43 would skip it for good
+    await _parse(2)
+    assert saved == []
+
+    await _parse(10)
+    assert saved == [43]
+
+
+@pytest.mark.unit
+def test_text_message_builds_dicts_from_shared_chat_info() -> None:
+    now = datetime(2024, 5, 10, 12, tzinfo=timezone.utc)
+    chat = mp._ChatInfo(None, -100555000, False)
+    message = mp._TextMessage(7, "need a bot", now - timedelta(days=2))
+
+    data = message.to_candidate_dict(chat, now)
+
+    assert data["link"] == "t.me/c/555000/7"
+    assert data["date"] == (now - timedelta(days=2)).isoformat()
+    assert data["chat_id"] == -100555000 and data["is_public"] is False
+    assert data["freshness"] == mp.get_message_freshness(message.date, now)
+    assert data["age_display"] == "2 дн. назад"
+    assert set(message.to_dict(chat)) == set(data) - {"freshness", "age_display"}
+    assert mp._message_age_days(now - timedelta(days=3, hours=1), now) == 3
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_iter_candidates_without_all_messages_skips_collection(monkeypatch) -> None:
+    monkeypatch.setattr(mp.telethon.tl.types, "User", _FakeTgUser)
+    now = datetime.now(timezone.utc)
+    alice = _FakeTgUser(1, "alice")
+    messages = [
+        _FakeMessage(m_id, f"text {m_id}", now - timedelta(hours=m_id), alice)
+        for m_id in range(1, 8)
+    ]
+    client = _FakeClient(
+        SimpleNamespace(username="chat_public", id=-100999000), messages, {1: alice}
+    )
+
+    async def _auth() -> bool:
+        return True
+
+    async def _get_client():
+        return client
+
+    monkeypatch.setattr(mp.TelegramAuthManager, "is_authorized", staticmethod(_auth))
+    monkeypatch.setattr(mp.TelegramAuthManager, "get_client", staticmethod(_get_client))
+
+    def _unexpected(*_args):  # noqa: ANN002
+        raise AssertionError("messages of non-candidates must not be turned into dicts")
+
+    monkeypatch.setattr(mp._TextMessage, "to_dict", _unexpected)
+    monkeypatch.setattr(
+        mp._TextMessage,
+        "to_candidate_dict",
+        lambda self, chat, _now: {"message_id": self.id, "text": self.text, "freshness": "hot"},
+    )
+
+    candidates = [
+        c async for c in mp.iter_candidates(
+            "@chat_public", use_batch_analysis=False, max_messages_per_user=3
+        )
+    ]
+
+    assert len(candidates) == 1
+    assert candidates[0]["messages_in_chat"] == 7
+    assert [m["message_id"] for m in candidates[0]["messages_with_metadata"]] == [1, 2, 3]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_all_messages_are_opt_in_or_streamed(monkeypatch) -> None:
+    monkeypatch.setattr(mp.telethon.tl.types, "User", _FakeTgUser)
+    now = datetime.now(timezone.utc)
+    alice = _FakeTgUser(1, "alice")
+    messages = [
+        _FakeMessage(41, "alice pain", now - timedelta(hours=1), alice),
+        _FakeMessage(42, "anonymous post", now - timedelta(hours=2), None),
+    ]
+    client = _FakeClient(
+        SimpleNamespace(username="chat_public", id=-100444000), messages, {1: alice}
+    )
+
+    async def _auth() -> bool:
+        return True
+
+    async def _get_client():
+        return client
+
+    monkeypatch.setattr(mp.TelegramAuthManager, "is_authorized", staticmethod(_auth))
+    monkeypatch.setattr(mp.TelegramAuthManager, "get_client", staticmethod(_get_client))
+
+    candidates, all_messages = await mp.parse_users_from_messages(
+        "@chat_public", use_batch_analysis=False
+    )
+    assert len(candidates) == 1
+    assert all_messages == []
+
+    streamed: list[dict] = []
+
+    async def _on_message(message: dict) -> None:
+        streamed.append(message)
+
+    candidates = [
+        c async for c in mp.iter_candidates(
+            "@chat_public", use_batch_analysis=False, on_message=_on_message
+        )
+    ]
+    assert len(candidates) == 1
+    assert [m["message_id"] for m in streamed] == [41, 42]
+    assert streamed[1]["link"] == "t.me/chat_public/42"
+
+
+@pytest.mark.unit
+async def test_message_store_replaces_history_fetch(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(mp.telethon.tl.types, "User", _FakeTgUser)
+    monkeypatch.setattr(mp.config, "MESSAGE_STORE_ENABLED", True)
+    monkeypatch.setattr(mp.config, "MESSAGE_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(mp.config, "MESSAGE_STORE_REFRESH_MINUTES", 60)
+    # Telegram dates have second precision, like the store
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    alice = _FakeTgUser(1, "alice", about="@alice_channel")
+    messages = [
+        _FakeMessage(12, None, now - timedelta(minutes=5), alice),
+        _FakeMessage(11, "new pain", now - timedelta(hours=1), alice),
+        _FakeMessage(10, "bot spam", now - timedelta(hours=2), _FakeTgUser(3, "x_bot", bot=True)),
+    ]
+    entity = SimpleNamespace(username="chat_public", id=-100888000)
+    client = _FakeClient(entity, messages, {1: alice})
+    history_requests: list[int] = []
+    iter_messages = client.iter_messages
+
+    def _counting_iter_messages(entity, limit: int, min_id: int = 0):  # noqa: ANN001
+        history_requests.append(min_id)
+        return iter_messages(entity, limit, min_id)
+
+    client.iter_messages = _counting_iter_messages
+
+    async def _auth() -> bool:
+        return True
+
+    async def _get_client():
+        return client
+
+    monkeypatch.setattr(mp.TelegramAuthManager, "is_authorized", staticmethod(_auth))
+    monkeypatch.setattr(mp.TelegramAuthManager, "get_client", staticmethod(_get_client))
+
+    async def _parse() -> tuple[list[dict], list[dict]]:
+        mp._SENDER_CACHE.clear()
+        return await mp.parse_users_from_messages(
+            "@chat_public", use_batch_analysis=False, messages_limit=10,
+            collect_all_messages=True,
+        )
+
+    first = await _parse()
+    # Fresh store: the chat is re-analysed from disk only
+    second = await _parse()
+
+    assert history_requests == [0]
+    assert second[1] == first[1]
+    assert [m["message_id"] for m in second[1]] == [11, 10]
+    assert [c["username"] for c in second[0]] == ["alice"]
+    assert second[0][0]["messages_in_chat"] == 1
+    assert second[0][0]["channel_username"] == "@alice_channel"
+
+    # Stale store: only messages after the last seen id are requested
+    monkeypatch.setattr(mp.config, "MESSAGE_STORE_REFRESH_MINUTES", 0)
+    client.messages.insert(0, _FakeMessage(13, "follow-up", now, alice))
+    candidates, all_messages = await _parse()
+
+    assert history_requests == [0, 12]
+    assert [m["message_id"] for m in all_messages] == [13, 11, 10]
+    assert candidates[0]["messages_in_chat"] == 2
+
+
+@pytest.mark.unit
+async def test_message_store_takes_over_from_the_cursor(monkeypatch, tmp_path, caplog) -> None:
+    monkeypatch.setattr(mp.telethon.tl.types, "User", _FakeTgUser)
+    monkeypatch.setattr(mp.config, "MESSAGE_STORE_ENABLED", True)
+    monkeypatch.setattr(mp.config, "MESSAGE_STORE_DIR", str(tmp_path))
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    alice = _FakeTgUser(1, "alice", about="@alice_channel")
+    entity = SimpleNamespace(username="chat_public", id=-100888001)
+    client = _FakeClient(entity, [_FakeMessage(11, "pain", now, alice)], {1: alice})
+    cursor_calls: list[str] = []
+
+    async def _auth() -> bool:
+        return True
+
+    async def _get_client():
+        return client
+
+    async def _load_cursor(*args):  # noqa: ANN002
+        cursor_calls.append("load")
+
+    async def _save_cursor(*args):  # noqa: ANN002
+        cursor_calls.append("save")
+
+    monkeypatch.setattr(mp.TelegramAuthManager, "is_authorized", staticmethod(_auth))
+    monkeypatch.setattr(mp.TelegramAuthManager, "get_client", staticmethod(_get_client))
+    monkeypatch.setattr(mp.message_cursor, "load_cursor", _load_cursor)
+    monkeypatch.setattr(mp.message_cursor, "save_cursor", _save_cursor)
+
+    candidates, _messages = await mp.parse_users_from_messages(
+        "@chat_public", use_batch_analysis=False, messages_limit=10, incremental=True
+    )
+
+    assert [c["username"] for c in candidates] == ["alice"]
+    assert cursor_calls == []
+    assert mp.message_store.open_chat("chat_public").max_id == 11
+    assert "Could not" not in caplog.text
+
+
+@pytest.mark.unit
+async def test_failed_screening_falls_back_to_all_candidates(monkeypatch) -> None:
+    monkeypatch.setattr(mp.telethon.tl.types, "User", _FakeTgUser)
+    now = datetime.now(timezone.utc)
+    alice = _FakeTgUser(1, "alice")
+    bob = _FakeTgUser(2, "bob")
+    messages = [
+        _FakeMessage(51, "alice pain", now - timedelta(days=1), alice),
+        _FakeMessage(52, "bob pain", now - timedelta(days=1), bob),
+    ]
+    entity = SimpleNamespace(username="chat_public", id=-100777002)
+    full_users = {
+        1: _FakeTgUser(1, "alice", about="about alice"),
+        2: _FakeTgUser(2, "bob", about="about bob"),
+    }
+    client = _FakeClient(entity, messages, full_users)
+
+    async def _auth() -> bool:
+        return True
+
+    async def _get_client():
+        return client
+
+    monkeypatch.setattr(mp.TelegramAuthManager, "is_authorized", staticmethod(_auth))
+    monkeypatch.setattr(mp.TelegramAuthManager, "get_client", staticmethod(_get_client))
+
+    async def _batch(payload, on_lead=None):  # noqa: ANN001, ARG001
+        on_lead({"username": "@alice"})
+        await asyncio.sleep(0)
+        raise RuntimeError("screening crashed")
+
+    monkeypatch.setattr(mp, "batch_analyze_chat_async", _batch)
+
+    candidates, _messages = await mp.parse_users_from_messages(
+        "@chat_public", use_batch_analysis=True, messages_limit=10
+    )
+
+    assert sorted(c["username"] for c in candidates) == ["alice", "bob"]
+
+
+@pytest.mark.unit
+async def test_exhausted_llm_budget_stops_the_parser(monkeypatch) -> None:
+    monkeypatch.setattr(mp.telethon.tl.types, "User", _FakeTgUser)
+    now = datetime.now(timezone.utc)
+    alice = _FakeTgUser(1, "alice")
+    entity = SimpleNamespace(username="chat_public", id=-100777004)
+    client = _FakeClient(
+        entity, [_FakeMessage(61, "alice pain", now - timedelta(days=1), alice)], {1: alice}
+    )
+
+    async def _auth() -> bool:
+        return True
+
+    async def _get_client():
+        return client
+
+    monkeypatch.setattr(mp.TelegramAuthManager, "is_authorized", staticmethod(_auth))
+    monkeypatch.setattr(mp.TelegramAuthManager, "get_client", staticmethod(_get_client))
+
+    async def _batch(payload, on_lead=None):  # noqa: ANN001, ARG001
+        raise mp.llm_gateway.LLMBudgetExceededError("daily budget exhausted")
+
+    monkeypatch.setattr(mp, "batch_analyze_chat_async", _batch)
+
+    with pytest.raises(mp.llm_gateway.LLMBudgetExceededError):
+        await mp.parse_users_from_messages(
+            "@chat_public", use_batch_analysis=True, messages_limit=10
+        )
+
+
+@pytest.mark.unit
+async def test_closing_the_parser_cancels_screening(monkeypatch) -> None:
+    monkeypatch.setattr(mp.telethon.tl.types, "User", _FakeTgUser)
+    now = datetime.now(timezone.utc)
+    alice = _FakeTgUser(1, "alice")
+    entity = SimpleNamespace(username="chat_public", id=-100777003)
+    client = _FakeClient(
+        entity,
+        [_FakeMessage(61, "alice pain", now, alice)],
+        {1: _FakeTgUser(1, "alice", about="about alice")},
+    )
+
+    async def _auth() -> bool:
+        return True
+
+    async def _get_client():
+        return client
+
+    monkeypatch.setattr(mp.TelegramAuthManager, "is_authorized", staticmethod(_auth))
+    monkeypatch.setattr(mp.TelegramAuthManager, "get_client", staticmethod(_get_client))
+    cancelled = asyncio.Event()
+
+    async def _batch(payload, on_lead=None):  # noqa: ANN001, ARG001
+        on_lead({"username": "@alice"})
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    monkeypatch.setattr(mp, "batch_analyze_chat_async", _batch)
+
+    candidates = mp.iter_candidates("@chat_public", use_batch_analysis=True, messages_limit=10)
+    first = await asyncio.wait_for(candidates.__anext__(), timeout=5)
+    await candidates.aclose()
+
+    assert first["username"] == "alice"
+    assert cancelled.is_set()
+
+
+@pytest.mark.unit
+async def test_message_store_is_not_appended_past_a_gap(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(mp.telethon.tl.types, "User", _FakeTgUser)
+    monkeypatch.setattr(mp.config, "MESSAGE_STORE_ENABLED", True)
+    monkeypatch.setattr(mp.config, "MESSAGE_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(mp.config, "MESSAGE_STORE_REFRESH_MINUTES", 0)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    alice = _FakeTgUser(1, "alice")
+    entity = SimpleNamespace(username="chat_public", id=-100888003)
+    client = _FakeClient(entity, [_FakeMessage(10, "old pain", now - timedelta(hours=1), alice)], {1: alice})
+
+    async def _auth() -> bool:
+        return True
+
+    async def _get_client():
+        return client
+
+    monkeypatch.setattr(mp.TelegramAuthManager, "is_authorized", staticmethod(_auth))
+    monkeypatch.setattr(mp.TelegramAuthManager, "get_client", staticmethod(_get_client))
+
+    async def _parse(limit: int) -> None:
+        await mp.parse_users_from_messages("@chat_public", use_batch_analysis=False, messages_limit=limit)
+
+    await _parse(10)
+    client.messages = [
+        _FakeMessage(message_id, "pain", now - timedelta(minutes=message_id), alice)
+        for message_id in (13, 12, 11)
+    ] + client.messages
+
+    # Message 11 is not read: the store must not jump to 13
+    await _parse(2)
+    assert mp.message_store.open_chat("chat_public").max_id == 10
+
+    await _parse(10)
+    store = mp.message_store.open_chat("chat_public")
+    assert [m.id for m in store.iter_newest()] == [13, 12, 11, 10]
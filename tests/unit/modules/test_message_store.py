@@ -0,0 +1,108 @@
+"""Unit tests for modules.message_store."""
+
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from modules import message_store as ms
+
+_NOW = datetime(2024, 5, 10, 12, tzinfo=timezone.utc)
+
+
+def _message(message_id: int, text: str | None = None, sender_id: int | None = 7) -> ms.StoredMessage:
+    return ms.StoredMessage(
+        message_id, sender_id, _NOW - timedelta(minutes=100 - message_id),
+        text if text is not None else f"сообщение {message_id}",
+    )
+
+
+def _read(store: ms.ChatStore, **kwargs) -> list[tuple]:  # noqa: ANN003
+    return [(m.id, m.sender_id, m.date, m.text) for m in store.iter_newest(**kwargs)]
+
+
+@pytest.mark.unit
+def test_append_and_read_back_newest_first(tmp_path) -> None:
+    store = ms.ChatStore("chat", root=tmp_path)
+    assert store.count == 0 and not store.is_fresh()
+    assert _read(store) == []
+
+    appended = store.append(
+        [_message(3), _message(1, sender_id=None), _message(2, "")],
+        {7: {"id": 7, "username": "alice", "first_name": "A", "last_name": None}},
+        max_id=5,
+    )
+
+    reopened = ms.ChatStore("chat", root=tmp_path)
+    assert appended == 3
+    assert reopened.count == 3
+    assert reopened.max_id == 5
+    assert reopened.is_fresh(60)
+    assert _read(reopened) == [
+        (3, 7, _NOW - timedelta(minutes=97), "сообщение 3"),
+        (2, 7, _NOW - timedelta(minutes=98), ""),
+        (1, None, _NOW - timedelta(minutes=99), "сообщение 1"),
+    ]
+    assert [m.id for m in reopened.iter_newest(limit=1)] == [3]
+    assert [m.id for m in reopened.iter_newest(before_id=3)] == [2, 1]
+    assert reopened.senders()[7]["username"] == "alice"
+
+
+@pytest.mark.unit
+def test_append_skips_known_ids_and_keeps_senders(tmp_path) -> None:
+    store = ms.ChatStore("chat", root=tmp_path)
+    store.append([_message(1), _message(2)], {7: {"id": 7, "username": "alice"}})
+
+    appended = store.append(
+        [_message(2), _message(4), _message(4), _message(3)],
+        {8: {"id": 8, "username": "bob"}},
+    )
+
+    assert appended == 2
+    assert [m.id for m in store.iter_newest()] == [4, 3, 2, 1]
+    assert set(store.senders()) == {7, 8}
+
+
+@pytest.mark.unit
+def test_uncommitted_tail_is_ignored_and_overwritten(tmp_path) -> None:
+    store = ms.ChatStore("chat", root=tmp_path)
+    store.append([_message(1)])
+    # A crash after writing columns but before meta.json leaves a tail
+    for name in ("ids", "senders", "dates", "ends", "text"):
+        with open(store.directory / f"{name}.0", "ab") as f:
+            f.write(b"\xff" * 13)
+
+    assert [m.id for m in ms.ChatStore("chat", root=tmp_path).iter_newest()] == [1]
+    store.append([_message(2)])
+
+    assert _read(ms.ChatStore("chat", root=tmp_path))[0][::3] == (2, "сообщение 2")
+
+
+@pytest.mark.unit
+def test_store_is_compacted_to_newest_messages(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(ms.config, "MESSAGE_STORE_MAX_MESSAGES", 3)
+    store = ms.ChatStore("chat", root=tmp_path)
+    store.append([_message(i) for i in range(1, 4)])
+
+    store.append([_message(4), _message(5)])
+
+    reopened = ms.ChatStore("chat", root=tmp_path)
+    assert reopened.meta["generation"] == 1
+    assert _read(reopened) == _read(store)
+    assert [m.text for m in reopened.iter_newest()] == ["сообщение 5", "сообщение 4", "сообщение 3"]
+    assert not (tmp_path / "chat" / "ids.0").exists()
+
+
+@pytest.mark.unit
+def test_freshness_and_chat_directory(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(ms.config, "MESSAGE_STORE_DIR", str(tmp_path))
+    store = ms.open_chat("-100123/topic")
+    store.append([_message(1)])
+    assert store.directory == tmp_path / "-100123_topic"
+
+    store.meta["fetched_at"] = time.time() - 7200
+    assert store.is_fresh(180)
+    assert not store.is_fresh(60)
+    assert not store.is_fresh(0)
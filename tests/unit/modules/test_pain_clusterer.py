@@ -199,7 +199,7 @@ async def test_cluster_new_pains_assigns_existing_and_new(monkeypatch) -> None:
     monkeypatch.setattr(clusterer, "_load_prompt", lambda: "tpl")
 
     class _LLM:
-        async def ainvoke(self, _messages):  # noqa: ANN001
+        async def astream(self, _messages):  # noqa: ANN001
             content = (
                 '{"assignments":['
                 '{"pain_id":1,"cluster_id":10},'
@@ -209,7 +209,8 @@ async def test_cluster_new_pains_assigns_existing_and_new(monkeypatch) -> None:
                 '{"pain_id":2,"cluster_id":"bad"}'
                 ']}'
             )
-            return SimpleNamespace(content=content)
+            for start in range(0, len(content), 40):
+                yield SimpleNamespace(content=content[start:start + 40])
 
     monkeypatch.setattr(clusterer, "_llm", _LLM())
     updated: list[int] = []
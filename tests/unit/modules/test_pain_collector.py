@@ -67,7 +67,7 @@ class _Result:
         self._rows = rows
 
     def scalars(self):
-        return SimpleNamespace(first=lambda: self._rows[0] if self._rows else None)
+        return SimpleNamespace(all=lambda: list(self._rows))
 
 
 class _Session:
@@ -77,38 +77,28 @@ class _Session:
         self.no_autoflush = nullcontext()
         self.flush_calls = 0
         self.commit_calls = 0
+        self.statements = 0
 
     def add(self, pain: Pain) -> None:
         self.added.append(pain)
 
     async def execute(self, query):  # noqa: ANN001
-        rows = self.pains + self.added
-        source_message_id = None
-        source_chat = None
-        original_quote = None
-        user_id = None
-        for criterion in getattr(query, "_where_criteria", []):
-            left = getattr(criterion, "left", None)
-            right = getattr(criterion, "right", None)
-            name = getattr(left, "name", None)
-            value = getattr(right, "value", None)
-            if name == "source_message_id":
-                source_message_id = value
-            elif name == "source_chat":
-                source_chat = value
-            elif name == "original_quote":
-                original_quote = value
-            elif name == "user_id":
-                user_id = value
-        found = [
-            p
-            for p in rows
-            if p.source_message_id == source_message_id
-            and p.source_chat == source_chat
-            and p.original_quote == original_quote
-            and p.user_id == user_id
-        ]
-        return _Result(found)
+        # INSERT ... ON CONFLICT ON CONSTRAINT uq_pain_message_quote DO NOTHING
+        assert query.table.name == "pains"
+        self.statements += 1
+        inserted_ids = []
+        for values in query._multi_values[0]:
+            row = {column.name: value for column, value in values.items()}
+            key = (row["source_message_id"], row["source_chat"], row["original_quote"])
+            if any(
+                (p.source_message_id, p.source_chat, p.original_quote) == key
+                for p in self.pains + self.added
+            ):
+                continue
+            pain = Pain(id=len(self.pains) + len(self.added) + 1, **row)
+            self.added.append(pain)
+            inserted_ids.append(pain.id)
+        return _Result(inserted_ids)
 
     async def flush(self) -> None:
         self.flush_calls += 1
@@ -206,7 +196,9 @@ async def test_collect_pains_happy_path_with_batching(monkeypatch) -> None:
 
     assert inserted == 2
     assert session.commit_calls == 1
-    assert session.flush_calls == 2
+    # One INSERT per batch, no per-pain lookups or flushes
+    assert session.statements == 2
+    assert session.flush_calls == 0
     assert len(sleep_calls) == 1
     assert len(session.pains) == 2
     first = session.pains[0]
@@ -215,3 +207,148 @@ async def test_collect_pains_happy_path_with_batching(monkeypatch) -> None:
     assert first.category == "sales"
     assert first.intensity == "high"
     assert first.business_type == "Retail"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_pain_stream_extracts_batches_while_messages_arrive(monkeypatch) -> None:
+    session = _Session()
+    monkeypatch.setattr(pc.config, "PAIN_COLLECTION_ENABLED", True)
+    monkeypatch.setattr(pc.config, "PAIN_BATCH_SIZE", 2)
+    monkeypatch.setattr(pc, "_load_prompt", lambda: "prompt")
+    extracted: list[list[int]] = []
+
+    async def _extract(batch, chat_name, prompt_template):  # noqa: ANN001
+        extracted.append([m["message_id"] for m in batch])
+        return [{"source_message_index": 0, "text": "pain", "original_quote": "quote"}]
+
+    monkeypatch.setattr(pc, "_extract_pains_batch", _extract)
+    stream = pc.PainStream(10, 99, "chat_a", session)
+
+    for message_id in (1, 2, 3):
+        await stream.add({"message_id": message_id, "text": f"m{message_id}", "chat_username": "chat_a"})
+    await pc.asyncio.sleep(0)
+    # The first full batch is already being extracted; the third message waits
+    assert extracted == [[1, 2]]
+
+    inserted = await stream.close()
+
+    assert inserted == 2
+    assert extracted == [[1, 2], [3]]
+    assert [p.source_message_id for p in session.pains] == [1, 3]
+    assert session.commit_calls == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_pain_stream_disabled_and_cancel(monkeypatch) -> None:
+    session = _Session()
+    monkeypatch.setattr(pc.config, "PAIN_COLLECTION_ENABLED", False)
+    disabled = pc.PainStream(1, 1, "chat", session)
+    await disabled.add({"message_id": 1, "text": "m"})
+    assert await disabled.close() == 0
+
+    monkeypatch.setattr(pc.config, "PAIN_COLLECTION_ENABLED", True)
+    monkeypatch.setattr(pc.config, "PAIN_BATCH_SIZE", 1)
+    monkeypatch.setattr(pc, "_load_prompt", lambda: "prompt")
+    started = pc.asyncio.Event()
+
+    async def _hang(batch, chat_name, prompt_template):  # noqa: ANN001
+        started.set()
+        await pc.asyncio.Event().wait()
+
+    monkeypatch.setattr(pc, "_extract_pains_batch", _hang)
+    stream = pc.PainStream(1, 1, "chat", session)
+    await stream.add({"message_id": 1, "text": "m"})
+    await started.wait()
+    tasks = set(stream._tasks)
+    stream.cancel()
+    await pc.asyncio.gather(*tasks, return_exceptions=True)
+
+    assert tasks and all(task.cancelled() for task in tasks)
+    assert session.commit_calls == 0
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_pain_stream_add_waits_while_too_many_batches_are_pending(monkeypatch) -> None:
+    session = _Session()
+    monkeypatch.setattr(pc.config, "PAIN_COLLECTION_ENABLED", True)
+    monkeypatch.setattr(pc.config, "PAIN_BATCH_SIZE", 1)
+    monkeypatch.setattr(pc, "_load_prompt", lambda: "prompt")
+    release = pc.asyncio.Event()
+
+    async def _slow(batch, chat_name, prompt_template):  # noqa: ANN001
+        await release.wait()
+        return []
+
+    monkeypatch.setattr(pc, "_extract_pains_batch", _slow)
+    stream = pc.PainStream(1, 1, "chat", session)
+    for message_id in range(pc._STREAM_MAX_PENDING):
+        await stream.add({"message_id": message_id, "text": "m"})
+
+    blocked = pc.asyncio.create_task(stream.add({"message_id": 99, "text": "m"}))
+    await pc.asyncio.sleep(0.01)
+    assert not blocked.done()
+    assert len(stream._tasks) == pc._STREAM_MAX_PENDING
+
+    release.set()
+    await pc.asyncio.wait_for(blocked, timeout=5)
+    assert await stream.close() == 0
+    assert stream._batches_submitted == pc._STREAM_MAX_PENDING + 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_extract_pains_batch_packs_prompt_compactly(monkeypatch) -> None:
+    prompts: list[str] = []
+
+    class _LLM:
+        async def astream(self, messages):  # noqa: ANN001
+            prompts.append(messages[0].content)
+            yield SimpleNamespace(content='{"pains":[{"source_')
+            yield SimpleNamespace(content='message_index":2}]}')
+
+    monkeypatch.setattr(pc, "_llm", _LLM())
+    batch = [
+        {"text": "Нужен бот для заказов"},
+        {"text": "нужен  бот для заказов"},
+        {"text": "Другое сообщение"},
+    ]
+
+    pains = await pc._extract_pains_batch(batch, "chat", "msgs={messages}")
+
+    assert pains == [{"source_message_index": 2}]
+    assert prompts[0] == (
+        'msgs=[{"index":0,"text":"Нужен бот для заказов"},'
+        '{"index":2,"text":"Другое сообщение"}]'
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_store_batch_pains_skips_duplicates_in_one_insert() -> None:
+    session = _Session()
+    session.pains.append(
+        Pain(
+            user_id=10, program_id=99, text="old", original_quote="known",
+            category="other", intensity="low", source_chat="chat_a", source_message_id=1,
+        )
+    )
+    batch = [
+        {"message_id": 1, "chat_username": "chat_a"},
+        {"message_id": 2, "chat_username": "chat_a"},
+    ]
+    raw_pains = [
+        {"source_message_index": 0, "text": "again", "original_quote": "known"},
+        {"source_message_index": 1, "text": "new", "original_quote": "fresh"},
+        {"source_message_index": 1, "text": "repeat", "original_quote": "fresh"},
+    ]
+
+    inserted = await pc._store_batch_pains(batch, raw_pains, 10, 99, session)
+
+    assert inserted == 1
+    assert session.statements == 1
+    assert [(p.source_message_id, p.text) for p in session.added] == [(2, "new")]
+    assert await pc.insert_pains(session, []) == 0
+    assert session.statements == 1
@@ -0,0 +1,118 @@
+"""Unit tests for modules.profile_fetcher."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from modules import profile_fetcher as pf
+
+
+class _FakeTgUser:
+    def __init__(self, user_id: int, about: str | None = None) -> None:
+        self.id = user_id
+        self.about = about
+
+
+class _FakeClient:
+    def __init__(self, bios: dict[int, str | None], failing: set[int] | None = None):
+        self.bios = bios
+        self.failing = failing or set()
+        self.requested: list[int] = []
+
+    async def __call__(self, request):  # noqa: ANN001
+        user_id = request.id.id
+        self.requested.append(user_id)
+        if user_id in self.failing:
+            raise RuntimeError("boom")
+        return SimpleNamespace(full_user=SimpleNamespace(about=self.bios[user_id]))
+
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch):
+    monkeypatch.setattr(pf, "_BIO_CACHE", {})
+    monkeypatch.setattr(pf.telethon.tl.types, "User", _FakeTgUser)
+
+    async def _no_wait() -> None:
+        return None
+
+    monkeypatch.setattr(pf.telegram_limiter, "acquire", _no_wait)
+
+    async def _no_profiles(user_ids):  # noqa: ANN001
+        return {}
+
+    async def _store(profiles):  # noqa: ANN001
+        return None
+
+    monkeypatch.setattr(pf.entity_cache, "get_profiles", _no_profiles)
+    monkeypatch.setattr(pf.entity_cache, "store_profiles", _store)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_fetch_bios_uses_cache_and_tolerates_failures() -> None:
+    pf.cache_bio(1, "cached bio")
+    client = _FakeClient({2: "bio two", 3: None}, failing={4})
+
+    bios = await pf.fetch_bios(
+        client, [_FakeTgUser(1), _FakeTgUser(2), _FakeTgUser(3), _FakeTgUser(4)]
+    )
+
+    assert bios == {1: "cached bio", 2: "bio two", 3: None, 4: None}
+    assert sorted(client.requested) == [2, 3, 4]
+    assert pf.get_cached_bio(3) == (True, None)
+    assert pf.get_cached_bio(4) == (False, None)
+
+
+@pytest.mark.unit
+def test_cached_bio_expires(monkeypatch) -> None:
+    pf.cache_bio(1, "bio")
+    monkeypatch.setattr(pf.config, "PROFILE_CACHE_TTL_HOURS", 0)
+    assert pf.get_cached_bio(1) == (False, None)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_fetch_bios_reads_through_db_cache_and_stores_fetched(monkeypatch) -> None:
+    stored: list[dict] = []
+
+    async def _profiles(user_ids):  # noqa: ANN001
+        return {1: SimpleNamespace(bio="db bio")}
+
+    async def _store(profiles):  # noqa: ANN001
+        stored.extend(profiles)
+
+    monkeypatch.setattr(pf.entity_cache, "get_profiles", _profiles)
+    monkeypatch.setattr(pf.entity_cache, "store_profiles", _store)
+    client = _FakeClient({2: "see @mychannel1"})
+
+    bios = await pf.fetch_bios(client, [_FakeTgUser(1), _FakeTgUser(2)])
+
+    assert bios == {1: "db bio", 2: "see @mychannel1"}
+    assert client.requested == [2]
+    assert stored[0]["user_id"] == 2
+    assert stored[0]["channel_in_bio"] == "@mychannel1"
+    assert pf.get_cached_bio(1) == (True, "db bio")
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_iter_bios_yields_cached_first_and_stores_on_close(monkeypatch) -> None:
+    stored: list[dict] = []
+
+    async def _store(profiles):  # noqa: ANN001
+        stored.extend(profiles)
+
+    monkeypatch.setattr(pf.entity_cache, "store_profiles", _store)
+    pf.cache_bio(2, "cached")
+    client = _FakeClient({1: "fetched one", 3: "fetched three"})
+
+    stream = pf.iter_bios(client, [_FakeTgUser(1), _FakeTgUser(2), _FakeTgUser(3)])
+    first_user, first_bio = await stream.__anext__()
+    second_user, _ = await stream.__anext__()
+    await stream.aclose()
+
+    assert (first_user.id, first_bio) == (2, "cached")
+    assert second_user.id in {1, 3}
+    assert [profile["user_id"] for profile in stored] == [second_user.id]
@@ -0,0 +1,46 @@
+"""Unit tests for modules.prompt_packing."""
+
+from __future__ import annotations
+
+import pytest
+
+from modules import prompt_packing as pp
+
+
+@pytest.mark.unit
+def test_estimate_tokens_counts_non_ascii_denser() -> None:
+    assert pp.estimate_tokens("") == 0
+    assert pp.estimate_tokens("a" * 40) == 11
+    assert pp.estimate_tokens("я" * 40) == 21
+
+
+@pytest.mark.unit
+def test_compact_json_and_truncate() -> None:
+    assert pp.compact_json([{"a": 1, "t": "ж"}]) == '[{"a":1,"t":"ж"}]'
+    assert pp.truncate_to_tokens("  a \n\n b  ", 10) == "a b"
+
+    truncated = pp.truncate_to_tokens("word " * 100, 10)
+    assert truncated.endswith("…")
+    assert pp.estimate_tokens(truncated) <= 11
+
+
+@pytest.mark.unit
+def test_pack_items_truncates_dedupes_and_respects_budget() -> None:
+    items = [
+        {"index": 0, "text": "Need a CRM bot"},
+        {"index": 1, "text": "need  a crm BOT"},
+        {"index": 2, "text": "x" * 400},
+        {"index": 3, "text": "another message " * 20},
+    ]
+
+    pack = pp.pack_items(items, max_item_tokens=20, token_budget=50)
+
+    assert [item["index"] for item in pack.items] == [0, 2]
+    assert pack.duplicates == 1
+    assert pack.truncated == 1
+    assert pack.dropped == 1
+    assert pack.estimated_tokens <= 50
+    assert items[2]["text"] == "x" * 400
+
+    no_dedupe = pp.pack_items(items[:2], max_item_tokens=20, token_budget=1000, dedupe=False)
+    assert len(no_dedupe.items) == 2
@@ -0,0 +1,65 @@
+"""Unit tests for modules.prompt_registry."""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from modules import prompt_registry as pr
+
+
+@pytest.fixture(autouse=True)
+def _isolated_registry(monkeypatch):
+    monkeypatch.setattr(pr, "_REGISTRY", {})
+
+
+@pytest.mark.unit
+def test_render_substitutes_only_known_placeholders() -> None:
+    template = pr.PromptTemplate(
+        'a={a};b={b};json={"k":"v"};other={other}', placeholders=("a", "b")
+    )
+
+    assert template.render(a="1", b=2, other="x") == (
+        'a=1;b=2;json={"k":"v"};other={other}'
+    )
+    # Missing values leave the placeholder as is
+    assert template.render(a="1") == 'a=1;b={b};json={"k":"v"};other={other}'
+    assert pr.render("x={x}", x="y") == "x=y"
+
+
+@pytest.mark.unit
+def test_get_prompt_loads_once_and_reloads_on_mtime_change(tmp_path, monkeypatch) -> None:
+    path = tmp_path / "prompt.txt"
+    path.write_text("v1 {name}", encoding="utf-8")
+    reads = 0
+    real_open = open
+
+    def _counting_open(*args, **kwargs):  # noqa: ANN002, ANN003
+        nonlocal reads
+        reads += 1
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr("builtins.open", _counting_open)
+
+    first = pr.get_prompt(str(path), ("name",))
+    second = pr.get_prompt(str(path), ("name",))
+    assert first is second
+    assert reads == 1
+    assert first.render(name="x") == "v1 x"
+
+    path.write_text("v2 {name}", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    reloaded = pr.get_prompt(str(path), ("name",))
+    assert reads == 2
+    assert reloaded.render(name="x") == "v2 x"
+    assert reloaded.version != first.version
+    assert len(reloaded.version) == 16
+
+
+@pytest.mark.unit
+def test_get_prompt_missing_file_raises(tmp_path) -> None:
+    with pytest.raises(FileNotFoundError):
+        pr.get_prompt(str(tmp_path / "missing.txt"))
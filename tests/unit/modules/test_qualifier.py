@@ -9,6 +9,12 @@ import pytest
 from modules import qualifier as q
 
 
+@pytest.fixture(autouse=True)
+def _in_memory_llm_cache(monkeypatch, memory_redis):
+    monkeypatch.setattr(q.llm_cache, "_redis_client", lambda: memory_redis)
+    return memory_redis
+
+
 @pytest.mark.unit
 def test_extract_json_payload_and_parse_helpers() -> None:
     raw = "```json\nnoise\n{\"a\":1,\"b\":2}\n```"
@@ -79,7 +85,7 @@ def test_qualify_lead_success_and_penalty(monkeypatch) -> None:
     monkeypatch.setattr(q, "load_qualification_prompt", lambda: "X {services_description}")
 
     class _LLM:
-        def invoke(self, _messages):  # noqa: ANN001
+        async def ainvoke(self, _messages):  # noqa: ANN001
             return SimpleNamespace(
                 content=(
                     '{"qualification":{"score":7,"reasoning":"не можем решить через API"},'
@@ -93,9 +99,7 @@ def test_qualify_lead_success_and_penalty(monkeypatch) -> None:
     monkeypatch.setattr(q, "llm", _LLM())
     result = q.qualify_lead(
         candidate_data={"username": "alice", "messages_with_metadata": []},
-        enrichment_data={},
         niche="ecom",
-        ai_ideas="",
         user_services_description="AI bots",
     )
 
@@ -114,7 +118,7 @@ def test_qualify_lead_error_paths(monkeypatch) -> None:
     assert no_llm["error"] == "LLM client is not initialized."
 
     class _BadLLM:
-        def invoke(self, _messages):  # noqa: ANN001
+        async def ainvoke(self, _messages):  # noqa: ANN001
             return SimpleNamespace(content="not json")
 
     monkeypatch.setattr(q, "llm", _BadLLM())
@@ -133,16 +137,13 @@ def test_batch_analyze_chat_paths(monkeypatch) -> None:
         def __init__(self):
             self.calls = 0
 
-        def invoke(self, _messages):  # noqa: ANN001
+        async def astream(self, _messages):  # noqa: ANN001
             self.calls += 1
             if self.calls == 1:
-                return SimpleNamespace(
-                    content=(
-                        '{"potential_leads":['
-                        '{"username":"@u1","priority":"high"}'
-                    )
-                )
-            return SimpleNamespace(
+                yield SimpleNamespace(content='{"potential_leads":[')
+                yield SimpleNamespace(content='{"username":"@u1","priority":"high"}')
+                return
+            yield SimpleNamespace(
                 content='{"potential_leads":[{"username":"@u1","priority":"high"}]}'
             )
 
@@ -151,3 +152,135 @@ def test_batch_analyze_chat_paths(monkeypatch) -> None:
     recovered = q.batch_analyze_chat([{"username": "@u1", "text": "pain"}])
     assert "potential_leads" in recovered
     assert recovered["potential_leads"][0]["username"] == "@u1"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_async_paths_time_out_without_blocking(monkeypatch) -> None:
+    class _HangingLLM:
+        async def ainvoke(self, _messages):  # noqa: ANN001
+            await q.asyncio.Event().wait()
+
+        async def astream(self, _messages):  # noqa: ANN001
+            await q.asyncio.Event().wait()
+            yield SimpleNamespace(content="")
+
+    monkeypatch.setattr(q, "llm", _HangingLLM())
+    monkeypatch.setattr(q.config, "LLM_CALL_TIMEOUT_SECONDS", 0.01)
+    monkeypatch.setattr(q, "load_qualification_prompt", lambda: "prompt")
+    monkeypatch.setattr(q, "load_batch_analysis_prompt", lambda: "prompt")
+
+    qualified = await q.qualify_lead_async({"username": "u"}, "niche")
+    batch = await q.batch_analyze_chat_async([{"username": "@u", "text": "x"}])
+
+    assert qualified == {"error": "LLM call timed out"}
+    assert batch == {"error": "LLM call timed out", "potential_leads": []}
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_qualify_lead_serves_identical_inputs_from_cache(monkeypatch) -> None:
+    monkeypatch.setattr(q.config, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(q, "load_qualification_prompt", lambda: "X {services_description}")
+
+    class _LLM:
+        def __init__(self) -> None:
+            self.calls = 0
+
+        async def ainvoke(self, _messages):  # noqa: ANN001
+            self.calls += 1
+            return SimpleNamespace(content='{"qualification":{"score":6,"reasoning":"ok"}}')
+
+    fake_llm = _LLM()
+    monkeypatch.setattr(q, "llm", fake_llm)
+
+    def _candidate(age: str) -> dict:
+        return {
+            "username": "alice",
+            "messages_with_metadata": [
+                {"text": "need a bot", "age_display": age, "freshness": "hot"}
+            ],
+        }
+
+    first = await q.qualify_lead_async(_candidate("1 час назад"), "ecom", "svc")
+    # Only the volatile age changed: served from cache
+    second = await q.qualify_lead_async(_candidate("2 дня назад"), "ecom", "svc")
+    # Different services description: cache miss
+    third = await q.qualify_lead_async(_candidate("2 дня назад"), "ecom", "other")
+
+    assert fake_llm.calls == 2
+    assert first["llm_response"]["qualification"]["score"] == 6
+    assert second["llm_response"]["qualification"]["score"] == 6
+    assert "error" not in third
+
+
+@pytest.mark.unit
+def test_chunk_batch_messages_respects_token_and_user_budgets() -> None:
+    messages = [{"username": f"@u{i}", "text": "x" * 40} for i in range(5)]
+
+    by_users = q._chunk_batch_messages(messages, token_budget=10_000, max_users=2)
+    by_tokens = q._chunk_batch_messages(messages, token_budget=30, max_users=100)
+
+    assert [len(chunk) for chunk in by_users] == [2, 2, 1]
+    assert all(len(chunk) == 1 for chunk in by_tokens)
+    assert q._chunk_batch_messages([], token_budget=10, max_users=10) == [[]]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_batch_analyze_chat_chunks_merge_and_retry_failed_chunk_only(
+    monkeypatch,
+) -> None:
+    monkeypatch.setattr(q.config, "BATCH_ANALYSIS_CHUNK_MAX_USERS", 2)
+    monkeypatch.setattr(q, "load_batch_analysis_prompt", lambda: "prompt")
+
+    class _LLM:
+        def __init__(self) -> None:
+            self.prompts: list[str] = []
+
+        async def astream(self, messages):  # noqa: ANN001
+            content = messages[1].content
+            self.prompts.append(content)
+            if "@u3" in content and "ВАЖНО" not in content:
+                yield SimpleNamespace(content="not json")
+                return
+            if "@u5" in content:
+                raise RuntimeError("chunk down")
+            usernames = [u for u in ("@u1", "@u2", "@u3", "@u4") if u in content]
+            leads = ",".join(f'{{"username":"{u}"}}' for u in usernames[:1])
+            yield SimpleNamespace(
+                content=(
+                    f'{{"total_messages_analyzed":{len(usernames)},'
+                    f'"potential_leads":[{leads}],'
+                    f'"filtering_stats":{{"analyzed":{len(usernames)},"with_pain_signals":1}}}}'
+                )
+            )
+
+    fake_llm = _LLM()
+    monkeypatch.setattr(q, "llm", fake_llm)
+    messages = [{"username": f"@u{i}", "text": "t"} for i in range(1, 6)]
+
+    result = await q.batch_analyze_chat_async(messages)
+
+    assert [lead["username"] for lead in result["potential_leads"]] == ["@u1", "@u3"]
+    assert result["filtering_stats"] == {"analyzed": 4, "with_pain_signals": 2}
+    assert result["unscreened_usernames"] == ["@u5"]
+    # Three chunks plus a retry of the invalid one; nothing is re-sent in full
+    assert len(fake_llm.prompts) == 4
+    assert sum("@u1" in prompt for prompt in fake_llm.prompts) == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_batch_analysis_stops_on_exhausted_budget(monkeypatch) -> None:
+    monkeypatch.setattr(q, "load_batch_analysis_prompt", lambda: "prompt")
+
+    class _LLM:
+        async def astream(self, _messages):  # noqa: ANN001
+            raise q.llm_gateway.LLMBudgetExceededError("daily budget exhausted")
+            yield SimpleNamespace(content="")
+
+    monkeypatch.setattr(q, "llm", _LLM())
+
+    with pytest.raises(q.llm_gateway.LLMBudgetExceededError):
+        await q.batch_analyze_chat_async([{"username": "@u", "text": "x"}])
@@ -0,0 +1,54 @@
+"""Unit tests for modules.rate_limiter."""
+
+from __future__ import annotations
+
+import pytest
+
+from modules import rate_limiter as rl
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_token_bucket_spaces_out_requests_over_capacity(monkeypatch) -> None:
+    sleeps: list[float] = []
+
+    async def _fake_sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(rl.asyncio, "sleep", _fake_sleep)
+    monkeypatch.setattr(rl.time, "monotonic", lambda: 100.0)
+
+    bucket = rl.TokenBucket(rate=2, capacity=2)
+    for _ in range(4):
+        await bucket.acquire()
+
+    assert sleeps == [0.5, 1.0]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_token_bucket_does_not_burst_when_pause_ends(monkeypatch) -> None:
+    clock = [100.0]
+    sleeps: list[float] = []
+
+    async def _fake_sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(rl.asyncio, "sleep", _fake_sleep)
+    monkeypatch.setattr(rl.time, "monotonic", lambda: clock[0])
+
+    bucket = rl.TokenBucket(rate=1, capacity=5)
+    bucket.pause(30)
+    clock[0] += 10
+    # A second, shorter pause inside the first one changes nothing
+    bucket.pause(5)
+    clock[0] += 20
+
+    # The pause has just ended: no tokens accrued while it lasted
+    bucket._refill(clock[0])
+    assert bucket._tokens == 0
+
+    await bucket.acquire()
+    await bucket.acquire()
+    assert sleeps == [1.0, 1.0]
@@ -2,14 +2,18 @@
 
 from __future__ import annotations
 
+import asyncio
 from contextlib import nullcontext
 from dataclasses import dataclass
 from types import SimpleNamespace
 
 import pytest
 
+from sqlalchemy.sql.dml import Insert
+
 from bot.models.lead import Lead
 from bot.models.pain import Pain
+from bot.models.program_run import ProgramRun
 from bot.services import program_runner as pr
 from bot.models.user import User
 from modules.telegram_client import AuthorizationRequiredError
@@ -51,6 +55,7 @@ class _FakeSession:
         self._pain_id_seq = 1
         self.commit_calls = 0
         self.rollback_calls = 0
+        self.upsert_calls = 0
 
     async def get(self, model, key):
         if model is User and key == self.user.telegram_id:
@@ -85,7 +90,55 @@ class _FakeSession:
     async def rollback(self):
         self.rollback_calls += 1
 
-    async def execute(self, query):
+    def _upsert(self, query) -> _ExecuteResult:
+        # INSERT ... ON CONFLICT (program_id, telegram_username) DO UPDATE
+        self.upsert_calls += 1
+        updated = {
+            column for column, _ in query._post_values_clause.update_values_to_set
+        }
+        returned = []
+        for values in query._multi_values[0]:
+            row = {column.name: value for column, value in values.items()}
+            lead = next(
+                (
+                    lead for lead in self.leads
+                    if lead.program_id == row["program_id"]
+                    and lead.telegram_username == row["telegram_username"]
+                ),
+                None,
+            )
+            if lead is None:
+                lead = Lead(**row)
+                self.add(lead)
+            else:
+                for key, value in row.items():
+                    if key in updated:
+                        setattr(lead, key, value)
+            returned.append(lead)
+        return _ExecuteResult(rows=returned)
+
+    def _insert_pains(self, query) -> _ExecuteResult:
+        # INSERT ... ON CONFLICT ON CONSTRAINT uq_pain_message_quote DO NOTHING
+        inserted_ids = []
+        for values in query._multi_values[0]:
+            row = {column.name: value for column, value in values.items()}
+            key = (row["source_message_id"], row["source_chat"], row["original_quote"])
+            if any(
+                (p.source_message_id, p.source_chat, p.original_quote) == key
+                for p in self.pains
+            ):
+                continue
+            pain = Pain(**row)
+            self.add(pain)
+            inserted_ids.append(pain.id)
+        return _ExecuteResult(rows=inserted_ids)
+
+    async def execute(self, query, execution_options=None):  # noqa: ANN001
+        if isinstance(query, Insert) and query.table.name == "leads":
+            return self._upsert(query)
+        if isinstance(query, Insert) and query.table.name == "pains":
+            return self._insert_pains(query)
+
         # Count leads queries
         if "count(leads.id)" in str(query):
             return _ExecuteResult(scalar=len(self.leads))
@@ -187,10 +240,9 @@ async def test_run_program_pipeline_auth_required(user_factory, monkeypatch) ->
 
     async def _raise_auth(**kwargs):  # noqa: ANN003
         raise AuthorizationRequiredError("auth required")
+        yield  # pragma: no cover
 
-    monkeypatch.setattr(
-        pr.members_parser, "parse_users_from_messages", _raise_auth
-    )
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _raise_auth)
 
     result = await pr.run_program_pipeline(program, session)
 
@@ -231,17 +283,15 @@ async def test_run_program_pipeline_creates_and_filters_leads(
         },
     ]
 
-    async def _parse_users_from_messages(**kwargs):  # noqa: ANN003
-        return candidates, []
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        for candidate in candidates:
+            yield candidate
 
-    monkeypatch.setattr(
-        pr.members_parser, "parse_users_from_messages", _parse_users_from_messages
-    )
-    monkeypatch.setattr(pr.web_enricher, "search_ai_ideas_for_niche", lambda _: "")
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _iter_candidates)
 
     captured_services: list[str] = []
 
-    def _qualify(candidate, enrichment, niche, ai_ideas, user_services_description):  # noqa: ANN001
+    async def _qualify(candidate, niche, user_services_description=""):  # noqa: ANN001
         captured_services.append(user_services_description)
         if candidate["username"] == "alice":
             return {
@@ -258,12 +308,7 @@ async def test_run_program_pipeline_creates_and_filters_leads(
             return {"error": "llm failure"}
         raise AssertionError("unexpected candidate")
 
-    monkeypatch.setattr(pr.qualifier, "qualify_lead", _qualify)
-
-    async def _fake_enrich(candidate, enrich_web):  # noqa: ANN001
-        return {}
-
-    monkeypatch.setattr(pr, "_enrich_candidate", _fake_enrich)
+    monkeypatch.setattr(pr.qualifier, "qualify_lead_async", _qualify)
 
     async def _save_pains(**kwargs):  # noqa: ANN003
         return 2
@@ -299,6 +344,7 @@ async def test_run_program_pipeline_stops_at_max_leads(user_factory, monkeypatch
         chats=[_ProgramChat(chat_username="chat_limit")],
         min_score=5,
     )
+    monkeypatch.setattr(pr.config, "QUALIFICATION_WORKERS", 1)
 
     candidates = [
         {
@@ -311,17 +357,15 @@ async def test_run_program_pipeline_stops_at_max_leads(user_factory, monkeypatch
         },
     ]
 
-    async def _parse_users_from_messages(**kwargs):  # noqa: ANN003
-        return candidates, []
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        for candidate in candidates:
+            yield candidate
 
-    monkeypatch.setattr(
-        pr.members_parser, "parse_users_from_messages", _parse_users_from_messages
-    )
-    monkeypatch.setattr(pr.web_enricher, "search_ai_ideas_for_niche", lambda _: "")
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _iter_candidates)
 
     qual_calls = 0
 
-    def _qualify(candidate, enrichment, niche, ai_ideas, user_services_description):  # noqa: ANN001
+    async def _qualify(candidate, niche, user_services_description=""):  # noqa: ANN001
         nonlocal qual_calls
         qual_calls += 1
         return {
@@ -335,12 +379,7 @@ async def test_run_program_pipeline_stops_at_max_leads(user_factory, monkeypatch
             "raw_input_prompt": "prompt",
         }
 
-    monkeypatch.setattr(pr.qualifier, "qualify_lead", _qualify)
-
-    async def _enrich(candidate, enrich_web):  # noqa: ANN001
-        return {}
-
-    monkeypatch.setattr(pr, "_enrich_candidate", _enrich)
+    monkeypatch.setattr(pr.qualifier, "qualify_lead_async", _qualify)
 
     async def _save_pains(**kwargs):  # noqa: ANN003
         return 0
@@ -354,6 +393,261 @@ async def test_run_program_pipeline_stops_at_max_leads(user_factory, monkeypatch
     assert qual_calls == 1
 
 
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_run_program_pipeline_parses_sources_concurrently(
+    user_factory, monkeypatch
+) -> None:
+    user = user_factory(telegram_id=15, services_description="svc")
+    session = _FakeSession(user=user, program_name="Parallel")
+    program = _ProgramStub(
+        id=5,
+        user_id=15,
+        name="Parallel",
+        max_leads_per_run=10,
+        chats=[
+            _ProgramChat(chat_username="slow_chat"),
+            _ProgramChat(chat_username="fast_chat"),
+            _ProgramChat(chat_username="queued_chat"),
+        ],
+        min_score=5,
+    )
+    monkeypatch.setattr(pr.config, "PARSE_CONCURRENCY_PER_ACCOUNT", 2)
+    slow_release = pr.asyncio.Event()
+    in_flight = 0
+    max_in_flight = 0
+    events: list[str] = []
+
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        nonlocal in_flight, max_in_flight
+        source = kwargs["chat_identifier"]
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        if source == "slow_chat":
+            await slow_release.wait()
+        else:
+            await pr.asyncio.sleep(0)
+        in_flight -= 1
+        events.append(f"parsed:{source}")
+        yield {
+            "username": f"user_{source}",
+            "messages_with_metadata": [{"message_id": 1, "text": "t"}],
+        }
+
+    async def _qualify(candidate, niche, user_services_description=""):  # noqa: ANN001
+        events.append(f"qualified:{candidate['username']}")
+        if candidate["username"] == "user_queued_chat":
+            slow_release.set()
+        return {"llm_response": {"qualification": {"score": 1}}}
+
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _iter_candidates)
+    monkeypatch.setattr(pr.qualifier, "qualify_lead_async", _qualify)
+
+    result = await pr.run_program_pipeline(program, session)
+
+    assert result["candidates_found"] == 3
+    assert max_in_flight == 2
+    # Fast chats are qualified before the slow chat finishes parsing
+    assert events.index("qualified:user_fast_chat") < events.index("parsed:slow_chat")
+    assert events[-1] == "qualified:user_slow_chat"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_run_program_pipeline_qualifies_while_source_streams(
+    user_factory, monkeypatch
+) -> None:
+    user = user_factory(telegram_id=16, services_description="svc")
+    session = _FakeSession(user=user, program_name="Stream")
+    program = _ProgramStub(
+        id=6,
+        user_id=16,
+        name="Stream",
+        max_leads_per_run=10,
+        chats=[_ProgramChat(chat_username="big_chat")],
+        min_score=5,
+    )
+    monkeypatch.setattr(pr.config, "CANDIDATE_QUEUE_SIZE", 1)
+    first_qualified = pr.asyncio.Event()
+    events: list[str] = []
+
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        for name in ("first", "second"):
+            events.append(f"yielded:{name}")
+            yield {
+                "username": name,
+                "messages_with_metadata": [{"message_id": 1, "text": "t"}],
+            }
+            # Parsing continues only once the first candidate was qualified
+            await first_qualified.wait()
+
+    async def _qualify(candidate, niche, user_services_description=""):  # noqa: ANN001
+        events.append(f"qualified:{candidate['username']}")
+        first_qualified.set()
+        return {"llm_response": {"qualification": {"score": 1}}}
+
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _iter_candidates)
+    monkeypatch.setattr(pr.qualifier, "qualify_lead_async", _qualify)
+
+    result = await pr.run_program_pipeline(program, session)
+
+    assert result["candidates_found"] == 2
+    assert events == [
+        "yielded:first", "qualified:first", "yielded:second", "qualified:second"
+    ]
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_run_program_pipeline_streams_chat_messages_to_pains(
+    user_factory, monkeypatch
+) -> None:
+    user = user_factory(telegram_id=17, services_description="svc")
+    session = _FakeSession(user=user, program_name="Pains")
+    program = _ProgramStub(
+        id=7,
+        user_id=17,
+        name="Pains",
+        max_leads_per_run=10,
+        chats=[_ProgramChat(chat_username="pain_chat")],
+    )
+    monkeypatch.setattr(pr.config, "CHAT_PAIN_COLLECTION_ENABLED", True)
+    monkeypatch.setattr(pr.config, "PAIN_COLLECTION_ENABLED", True)
+    monkeypatch.setattr(pr.config, "PAIN_BATCH_SIZE", 2)
+    monkeypatch.setattr(pr.pain_collector, "_load_prompt", lambda: "prompt")
+
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        for message_id in (1, 2, 3):
+            await kwargs["on_message"]({
+                "message_id": message_id,
+                "text": f"m{message_id}",
+                "chat_username": "pain_chat",
+            })
+        return
+        yield  # noqa: unreachable - makes this an async generator
+
+    async def _extract(batch, chat_name, prompt_template):  # noqa: ANN001
+        return [{"source_message_index": 0, "text": "pain", "original_quote": "quote"}]
+
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _iter_candidates)
+    monkeypatch.setattr(pr.pain_collector, "_extract_pains_batch", _extract)
+
+    result = await pr.run_program_pipeline(program, session)
+
+    assert result["pains_saved"] == 2
+    assert [p.source_message_id for p in session.pains] == [1, 3]
+    assert all(p.program_id == 7 for p in session.pains)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_run_program_pipeline_qualifies_concurrently_up_to_exact_limit(
+    user_factory, monkeypatch
+) -> None:
+    user = user_factory(telegram_id=17, services_description="svc")
+    session = _FakeSession(user=user, program_name="Concurrent")
+    program = _ProgramStub(
+        id=7,
+        user_id=17,
+        name="Concurrent",
+        max_leads_per_run=2,
+        chats=[_ProgramChat(chat_username="chat_many")],
+        min_score=5,
+    )
+    monkeypatch.setattr(pr.config, "QUALIFICATION_WORKERS", 4)
+    names = ["slow", "fast", "medium", "stuck", "late"]
+    delays = {"slow": 0.05, "fast": 0.0, "medium": 0.01}
+    started: list[str] = []
+    cancelled: list[str] = []
+
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        for name in names:
+            yield {
+                "username": name,
+                "messages_with_metadata": [{"message_id": 1, "text": "t"}],
+            }
+
+    async def _qualify(candidate, niche, user_services_description=""):  # noqa: ANN001
+        name = candidate["username"]
+        started.append(name)
+        try:
+            if name in delays:
+                await pr.asyncio.sleep(delays[name])
+            else:
+                await pr.asyncio.Event().wait()
+        except pr.asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+        return {"llm_response": {"qualification": {"score": 9}}}
+
+    async def _save_pains(**kwargs):  # noqa: ANN003
+        return 0
+
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _iter_candidates)
+    monkeypatch.setattr(pr.qualifier, "qualify_lead_async", _qualify)
+    monkeypatch.setattr(pr, "_save_pains_from_lead", _save_pains)
+
+    delivered: list[str] = []
+
+    async def _on_lead_found(lead: Lead) -> None:
+        delivered.append(lead.telegram_username)
+
+    result = await pr.run_program_pipeline(program, session, _on_lead_found)
+
+    assert result["leads_qualified"] == 2
+    # Handled in completion order, not queue order
+    assert delivered == ["fast", "medium"]
+    assert [lead.telegram_username for lead in session.leads] == ["fast", "medium"]
+    assert started[:4] == ["slow", "fast", "medium", "stuck"]
+    assert set(cancelled) >= {"stuck"}
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_run_program_pipeline_skips_leads_without_new_messages(
+    user_factory, monkeypatch
+) -> None:
+    user = user_factory(telegram_id=18, services_description="svc")
+    session = _FakeSession(user=user, program_name="Memo")
+    program = _ProgramStub(
+        id=8,
+        user_id=18,
+        name="Memo",
+        max_leads_per_run=10,
+        chats=[_ProgramChat(chat_username="chat_daily")],
+        min_score=5,
+    )
+    monkeypatch.setattr(pr.config, "QUALIFICATION_MEMO_ENABLED", True)
+    messages = {"alice": [{"message_id": 1, "chat_id": 5, "text": "need a bot"}]}
+
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        for name, name_messages in messages.items():
+            yield {"username": name, "messages_with_metadata": list(name_messages)}
+
+    qualified: list[str] = []
+
+    async def _qualify(candidate, niche, user_services_description=""):  # noqa: ANN001
+        qualified.append(candidate["username"])
+        return {"llm_response": {"qualification": {"score": 8}}}
+
+    async def _save_pains(**kwargs):  # noqa: ANN003
+        return 0
+
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _iter_candidates)
+    monkeypatch.setattr(pr.qualifier, "qualify_lead_async", _qualify)
+    monkeypatch.setattr(pr, "_save_pains_from_lead", _save_pains)
+
+    await pr.run_program_pipeline(program, session)
+    second = await pr.run_program_pipeline(program, session)
+    assert qualified == ["alice"]
+    assert second["skipped_unchanged"] == 1
+    assert second["leads_qualified"] == 0
+
+    # A new message is new signal: the lead is qualified again
+    messages["alice"].append({"message_id": 2, "chat_id": 5, "text": "still need it"})
+    third = await pr.run_program_pipeline(program, session)
+    assert qualified == ["alice", "alice"]
+    assert third["leads_qualified"] == 1
+    assert len(session.leads) == 1
+
 @pytest.mark.unit
 @pytest.mark.asyncio
 async def test_save_pains_from_lead_deduplicates_and_sanitizes(user_factory) -> None:
@@ -497,3 +791,316 @@ async def test_save_pains_from_lead_skips_existing(user_factory) -> None:
     )
 
     assert inserted == 0
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_run_program_pipeline_upserts_leads_in_groups(user_factory, monkeypatch) -> None:
+    user = user_factory(telegram_id=22, services_description="svc")
+    session = _FakeSession(user=user, program_name="Groups")
+    program = _ProgramStub(
+        id=9,
+        user_id=22,
+        name="Groups",
+        max_leads_per_run=10,
+        chats=[_ProgramChat(chat_username="chat_groups")],
+    )
+    monkeypatch.setattr(pr.config, "QUALIFICATION_WORKERS", 1)
+    monkeypatch.setattr(pr.config, "QUALIFICATION_MEMO_ENABLED", False)
+    monkeypatch.setattr(pr.config, "LEAD_COMMIT_BATCH_SIZE", 2)
+    monkeypatch.setattr(pr.config, "PIPELINE_DEBUG_COUNTS", False)
+    existing = Lead(
+        user_id=22, program_id=9, telegram_username="carol",
+        qualification_score=5, status="contacted",
+    )
+    session.add(existing)
+    queries: list[str] = []
+    execute = session.execute
+
+    async def _recording_execute(query, execution_options=None):  # noqa: ANN001
+        queries.append(str(query))
+        return await execute(query, execution_options)
+
+    session.execute = _recording_execute
+
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        for name in ("alice", "bob", "carol"):
+            yield {"username": name, "messages_with_metadata": []}
+
+    async def _qualify(candidate, niche, user_services_description=""):  # noqa: ANN001
+        return {"llm_response": {"qualification": {"score": 9}}}
+
+    async def _save_pains(**kwargs):  # noqa: ANN003
+        return 0
+
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _iter_candidates)
+    monkeypatch.setattr(pr.qualifier, "qualify_lead_async", _qualify)
+    monkeypatch.setattr(pr, "_save_pains_from_lead", _save_pains)
+
+    delivered: list[tuple[str, str]] = []
+
+    async def _on_lead_found(lead: Lead) -> None:
+        delivered.append((lead.telegram_username, lead.program.name))
+
+    result = await pr.run_program_pipeline(program, session, _on_lead_found)
+
+    assert result["leads_qualified"] == 3
+    # alice right away as the first lead, then bob+carol in one statement
+    assert session.upsert_calls == 2
+    assert all(q.startswith("INSERT INTO leads") for q in queries)
+    assert delivered == [("alice", "Groups"), ("bob", "Groups"), ("carol", "Groups")]
+    assert [lead.telegram_username for lead in session.leads] == ["carol", "alice", "bob"]
+    assert existing.qualification_score == 9
+    assert existing.status == "contacted"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_run_program_pipeline_sends_waiting_leads_after_max_delay(user_factory, monkeypatch) -> None:
+    user = user_factory(telegram_id=24, services_description="svc")
+    session = _FakeSession(user=user, program_name="Delay")
+    program = _ProgramStub(
+        id=11,
+        user_id=24,
+        name="Delay",
+        max_leads_per_run=10,
+        chats=[_ProgramChat(chat_username="chat_delay")],
+    )
+    monkeypatch.setattr(pr.config, "QUALIFICATION_WORKERS", 1)
+    monkeypatch.setattr(pr.config, "QUALIFICATION_MEMO_ENABLED", False)
+    monkeypatch.setattr(pr.config, "LEAD_COMMIT_BATCH_SIZE", 5)
+    monkeypatch.setattr(pr.config, "LEAD_COMMIT_MAX_DELAY_SECONDS", 0.05)
+    monkeypatch.setattr(pr.config, "PIPELINE_DEBUG_COUNTS", False)
+    delivered: list[str] = []
+    bob_delivered = asyncio.Event()
+
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        yield {"username": "alice", "messages_with_metadata": []}
+        yield {"username": "bob", "messages_with_metadata": []}
+        # The next chat takes a while: bob must not wait for it
+        await asyncio.wait_for(bob_delivered.wait(), timeout=5)
+        yield {"username": "carol", "messages_with_metadata": []}
+
+    async def _qualify(candidate, niche, user_services_description=""):  # noqa: ANN001
+        return {"llm_response": {"qualification": {"score": 9}}}
+
+    async def _save_pains(**kwargs):  # noqa: ANN003
+        return 0
+
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _iter_candidates)
+    monkeypatch.setattr(pr.qualifier, "qualify_lead_async", _qualify)
+    monkeypatch.setattr(pr, "_save_pains_from_lead", _save_pains)
+
+    async def _on_lead_found(lead: Lead) -> None:
+        delivered.append(lead.telegram_username)
+        if lead.telegram_username == "bob":
+            bob_delivered.set()
+
+    result = await pr.run_program_pipeline(program, session, _on_lead_found)
+
+    assert result["leads_qualified"] == 3
+    # alice as the first lead, bob after the delay, carol at the end
+    assert delivered == ["alice", "bob", "carol"]
+    assert session.upsert_calls == 3
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_final_lead_flush_does_not_hide_the_pipeline_error(user_factory, monkeypatch) -> None:
+    user = user_factory(telegram_id=26, services_description="svc")
+    session = _FakeSession(user=user, program_name="Flush")
+    program = _ProgramStub(
+        id=13,
+        user_id=26,
+        name="Flush",
+        max_leads_per_run=10,
+        chats=[_ProgramChat(chat_username="chat_flush")],
+    )
+    monkeypatch.setattr(pr.config, "QUALIFICATION_WORKERS", 1)
+    monkeypatch.setattr(pr.config, "QUALIFICATION_MEMO_ENABLED", False)
+    monkeypatch.setattr(pr.config, "LEAD_COMMIT_BATCH_SIZE", 5)
+    monkeypatch.setattr(pr.config, "PIPELINE_DEBUG_COUNTS", False)
+    db_down = False
+    commit = session.commit
+
+    async def _commit() -> None:
+        if db_down:
+            raise RuntimeError("commit on a broken session")
+        await commit()
+
+    session.commit = _commit
+
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        for name in ("alice", "bob", "carol"):
+            yield {"username": name, "messages_with_metadata": []}
+
+    async def _qualify(candidate, niche, user_services_description=""):  # noqa: ANN001
+        nonlocal db_down
+        if candidate["username"] == "carol":
+            db_down = True
+            raise RuntimeError("database went away")
+        return {"llm_response": {"qualification": {"score": 9}}}
+
+    async def _save_pains(**kwargs):  # noqa: ANN003
+        return 0
+
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _iter_candidates)
+    monkeypatch.setattr(pr.qualifier, "qualify_lead_async", _qualify)
+    monkeypatch.setattr(pr, "_save_pains_from_lead", _save_pains)
+    delivered: list[str] = []
+
+    async def _on_lead_found(lead: Lead) -> None:
+        delivered.append(lead.telegram_username)
+
+    # bob is still waiting for his group when the pipeline fails
+    with pytest.raises(RuntimeError, match="database went away"):
+        await pr.run_program_pipeline(program, session, _on_lead_found)
+
+    assert delivered == ["alice"]
+    assert session.rollback_calls >= 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_run_program_pipeline_resumes_from_checkpoints(user_factory, monkeypatch) -> None:
+    user = user_factory(telegram_id=23, services_description="svc")
+    session = _FakeSession(user=user, program_name="Resume")
+    program = _ProgramStub(
+        id=10,
+        user_id=23,
+        name="Resume",
+        max_leads_per_run=10,
+        chats=[_ProgramChat(chat_username="chat_a"), _ProgramChat(chat_username="chat_b")],
+    )
+    monkeypatch.setattr(pr.config, "QUALIFICATION_WORKERS", 1)
+    monkeypatch.setattr(pr.config, "QUALIFICATION_MEMO_ENABLED", False)
+    monkeypatch.setattr(pr.config, "CHAT_PAIN_COLLECTION_ENABLED", False)
+    run = ProgramRun(parsed_candidates={}, rejected_candidates={}, qualified_candidates=[])
+    chats = {"chat_a": ["alice", "bob"], "chat_b": ["dave"]}
+    parsed: list[str] = []
+    qualified: list[str] = []
+    scores = {"alice": 9, "bob": 2, "dave": 8}
+    failing = {"dave"}
+
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        parsed.append(kwargs["chat_identifier"])
+        for name in chats[kwargs["chat_identifier"]]:
+            yield {"username": name, "messages_with_metadata": []}
+
+    async def _qualify(candidate, niche, user_services_description=""):  # noqa: ANN001
+        qualified.append(candidate["username"])
+        if candidate["username"] in failing:
+            raise RuntimeError("worker died")
+        return {"llm_response": {"qualification": {"score": scores[candidate["username"]]}}}
+
+    async def _save_pains(**kwargs):  # noqa: ANN003
+        return 0
+
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _iter_candidates)
+    monkeypatch.setattr(pr.qualifier, "qualify_lead_async", _qualify)
+    monkeypatch.setattr(pr, "_save_pains_from_lead", _save_pains)
+
+    with pytest.raises(RuntimeError, match="worker died"):
+        await pr.run_program_pipeline(program, session, run=run)
+
+    assert sorted(parsed) == ["chat_a", "chat_b"]
+    assert set(run.parsed_candidates) == {"chat_a", "chat_b"}
+    assert run.rejected_candidates == {"bob": 2}
+    assert run.qualified_candidates == ["alice"]
+
+    parsed.clear()
+    qualified.clear()
+    failing.clear()
+    result = await pr.run_program_pipeline(program, session, run=run)
+
+    # Nothing is parsed again and only the interrupted candidate is qualified
+    assert parsed == []
+    assert qualified == ["dave"]
+    assert result["leads_qualified"] == 2
+    assert run.qualified_candidates == ["alice", "dave"]
+    assert [lead.telegram_username for lead in session.leads] == ["alice", "dave"]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_failed_lead_commit_is_not_checkpointed_nor_hidden(user_factory, monkeypatch) -> None:
+    user = user_factory(telegram_id=25, services_description="svc")
+    session = _FakeSession(user=user, program_name="Broken")
+    program = _ProgramStub(
+        id=12,
+        user_id=25,
+        name="Broken",
+        max_leads_per_run=10,
+        chats=[_ProgramChat(chat_username="chat_a")],
+    )
+    monkeypatch.setattr(pr.config, "QUALIFICATION_WORKERS", 1)
+    monkeypatch.setattr(pr.config, "QUALIFICATION_MEMO_ENABLED", False)
+    monkeypatch.setattr(pr.config, "CHAT_PAIN_COLLECTION_ENABLED", False)
+    run = ProgramRun(parsed_candidates={}, rejected_candidates={}, qualified_candidates=[])
+    committed_checkpoints: list[list[str]] = []
+    failed_commits = 0
+    commit = session.commit
+
+    async def _commit() -> None:
+        nonlocal failed_commits
+        if session.upsert_calls:
+            failed_commits += 1
+            raise RuntimeError(f"commit {failed_commits} failed")
+        committed_checkpoints.append(list(run.qualified_candidates or []))
+        await commit()
+
+    session.commit = _commit
+
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        yield {"username": "alice", "messages_with_metadata": []}
+
+    async def _qualify(candidate, niche, user_services_description=""):  # noqa: ANN001
+        return {"llm_response": {"qualification": {"score": 9}}}
+
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _iter_candidates)
+    monkeypatch.setattr(pr.qualifier, "qualify_lead_async", _qualify)
+
+    # The final checkpoint fails as well: the first error is the one raised
+    with pytest.raises(RuntimeError, match="commit 1 failed"):
+        await pr.run_program_pipeline(program, session, run=run)
+
+    assert failed_commits == 2
+    assert session.rollback_calls >= 1
+    assert "alice" not in sum(committed_checkpoints, [])
+    assert run.qualified_candidates == []
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_run_program_pipeline_reports_unresolvable_chats(user_factory, monkeypatch) -> None:
+    user = user_factory(telegram_id=24, services_description="svc")
+    session = _FakeSession(user=user, program_name="Missing")
+    program = _ProgramStub(
+        id=11,
+        user_id=24,
+        name="Missing",
+        max_leads_per_run=10,
+        chats=[_ProgramChat(chat_username="chat_ok"), _ProgramChat(chat_username="chat_gone")],
+    )
+    monkeypatch.setattr(pr.config, "QUALIFICATION_MEMO_ENABLED", False)
+    monkeypatch.setattr(pr.config, "CHAT_PAIN_COLLECTION_ENABLED", False)
+
+    async def _iter_candidates(**kwargs):  # noqa: ANN003
+        if kwargs["chat_identifier"] == "chat_gone":
+            raise pr.members_parser.ChatNotFoundError("Chat chat_gone not found")
+        yield {"username": "alice", "messages_with_metadata": []}
+
+    async def _qualify(candidate, niche, user_services_description=""):  # noqa: ANN001
+        return {"llm_response": {"qualification": {"score": 9}}}
+
+    async def _save_pains(**kwargs):  # noqa: ANN003
+        return 0
+
+    monkeypatch.setattr(pr.members_parser, "iter_candidates", _iter_candidates)
+    monkeypatch.setattr(pr.qualifier, "qualify_lead_async", _qualify)
+    monkeypatch.setattr(pr, "_save_pains_from_lead", _save_pains)
+
+    result = await pr.run_program_pipeline(program, session)
+
+    assert result["unresolvable_sources"] == ["chat_gone"]
+    assert result["leads_qualified"] == 1
@@ -0,0 +1,132 @@
+"""Unit tests for bot.services.program_runs."""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from bot.models.program_run import ProgramRun
+from bot.services import program_runs as runs
+
+
+class _FakeSession:
+    def __init__(self, rows: list[ProgramRun]) -> None:
+        self.rows = rows
+        self.added: list[ProgramRun] = []
+
+    async def execute(self, _query):  # noqa: ANN001
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: list(self.rows)))
+
+    def add(self, obj) -> None:  # noqa: ANN001
+        self.added.append(obj)
+
+
+def _run(run_id: int, hours_ago: float) -> ProgramRun:
+    return ProgramRun(
+        id=run_id,
+        program_id=1,
+        status="running",
+        attempts=1,
+        parsed_candidates={"chat": [{"username": "alice"}]},
+        started_at=runs._utc_now() - datetime.timedelta(hours=hours_ago),
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_resume_run_picks_latest_recent_run_and_expires_the_rest(monkeypatch) -> None:
+    monkeypatch.setattr(runs.config, "PROGRAM_RUN_RESUME_HOURS", 12)
+    latest, older = _run(3, 1), _run(2, 2)
+
+    resumed = await runs.resume_run(_FakeSession([latest, older]), 1)
+
+    assert resumed is latest
+    assert latest.attempts == 2
+    assert latest.owner and latest.lease_expires_at > runs._utc_now()
+    assert older.status == "expired"
+    assert older.parsed_candidates is None
+    assert older.finished_at is not None
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_stale_run_is_not_resumed(monkeypatch) -> None:
+    monkeypatch.setattr(runs.config, "PROGRAM_RUN_RESUME_HOURS", 12)
+    stale = _run(1, 13)
+
+    assert await runs.resume_run(_FakeSession([stale]), 1) is None
+    assert stale.status == "expired"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_run_held_by_another_job_is_not_taken_over(monkeypatch) -> None:
+    monkeypatch.setattr(runs.config, "PROGRAM_RUN_RESUME_HOURS", 12)
+    held, older = _run(3, 1), _run(2, 2)
+    held.owner = "other-job"
+    held.lease_expires_at = runs._utc_now() + datetime.timedelta(minutes=1)
+
+    with pytest.raises(runs.RunInProgressError):
+        await runs.resume_run(_FakeSession([held, older]), 1)
+    assert (held.status, held.owner, held.attempts) == ("running", "other-job", 1)
+    assert older.status == "running"
+
+    # Its job died: the lease runs out and the run can be resumed
+    held.lease_expires_at = runs._utc_now() - datetime.timedelta(seconds=1)
+    assert await runs.resume_run(_FakeSession([held, older]), 1) is held
+    assert held.owner != "other-job"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_keep_lease_renews_until_the_lease_is_lost(monkeypatch) -> None:
+    monkeypatch.setattr(runs.config, "PROGRAM_RUN_LEASE_SECONDS", 0.03)
+    renewals: list[datetime.datetime] = []
+
+    class _LeaseSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):  # noqa: ANN002
+            return False
+
+        async def execute(self, query):  # noqa: ANN001
+            renewals.append(query.compile().params["lease_expires_at"])
+            return SimpleNamespace(rowcount=1 if len(renewals) < 3 else 0)
+
+        async def commit(self) -> None:
+            return None
+
+    monkeypatch.setattr(runs, "async_session", _LeaseSession)
+    run = runs.start_run(_FakeSession([]), SimpleNamespace(id=5, user_id=10))
+
+    await asyncio.wait_for(runs.keep_lease(run), timeout=5)
+
+    assert len(renewals) == 3
+    assert renewals[0] > runs._utc_now()
+
+
+@pytest.mark.unit
+def test_start_and_finish_run() -> None:
+    session = _FakeSession([])
+    program = SimpleNamespace(id=5, user_id=10)
+
+    run = runs.start_run(session, program)
+    assert session.added == [run]
+    assert (run.program_id, run.user_id, run.status, run.attempts) == (5, 10, "running", 1)
+    assert run.parsed_candidates == {} and run.qualified_candidates == []
+
+    assert run.owner and run.lease_expires_at is not None
+
+    runs.finish_run(run)
+    assert run.status == "completed"
+    assert run.parsed_candidates is None
+    assert run.finished_at is not None
+    assert run.lease_expires_at is None
+
+    failed = runs.start_run(session, program)
+    runs.fail_run(failed)
+    assert failed.status == "failed"